@@ -1,184 +1,129 @@
-import itertools
+import asyncio
 import os
-import shutil
-import time
 from pathlib import Path
-from typing import cast
 
 import docker
-import docker.models
-import docker.models.containers
 import dotenv
-import GPUtil
-from loguru import logger
-from requests.exceptions import HTTPError
 
-from fetcher import api, info, io, status
-from fetcher.docker import manager
+from fetcher import api, info, io, metrics, scheduling, status, tracing
+from fetcher.aio.api import AsyncAPI
+from fetcher.aio.engine import Engine, EngineConfig
+from fetcher.docker import images
 
 
 def main() -> None:
     dotenv.load_dotenv(override=True)
 
     TIMEOUT_JOB = int(os.getenv("TIMEOUT_JOB", 10))
+    TIMEOUT_JOB_MIN = float(os.getenv("TIMEOUT_JOB_MIN", 1))
+    JOB_LONG_POLL = int(os.getenv("JOB_LONG_POLL", 0))
     TIMEOUT_STATUS = int(os.getenv("TIMEOUT_STATUS", 10))
+    N_SLOTS = int(os.getenv("N_SLOTS", 1))
+    RESERVED_CORES = int(os.getenv("RESERVED_CORES", 0))
+    N_DOWNLOAD_WORKERS = int(os.getenv("N_DOWNLOAD_WORKERS", 4))
+    N_UPLOAD_WORKERS = int(os.getenv("N_UPLOAD_WORKERS", 4))
+    UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", 2))
+    UPLOAD_INTERVAL = int(os.getenv("UPLOAD_INTERVAL", 0))
+    MULTIPART_THRESHOLD_MB = int(os.getenv("MULTIPART_THRESHOLD_MB", 0))
+    PART_SIZE_MB = int(os.getenv("PART_SIZE_MB", 16))
+    BUNDLE_THRESHOLD_KB = int(os.getenv("BUNDLE_THRESHOLD_KB", 0))
+    CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 0))
+    IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", 0))
+    LOOKAHEAD = int(os.getenv("LOOKAHEAD", 0))
+    N_THREADS = int(os.getenv("N_THREADS", 0))
+    JOURNAL = int(os.getenv("JOURNAL", 0))
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+    TRACE_PATH = os.getenv("TRACE_PATH")
+    TRACE_FORMAT = os.getenv("TRACE_FORMAT", "jsonl")
+    if TRACE_FORMAT not in ("jsonl", "chrome"):
+        raise ValueError(f"TRACE_FORMAT must be jsonl or chrome, got {TRACE_FORMAT}")
 
     path_base = Path(os.getenv("PATH_BASE", "/data"))
     path_host_base = Path(
         os.getenv("PATH_HOST_BASE", "~/temp/decode_cloud/mounts")
     ).expanduser()
+    path_cache = Path(os.getenv("PATH_CACHE", path_base / ".cache"))
+    cache = None
+    if CACHE_MAX_MB > 0:
+        cache = io.cache.FileCache(path_cache, max_bytes=CACHE_MAX_MB << 20)
+
+    path_token_cache = os.getenv("PATH_TOKEN_CACHE")
 
     access_info = api.token.get_access_info(os.environ["API_URL"])["cognito"]
+    access_token = api.token.AccessTokenAuth(
+        client_id=access_info["client_id"],
+        region=access_info["region"],
+        username=os.environ["USERNAME"],
+        password=os.environ["PASSWORD"],
+        path_cache=Path(path_token_cache) if path_token_cache else None,
+    )
+    access_token.start()
     api_worker = api.worker.API(
         os.environ["API_URL"],
         # api.token.AccessTokenFixed(os.getenv("ACCESS_TOKEN")),
-        api.token.AccessTokenAuth(
-            client_id=access_info["client_id"],
-            region=access_info["region"],
-            username=os.environ["USERNAME"],
-            password=os.environ["PASSWORD"],
-        ),
+        access_token,
+        multipart_threshold=MULTIPART_THRESHOLD_MB << 20 or None,
+        part_size=PART_SIZE_MB << 20,
     )
-    worker_info = info.sys.collect()
-
-    while True:
-        try:
-            container = None
-            jobs = api_worker.fetch_jobs(
-                limit=1,
-                cpu_cores=worker_info.sys.cores,
-                memory=worker_info.sys.memory,
-                gpu_model=(worker_info.gpus[0].model if worker_info.gpus else None),
-                gpu_memory=(worker_info.gpus[0].memory if worker_info.gpus else None),
-            )
-
-            if len(jobs) == 0:
-                logger.info(f"No job found. Sleeping for {TIMEOUT_JOB} seconds.")
-                time.sleep(TIMEOUT_JOB)
-                continue
-
-            if len(jobs) >= 2:
-                raise ValueError(f"Expected only one job, got {len(jobs)}")
-
-            job_id, job = jobs.popitem()
-            logger.info(f"Pulled job {job_id}.")
-            api_job = api.worker.JobAPI(job_id, api_worker)
-
-            pinger_pre = status.pinger.ParallelPinger(
-                ping=status.status.ConstantStatus(
-                    status="preprocessing", ping=api_job.ping
-                ).ping,
-                timeout=TIMEOUT_STATUS,
-            )
-            pinger_pre.start()
-            logger.info(f"Preprocessing job {job_id}")
-
-            path_job = path_base / job_id
-
-            handler = job.handler
-            files_up = (
-                [
-                    io.files.PathAPIUp(path_job / p, f_type, path_job, api_job)
-                    for f_type, p in handler.files_up.items()
-                ]
-                if handler.files_up
-                else []
-            )
-            files_down = (
-                [
-                    io.files.PathAPIDown(path_job / p, p_id, api_job)
-                    for p, p_id in handler.files_down.items()
-                ]
-                if handler.files_down
-                else []
-            )
+    docker_client = docker.from_env()
+    image_cache = None
+    prefetcher = None
+    if IMAGE_CACHE_TTL > 0:
+        image_cache = images.ImageCache(docker_client, ttl=IMAGE_CACHE_TTL)
+        prefetcher = images.Prefetcher(image_cache, interval=IMAGE_CACHE_TTL / 4)
+        prefetcher.start()
 
-            [p.get() for p in files_down]
-            [p.mkdir(exist_ok=True, parents=True) for p in files_up]
+    watcher = status.events.ContainerWatcher(docker_client)
+    watcher.start()
 
-            # here we need the paths on the host, we can not do this recursively
-            path_mnt = path_host_base / path_job.relative_to(path_base)
-            mounts = [
-                docker.types.Mount(
-                    "/files",
-                    str(path_mnt),
-                    type="bind",
-                    read_only=False,
-                ),
-            ]
-            docker_manager = manager.Manager(
-                image=job.handler.image_url,
-            )
-            kwargs_gpu = (
-                {
-                    "device_requests": [
-                        docker.types.DeviceRequest(
-                            device_ids=[gpu.uuid for gpu in GPUtil.getGPUs()],
-                            capabilities=[["gpu"]],
-                        )
-                    ],
-                }
-                if worker_info.gpus
-                else {}
-            )
-            container = cast(
-                docker.models.containers.Container,
-                docker_manager.auto_run(
-                    command=job.app.cmd,
-                    environment=job.app.env,
-                    mounts=mounts,
-                    detach=True,
-                    ipc_mode="host",
-                    **kwargs_gpu,
-                ),
-            )
-
-            pinger_pre.stop()
-
-            # get and keep updating its status
-            pinger_run = status.pinger.SerialPinger(
-                ping=status.status.DockerStatus(container, ping=api_job.ping).ping,
-                timeout=TIMEOUT_STATUS,
-            )
-            logger.info(f"Running job {job_id}")
-            pinger_run.start()
-            pinger_run.stop()
-            res = container.wait()
-            logger.info(f"Job {job_id} finished with exit code {res['StatusCode']}")
-            logger.info(f"Postprocessing job {job_id}")
-
-            # upload result
-            pinger_post = status.pinger.ParallelPinger(
-                ping=status.status.ConstantStatus(
-                    status="postprocessing", ping=api_job.ping
-                ).ping,
-                timeout=TIMEOUT_STATUS,
-            )
-            pinger_post.start()
-            p_upload = itertools.chain(*[p.rglob("*") for p in files_up])
-            [p.push() for p in p_upload if p.is_file()]
-            pinger_post.stop()
-
-            if res["StatusCode"] == 0:
-                api_job.ping(status="finished", exit_code=0, body="")
-            else:
-                logs = str(container.logs())
-                print(logs)
-                logs = f"Logs:\n{logs[-1000:]}"
-                api_job.ping(status="error", exit_code=res["StatusCode"], body=logs)
-
-        except HTTPError as e:
-            if e.response.status_code == 404:
-                logger.warning(
-                    f"Job {job_id} not found; it was probably deleted by the user."
-                )
-                if container and container.status == "running":
-                    container.kill()
-            else:
-                raise e
+    worker_info = info.sys.collect()
+    slot_pool = scheduling.slots.SlotPool.from_system(
+        worker_info, N_SLOTS, reserved_cores=RESERVED_CORES
+    )
+    gpu_allocator = scheduling.gpus.GPUAllocator(worker_info.gpus)
+
+    job_journal = None
+    if JOURNAL:
+        path_base.mkdir(parents=True, exist_ok=True)
+        job_journal = scheduling.journal.JobJournal(path_base / ".journal.sqlite")
+
+    if METRICS_PORT > 0:
+        metrics.serve(METRICS_PORT)
+    tracer = tracing.configure(
+        Path(TRACE_PATH) if TRACE_PATH else None,
+        format="chrome" if TRACE_FORMAT == "chrome" else "jsonl",
+    )
 
-        logger.info(f"Job {job_id} finished")
-        shutil.rmtree(path_job)
+    engine = Engine(
+        EngineConfig(
+            path_base=path_base,
+            path_host_base=path_host_base,
+            timeout_job=TIMEOUT_JOB,
+            timeout_job_min=TIMEOUT_JOB_MIN,
+            job_long_poll=JOB_LONG_POLL,
+            timeout_status=TIMEOUT_STATUS,
+            lookahead=LOOKAHEAD,
+            n_download_workers=N_DOWNLOAD_WORKERS,
+            n_upload_workers=N_UPLOAD_WORKERS,
+            upload_retries=UPLOAD_RETRIES,
+            upload_interval=UPLOAD_INTERVAL,
+            bundle_threshold=BUNDLE_THRESHOLD_KB << 10,
+            n_threads=N_THREADS or None,
+        ),
+        AsyncAPI(api_worker),
+        slot_pool,
+        watcher,
+        client=docker_client,
+        cache=cache,
+        image_cache=image_cache,
+        prefetcher=prefetcher,
+        job_journal=job_journal,
+        gpu_allocator=gpu_allocator,
+    )
+    try:
+        asyncio.run(engine.run())
+    finally:
+        tracer.close()
 
 
 if __name__ == "__main__":
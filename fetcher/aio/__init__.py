@@ -0,0 +1,4 @@
+from . import api as api
+from . import engine as engine
+from . import reporter as reporter
+from . import transfer as transfer
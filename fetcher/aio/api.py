@@ -0,0 +1,57 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from fetcher.api import model, worker
+
+
+class AsyncAPI:
+    def __init__(self, api: worker.API):
+        """Asyncio interface to `worker.API`.
+
+        The requests are still sent by the blocking `requests` session, in the
+        event loop's default executor, so that coroutines can wait on any number
+        of them without blocking the loop.
+        """
+        self.sync = api
+
+    @property
+    def retry_after(self) -> float | None:
+        return self.sync.retry_after
+
+    async def fetch_jobs(self, **kwargs: Any) -> dict[str, model.JobSpecs]:
+        return await asyncio.to_thread(self.sync.fetch_jobs, **kwargs)
+
+    async def get_file(
+        self, file_id: str, path: Path, **kwargs: Any
+    ) -> requests.Response:
+        return await asyncio.to_thread(self.sync.get_file, file_id, path, **kwargs)
+
+    async def put_statuses(self, statuses: dict[str, Any]) -> dict[str, str]:
+        return await asyncio.to_thread(self.sync.put_statuses, statuses)
+
+    def job(self, job_id: str) -> "AsyncJobAPI":
+        return AsyncJobAPI(worker.JobAPI(job_id, self.sync))
+
+
+class AsyncJobAPI:
+    def __init__(self, api: worker.JobAPI):
+        """Asyncio interface to `worker.JobAPI`, see `AsyncAPI`."""
+        self.sync = api
+
+    async def ping(
+        self, status: str, exit_code: int | None = None, body: str | None = None
+    ) -> requests.Response:
+        return await asyncio.to_thread(self.sync.ping, status, exit_code, body)
+
+    async def get_file(
+        self, file_id: str, path: Path, **kwargs: Any
+    ) -> requests.Response:
+        return await asyncio.to_thread(self.sync.get_file, file_id, path, **kwargs)
+
+    async def put_file(
+        self, path: Path, path_api: str | Path | None, file_type: str
+    ) -> requests.Response:
+        return await asyncio.to_thread(self.sync.put_file, path, path_api, file_type)
@@ -0,0 +1,31 @@
+from pathlib import Path
+from typing import Any
+
+import requests
+
+from fetcher.api import model, worker
+
+class AsyncAPI:
+    sync: worker.API
+    def __init__(self, api: worker.API) -> None: ...
+    @property
+    def retry_after(self) -> float | None: ...
+    async def fetch_jobs(self, **kwargs: Any) -> dict[str, model.JobSpecs]: ...
+    async def get_file(
+        self, file_id: str, path: Path, **kwargs: Any
+    ) -> requests.Response: ...
+    async def put_statuses(self, statuses: dict[str, Any]) -> dict[str, str]: ...
+    def job(self, job_id: str) -> AsyncJobAPI: ...
+
+class AsyncJobAPI:
+    sync: worker.JobAPI
+    def __init__(self, api: worker.JobAPI) -> None: ...
+    async def ping(
+        self, status: str, exit_code: int | None = None, body: str | None = None
+    ) -> requests.Response: ...
+    async def get_file(
+        self, file_id: str, path: Path, **kwargs: Any
+    ) -> requests.Response: ...
+    async def put_file(
+        self, path: Path, path_api: str | Path | None, file_type: str
+    ) -> requests.Response: ...
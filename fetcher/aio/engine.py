@@ -0,0 +1,640 @@
+import asyncio
+import contextlib
+import functools
+import shutil
+import time
+from concurrent import futures
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar, cast
+
+import docker
+import docker.errors
+import docker.models
+import docker.models.containers
+import docker.types
+import requests
+from loguru import logger
+from pydantic import BaseModel
+from requests.exceptions import HTTPError
+
+from fetcher import io, metrics, tracing
+from fetcher.aio import transfer
+from fetcher.aio.api import AsyncAPI, AsyncJobAPI
+from fetcher.aio.reporter import JobNotFoundError, StatusReporter
+from fetcher.api import model
+from fetcher.docker import images, manager
+from fetcher.info import sys
+from fetcher.scheduling import backoff, gpus, journal, slots
+from fetcher.status import events
+
+_T = TypeVar("_T")
+
+# how long to wait for a killed container to exit
+_STOP_TIMEOUT = 30
+
+
+class EngineConfig(BaseModel):
+    path_base: Path
+    path_host_base: Path
+    timeout_job: float = 10
+    timeout_job_min: float = 1
+    job_long_poll: int = 0
+    timeout_status: float = 10
+    lookahead: int = 0
+    n_download_workers: int = 4
+    n_upload_workers: int = 4
+    upload_retries: int = 2
+    upload_interval: float = 0
+    bundle_threshold: int = 0
+    n_threads: int | None = None
+
+
+def _job_not_found(e: Exception) -> bool:
+    if isinstance(e, JobNotFoundError):
+        return True
+    if isinstance(e, io.transfer.TransferError):
+        return any(_job_not_found(err) for err in e.errors.values())
+    return (
+        isinstance(e, HTTPError)
+        and e.response is not None
+        and e.response.status_code == 404
+    )
+
+
+async def _kill_container(
+    container: docker.models.containers.Container, e: Exception
+) -> None:
+    logger.warning(f"Stopping container {container.id}: {e!r}")
+    try:
+        await asyncio.to_thread(_docker_call, "kill", container.kill)
+    except docker.errors.APIError:
+        pass  # it already exited
+
+
+async def _stop_container(
+    container: docker.models.containers.Container, e: Exception
+) -> None:
+    """Kill the container and wait for it to exit."""
+    await _kill_container(container, e)
+    try:
+        await asyncio.to_thread(
+            _docker_call,
+            "wait",
+            functools.partial(container.wait, timeout=_STOP_TIMEOUT),
+        )
+    except (docker.errors.APIError, requests.RequestException) as e_wait:
+        logger.error(f"Container {container.id} did not exit: {e_wait!r}")
+
+
+def _docker_call(name: str, call: Callable[[], _T]) -> _T:
+    with tracing.span(f"docker.{name}"):
+        return call()
+
+
+@contextlib.contextmanager
+def _phase(phase: str, trace_id: str | None = None) -> Iterator[None]:
+    """Time a phase of the jobs, in the metrics and as a span."""
+    with metrics.phase_seconds.time(phase=phase), tracing.span(phase, trace_id):
+        yield
+
+
+def _members(files: list[io.files.PathAPIUp]) -> list[io.files.PathAPIUp]:
+    """The files uploaded by pushing `files`, some of which may be bundles."""
+    return [
+        member
+        for f in files
+        for member in (f.files if isinstance(f, io.files.PathAPIBundle) else [f])
+    ]
+
+
+class Engine:
+    def __init__(
+        self,
+        config: EngineConfig,
+        api: AsyncAPI,
+        slot_pool: slots.SlotPool,
+        watcher: events.ContainerWatcher,
+        client: docker.DockerClient | None = None,
+        cache: io.cache.FileCache | None = None,
+        image_cache: images.ImageCache | None = None,
+        prefetcher: images.Prefetcher | None = None,
+        job_journal: journal.JobJournal | None = None,
+        gpu_allocator: gpus.GPUAllocator | None = None,
+    ):
+        """Fetches and processes jobs, all driven by one event loop.
+
+        Each job is a task; the heartbeats of all jobs are sent by one more
+        task, and waiting for a container takes no thread. Blocking calls (HTTP
+        requests, Docker API, file system) run in the loop's default executor,
+        which `run` bounds to `config.n_threads` threads.
+
+        A job runs once it holds a slot and, if it asks for one, a GPU of
+        `gpu_allocator` (default: none).
+        """
+        self.config = config
+        self.api = api
+        self._slot_pool = slot_pool
+        self._watcher = watcher
+        self._client = client if client is not None else docker.from_env()
+        self._cache = cache
+        self._image_cache = image_cache
+        self._prefetcher = prefetcher
+        self._journal = job_journal
+        self._gpus = (
+            gpu_allocator if gpu_allocator is not None else gpus.GPUAllocator([])
+        )
+        # notified when a slot or a GPU is freed
+        self._slot_freed = asyncio.Condition()
+        # sends the transitions of all jobs, and their heartbeats in one request
+        self.reporter = StatusReporter(api, interval=config.timeout_status)
+        metrics.slots_total.set(slot_pool.n_total)
+
+    @property
+    def max_jobs(self) -> int:
+        """Jobs in progress at once: one per slot, plus those being staged."""
+        return self._slot_pool.n_total + self.config.lookahead
+
+    @property
+    def n_threads(self) -> int:
+        if self.config.n_threads is not None:
+            return self.config.n_threads
+        # transfers and heartbeat of each job, plus the fetch requests
+        n_transfers = max(self.config.n_download_workers, self.config.n_upload_workers)
+        return self.max_jobs * (n_transfers + 2) + 2
+
+    async def run(self) -> None:
+        """Fetch jobs and process them, forever."""
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(futures.ThreadPoolExecutor(self.n_threads))
+        idle_backoff = backoff.Backoff(
+            base=self.config.timeout_job_min, maximum=self.config.timeout_job
+        )
+        running: set[asyncio.Task[None]] = set()
+        if self._journal is not None:
+            # jobs that were in progress when the worker stopped
+            for entry in await asyncio.to_thread(self._journal.entries):
+                logger.info(f"Resuming job {entry.job_id} ({entry.phase}).")
+                running.add(
+                    asyncio.create_task(
+                        self._run_or_fail(entry.job_id, entry.job, resume=entry)
+                    )
+                )
+        while True:
+            # jobs report their own errors, see `_run_or_fail`: these are bugs
+            for task in [t for t in running if t.done()]:
+                running.remove(task)
+                task.result()
+
+            if len(running) >= self.max_jobs:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            start = time.perf_counter()
+            try:
+                with _phase("fetch", trace_id="worker"):
+                    jobs = await self.api.fetch_jobs(
+                        limit=1,
+                        wait=self.config.job_long_poll or None,
+                        **self._slot_pool.peek().fetch_kwargs(),
+                        **self._gpus.fetch_kwargs(),
+                    )
+            except requests.RequestException as e:
+                if not io.transfer.is_transient(e):
+                    raise
+                # e.g., the API is down: back off like on an empty queue
+                delay = idle_backoff.next()
+                logger.warning(
+                    f"Fetching jobs failed ({e!r}). Retrying in {delay:.1f} seconds."
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if len(jobs) == 0:
+                delay = idle_backoff.next(retry_after=self.api.retry_after)
+                logger.info(f"No job found. Sleeping for {delay:.1f} seconds.")
+                await asyncio.sleep(delay)
+                # including the long poll, if any
+                metrics.idle_seconds.inc(time.perf_counter() - start)
+                continue
+            idle_backoff.reset()
+
+            if len(jobs) >= 2:
+                raise ValueError(f"Expected only one job, got {len(jobs)}")
+
+            job_id, job = jobs.popitem()
+            logger.info(f"Pulled job {job_id}.")
+            if self._prefetcher is not None:
+                # pull the image while the inputs are downloaded
+                self._prefetcher.add(job.handler.image_url)
+            running.add(asyncio.create_task(self._run_or_fail(job_id, job)))
+
+    async def _run_or_fail(
+        self,
+        job_id: str,
+        job: model.JobSpecs,
+        resume: journal.JournalEntry | None = None,
+    ) -> None:
+        """Run a job, and report it as failed if it raises, without stopping."""
+        try:
+            await self.run_job(job_id, job, resume)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed: {e!r}")
+            metrics.jobs_total.inc(status="error")
+            try:
+                await self.api.job(job_id).ping(
+                    status="error", exit_code=None, body=f"Worker error: {e!r}"[:1000]
+                )
+            except Exception as e_ping:
+                logger.error(f"Could not report job {job_id} as failed: {e_ping!r}")
+                if self._journal is not None:
+                    # resumed after a restart
+                    return
+            if self._journal is not None:
+                await asyncio.to_thread(self._journal.remove, job_id)
+            await asyncio.to_thread(
+                shutil.rmtree, self.config.path_base / job_id, ignore_errors=True
+            )
+
+    async def run_job(
+        self,
+        job_id: str,
+        job: model.JobSpecs,
+        resume: journal.JournalEntry | None = None,
+    ) -> None:
+        """Process a job from download to upload.
+
+        The inputs and image are staged first; only then does the job wait for a
+        slot to run in. The slot is freed as soon as the container exits, so that
+        the next staged job can start while this one is uploaded.
+
+        With `resume`, the job continues from the phase recorded in the journal:
+        inputs are not downloaded again, the container is re-attached to if it
+        still exists, and only the outputs not uploaded yet are uploaded.
+        """
+        with tracing.span("job", trace_id=job_id, resumed=resume is not None):
+            await self._run_job(job_id, job, resume)
+
+    async def _run_job(
+        self,
+        job_id: str,
+        job: model.JobSpecs,
+        resume: journal.JournalEntry | None,
+    ) -> None:
+        config = self.config
+        container = None
+        container_exit = None
+        slot = None
+        gpus_job: list[sys.GPUInfo] = []
+        path_job = config.path_base / job_id
+        api_job = self.api.job(job_id)
+        self.reporter.start()
+        try:
+            if not self._gpus.satisfiable(job.hardware):
+                # would wait for a GPU forever
+                logger.error(f"No GPU of this worker fits job {job_id}")
+                body = f"No GPU fits {job.hardware.gpu_model} {job.hardware.gpu_mem}"
+                await api_job.ping(status="error", exit_code=None, body=body)
+                metrics.jobs_total.inc(status="error")
+                return
+            if resume is None and self._journal is not None:
+                await asyncio.to_thread(self._journal.add, job_id, job)
+            await self.reporter.report(api_job, "preprocessing")
+            logger.info(f"Preprocessing job {job_id}")
+
+            handler = job.handler
+            files_up = [
+                io.files.PathAPIUp(path_job / p, f_type, path_job, api_job.sync)
+                for f_type, p in (handler.files_up or {}).items()
+            ]
+            files_down = [
+                io.files.PathAPIDown(
+                    path_job / p, p_id, api_job.sync, cache=self._cache
+                )
+                for p, p_id in (handler.files_down or {}).items()
+            ]
+
+            if resume is None or not resume.reached("staged"):
+                with _phase("download"):
+                    await transfer.get_all(
+                        files_down, max_workers=config.n_download_workers
+                    )
+                await self._record(job_id, "staged")
+            [p.mkdir(exist_ok=True, parents=True) for p in files_up]
+            # records what was uploaded, in case postprocessing is retried
+            manifest = await asyncio.to_thread(
+                io.manifest.UploadManifest, path_job / ".manifest.json"
+            )
+            tracker = io.watch.UploadTracker(files_up, manifest)
+            self._raise_if_deleted(job_id)
+
+            if resume is not None and resume.container_id is not None:
+                container = await asyncio.to_thread(
+                    self._get_container, resume.container_id
+                )
+            if resume is not None and resume.reached("postprocessing"):
+                assert resume.exit_code is not None
+                container_exit = events.ContainerExit(
+                    exit_code=resume.exit_code, oom_killed=resume.oom_killed
+                )
+            elif container is not None:
+                # the slot and GPUs the container was started with
+                slot, gpus_job = await self._acquire_slot(
+                    job.hardware,
+                    gpu_uuids=_container_gpus(container),
+                    slot_index=self._slot_pool.index_of(_container_cpus(container)),
+                )
+                logger.info(f"Re-attaching to job {job_id} in slot {slot.index}")
+            else:
+                docker_manager = manager.Manager(
+                    image=handler.image_url,
+                    client=self._client,
+                    image_cache=self._image_cache,
+                )
+                with _phase("pull"):
+                    await asyncio.to_thread(docker_manager.pull)
+
+                slot, gpus_job = await self._acquire_slot(job.hardware)
+                logger.info(f"Starting job {job_id} in slot {slot.index}")
+                container = await self._run_container(
+                    docker_manager, job, path_job, slot, gpus_job
+                )
+                await self._record(job_id, "running", container_id=str(container.id))
+
+            if container_exit is None:
+                assert container is not None and slot is not None
+                with _phase("run"):
+                    container_exit = await self._wait_container(
+                        job_id, api_job, container, tracker, path_job
+                    )
+                await self._release_slot(slot, gpus_job)
+                slot = None
+                await self._record(
+                    job_id,
+                    "postprocessing",
+                    exit_code=container_exit.exit_code,
+                    oom_killed=container_exit.oom_killed,
+                )
+            exit_code = container_exit.exit_code
+            logger.info(f"Job {job_id} finished with exit code {exit_code}")
+            logger.info(f"Postprocessing job {job_id}")
+
+            # upload result
+            await self.reporter.report(api_job, "postprocessing")
+            # only what was not uploaded while the container was running
+            with _phase("upload"):
+                await self._push(
+                    await asyncio.to_thread(tracker.pending), tracker, path_job
+                )
+            self.reporter.remove(job_id)
+
+            if exit_code == 0:
+                await api_job.ping(status="finished", exit_code=0, body="")
+                metrics.jobs_total.inc(status="finished")
+            else:
+                logs = ""
+                if container is not None:
+                    logs = str(
+                        await asyncio.to_thread(_docker_call, "logs", container.logs)
+                    )
+                print(logs)
+                logs = f"Logs:\n{logs[-1000:]}"
+                if container_exit.oom_killed:
+                    logs = f"Out of memory.\n{logs}"
+                await api_job.ping(status="error", exit_code=exit_code, body=logs)
+                metrics.jobs_total.inc(status="error")
+
+        except Exception as e:
+            if not _job_not_found(e):
+                if container is not None and container_exit is None:
+                    # its slot and directory must not be reused while it runs
+                    await _stop_container(container, e)
+                raise e
+            logger.warning(
+                f"Job {job_id} not found; it was probably deleted by the user."
+            )
+            metrics.jobs_total.inc(status="deleted")
+            if container and container.status == "running":
+                await asyncio.to_thread(_docker_call, "kill", container.kill)
+        finally:
+            self.reporter.remove(job_id)
+            if slot is not None:
+                await self._release_slot(slot, gpus_job)
+
+        if self._journal is not None:
+            await asyncio.to_thread(self._journal.remove, job_id)
+        logger.info(f"Job {job_id} finished")
+        await asyncio.to_thread(shutil.rmtree, path_job)
+
+    async def _run_container(
+        self,
+        docker_manager: manager.Manager,
+        job: model.JobSpecs,
+        path_job: Path,
+        slot: slots.Slot,
+        gpus_job: list[sys.GPUInfo],
+    ) -> docker.models.containers.Container:
+        # here we need the paths on the host, we can not do this recursively
+        path_mnt = self.config.path_host_base / path_job.relative_to(
+            self.config.path_base
+        )
+        mounts = [
+            docker.types.Mount(
+                "/files",
+                str(path_mnt),
+                type="bind",
+                read_only=False,
+            ),
+        ]
+        return cast(
+            docker.models.containers.Container,
+            await asyncio.to_thread(
+                docker_manager.run,
+                command=job.app.cmd,
+                environment=job.app.env,
+                mounts=mounts,
+                detach=True,
+                ipc_mode="host",
+                **self._resource_kwargs(slot, job.hardware, gpus_job),
+            ),
+        )
+
+    def _get_container(
+        self, container_id: str
+    ) -> docker.models.containers.Container | None:
+        try:
+            with tracing.span("docker.get"):
+                return self._client.containers.get(container_id)
+        except docker.errors.NotFound:
+            return None
+
+    async def _wait_container(
+        self,
+        job_id: str,
+        api_job: AsyncJobAPI,
+        container: docker.models.containers.Container,
+        tracker: io.watch.UploadTracker,
+        path_job: Path,
+    ) -> events.ContainerExit:
+        """Wait for the container to exit, uploading its completed outputs."""
+        # if a heartbeat finds that the job was deleted, the container is stopped
+        await self.reporter.report(
+            api_job, "running", on_error=functools.partial(_kill_container, container)
+        )
+        uploader = None
+        upload_stop = asyncio.Event()
+        logger.info(f"Running job {job_id}")
+        try:
+            if self.config.upload_interval > 0:
+                uploader = asyncio.create_task(
+                    self._upload_while_running(tracker, path_job, upload_stop)
+                )
+            container_exit = await self._watcher.wait_async(container)
+            upload_stop.set()
+            if uploader is not None:
+                await uploader
+        finally:
+            if uploader is not None and not uploader.done():
+                uploader.cancel()
+        self._raise_if_deleted(job_id)
+        return container_exit
+
+    def _raise_if_deleted(self, job_id: str) -> None:
+        exception = self.reporter.exception(job_id)
+        if exception is not None:
+            raise exception
+
+    async def _record(self, job_id: str, phase: journal.Phase, **kwargs: Any) -> None:
+        if self._journal is not None:
+            await asyncio.to_thread(self._journal.update, job_id, phase, **kwargs)
+
+    async def _upload_while_running(
+        self,
+        tracker: io.watch.UploadTracker,
+        path_job: Path,
+        stop: asyncio.Event,
+    ) -> None:
+        """Upload the files the container completed, every `upload_interval`."""
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.config.upload_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            files = await asyncio.to_thread(tracker.stable)
+            if not files:
+                continue
+            try:
+                await self._push(files, tracker, path_job)
+            except io.transfer.TransferError as e:
+                # left for the next round, or the final upload
+                logger.warning(f"Upload while running failed: {e!r}")
+
+    async def _push(
+        self,
+        files: list[io.files.PathAPIUp],
+        tracker: io.watch.UploadTracker,
+        path_job: Path,
+    ) -> None:
+        """Upload files selected by `tracker`, and mark those that succeeded."""
+        to_push = files
+        if self.config.bundle_threshold > 0:
+            to_push = await asyncio.to_thread(
+                io.files.bundle_small,
+                files,
+                tracker.dirs_up,
+                self.config.bundle_threshold,
+                path_job / ".bundles",
+            )
+        try:
+            await transfer.push_all(
+                to_push,
+                max_workers=self.config.n_upload_workers,
+                retries=self.config.upload_retries,
+            )
+        except io.transfer.TransferError as e:
+            pushed = [f for f in to_push if str(f) not in e.errors]
+            await asyncio.to_thread(tracker.mark_uploaded, _members(pushed))
+            raise
+        await asyncio.to_thread(tracker.mark_uploaded, _members(to_push))
+
+    def _resource_kwargs(
+        self,
+        slot: slots.Slot,
+        hardware: model.HardwareSpecs,
+        gpus_job: list[sys.GPUInfo],
+    ) -> dict[str, Any]:
+        """Limit the container to the CPUs, memory and GPUs the job asks for.
+
+        The CPUs are pinned within the slot (and its NUMA nodes), so that jobs
+        in other slots and the fetcher do not compete for them.
+        """
+        kwargs: dict[str, Any] = {}
+        if gpus_job:
+            kwargs["device_requests"] = [
+                docker.types.DeviceRequest(
+                    device_ids=[gpu.uuid for gpu in gpus_job],
+                    capabilities=[["gpu"]],
+                )
+            ]
+        cpu_cores = min(hardware.cpu_cores or slot.cpu_cores, slot.cpu_cores)
+        memory = min(hardware.memory or slot.memory, slot.memory)
+        if slot.cpus:
+            kwargs["cpuset_cpus"] = sys.format_cpulist(slot.cpus[:cpu_cores])
+            if slot.mems:
+                kwargs["cpuset_mems"] = sys.format_cpulist(slot.mems)
+        elif self._slot_pool.n_total > 1:
+            kwargs["nano_cpus"] = cpu_cores * 10**9
+        if slot.cpus or self._slot_pool.n_total > 1:
+            # without swap, which would slow down the other jobs
+            kwargs["mem_limit"] = kwargs["memswap_limit"] = f"{memory}m"
+        return kwargs
+
+    async def _acquire_slot(
+        self,
+        hardware: model.HardwareSpecs,
+        gpu_uuids: list[str] | None = None,
+        slot_index: int | None = None,
+    ) -> tuple[slots.Slot, list[sys.GPUInfo]]:
+        """Wait for a free slot and, if the job needs one, a free GPU.
+        :param gpu_uuids: GPUs to claim instead, e.g., of a re-attached job.
+        :param slot_index: Slot to wait for rather than any, e.g., the one whose
+            CPUs a re-attached job is pinned to.
+        """
+        async with self._slot_freed:
+            with _phase("slot"):
+                await self._slot_freed.wait_for(
+                    lambda: self._slot_pool.is_free(slot_index)
+                    and (gpu_uuids is not None or self._gpus.can_allocate(hardware))
+                )
+            slot = self._slot_pool.acquire(index=slot_index)
+            assert slot is not None
+            if gpu_uuids is not None:
+                gpus_job = self._gpus.claim(gpu_uuids)
+            else:
+                allocated = self._gpus.allocate(hardware)
+                assert allocated is not None
+                gpus_job = allocated
+            metrics.slots_busy.set(self._slot_pool.n_total - self._slot_pool.n_free)
+            return slot, gpus_job
+
+    async def _release_slot(
+        self, slot: slots.Slot, gpus_job: list[sys.GPUInfo]
+    ) -> None:
+        async with self._slot_freed:
+            self._slot_pool.release(slot)
+            self._gpus.release(gpus_job)
+            metrics.slots_busy.set(self._slot_pool.n_total - self._slot_pool.n_free)
+            # a freed GPU may let a job other than the first waiting one run
+            self._slot_freed.notify_all()
+
+
+def _container_cpus(container: docker.models.containers.Container) -> list[int]:
+    """CPUs a container is pinned to, if any."""
+    cpuset = (container.attrs.get("HostConfig") or {}).get("CpusetCpus") or ""
+    return sys.parse_cpulist(cpuset)
+
+
+def _container_gpus(container: docker.models.containers.Container) -> list[str]:
+    """UUIDs of the GPUs a container was started with."""
+    requests = (container.attrs.get("HostConfig") or {}).get("DeviceRequests") or []
+    return [uuid for request in requests for uuid in request.get("DeviceIDs") or []]
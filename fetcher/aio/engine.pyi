@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import docker
+from pydantic import BaseModel
+
+from fetcher import io
+from fetcher.aio.api import AsyncAPI
+from fetcher.aio.reporter import StatusReporter
+from fetcher.api import model
+from fetcher.docker import images
+from fetcher.scheduling import gpus, journal, slots
+from fetcher.status import events
+
+class EngineConfig(BaseModel):
+    path_base: Path
+    path_host_base: Path
+    timeout_job: float = ...
+    timeout_job_min: float = ...
+    job_long_poll: int = ...
+    timeout_status: float = ...
+    lookahead: int = ...
+    n_download_workers: int = ...
+    n_upload_workers: int = ...
+    upload_retries: int = ...
+    upload_interval: float = ...
+    bundle_threshold: int = ...
+    n_threads: int | None = ...
+
+class Engine:
+    config: EngineConfig
+    api: AsyncAPI
+    reporter: StatusReporter
+    def __init__(
+        self,
+        config: EngineConfig,
+        api: AsyncAPI,
+        slot_pool: slots.SlotPool,
+        watcher: events.ContainerWatcher,
+        client: docker.DockerClient | None = None,
+        cache: io.cache.FileCache | None = None,
+        image_cache: images.ImageCache | None = None,
+        prefetcher: images.Prefetcher | None = None,
+        job_journal: journal.JobJournal | None = None,
+        gpu_allocator: gpus.GPUAllocator | None = None,
+    ) -> None: ...
+    @property
+    def max_jobs(self) -> int: ...
+    @property
+    def n_threads(self) -> int: ...
+    async def run(self) -> None: ...
+    async def run_job(
+        self,
+        job_id: str,
+        job: model.JobSpecs,
+        resume: journal.JournalEntry | None = None,
+    ) -> None: ...
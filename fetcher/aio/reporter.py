@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+from typing import Awaitable, Callable
+
+import requests
+from loguru import logger
+
+from fetcher.aio.api import AsyncAPI, AsyncJobAPI
+from fetcher.models import Status
+
+
+class JobNotFoundError(Exception):
+    """The API does not know the job (anymore), e.g. because it was deleted."""
+
+
+class _Reported:
+    def __init__(
+        self,
+        api_job: AsyncJobAPI,
+        status: Status,
+        on_error: Callable[[Exception], Awaitable[None]] | None,
+    ):
+        self.api_job = api_job
+        self.status = status
+        self.on_error = on_error
+        self.exception: Exception | None = None
+
+
+class StatusReporter:
+    def __init__(self, api: AsyncAPI, interval: float = 60):
+        """Reports the status of all jobs of the worker.
+
+        Status transitions are sent right away, with their details. In between,
+        the statuses of all jobs are sent as heartbeats every `interval` seconds,
+        with a single batched request (`PUT /jobs/status`), or one request per
+        job if the API does not support it.
+        """
+        self.api = api
+        self.interval = interval
+        self._jobs: dict[str, _Reported] = {}
+        self._batched = True
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+    async def report(
+        self,
+        api_job: AsyncJobAPI,
+        status: Status,
+        exit_code: int | None = None,
+        body: str | None = None,
+        on_error: Callable[[Exception], Awaitable[None]] | None = None,
+    ) -> None:
+        """Send a status transition, then keep the job alive until `remove`.
+        :param on_error: Called if a heartbeat finds that the job was deleted.
+        :raises requests.HTTPError: If the job was not found.
+        """
+        job_id = api_job.sync.job_id
+        self._jobs[job_id] = _Reported(api_job, status, on_error)
+        try:
+            await api_job.ping(status, exit_code, body)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                raise
+            # the next heartbeat sends the status again
+            logger.warning(f"Could not report status {status} of job {job_id}: {e!r}")
+        except requests.RequestException as e:
+            logger.warning(f"Could not report status {status} of job {job_id}: {e!r}")
+
+    def exception(self, job_id: str) -> Exception | None:
+        """The error that stopped the heartbeats of the job, if any."""
+        reported = self._jobs.get(job_id)
+        return reported.exception if reported is not None else None
+
+    def remove(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Status heartbeat failed: {e!r}")
+
+    async def heartbeat(self) -> None:
+        """Send the status of all jobs that are still alive."""
+        jobs = {k: v for k, v in self._jobs.items() if v.exception is None}
+        if not jobs:
+            return
+        if self._batched:
+            try:
+                results = await self.api.put_statuses(
+                    {job_id: reported.status for job_id, reported in jobs.items()}
+                )
+            except requests.HTTPError as e:
+                # e.g., 404, 405 or 422 from an API without the batched endpoint;
+                # jobs not found are in the results instead
+                if e.response is None or not 400 <= e.response.status_code < 500:
+                    raise
+                logger.info("Batched status not supported, reporting job by job.")
+                self._batched = False
+            else:
+                for job_id, result in results.items():
+                    if result == "not_found" and job_id in jobs:
+                        await self._fail(jobs[job_id], JobNotFoundError(job_id))
+                return
+        for reported in jobs.values():
+            try:
+                await reported.api_job.ping(reported.status, None, None)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    await self._fail(reported, e)
+                else:
+                    logger.warning(f"Status heartbeat failed: {e!r}")
+
+    async def _fail(self, reported: _Reported, e: Exception) -> None:
+        reported.exception = e
+        if reported.on_error is not None:
+            await reported.on_error(e)
@@ -0,0 +1,23 @@
+from typing import Awaitable, Callable
+
+from fetcher.aio.api import AsyncAPI, AsyncJobAPI
+
+class JobNotFoundError(Exception): ...
+
+class StatusReporter:
+    api: AsyncAPI
+    interval: float
+    def __init__(self, api: AsyncAPI, interval: float = 60) -> None: ...
+    def start(self) -> None: ...
+    async def stop(self) -> None: ...
+    async def report(
+        self,
+        api_job: AsyncJobAPI,
+        status: str,
+        exit_code: int | None = None,
+        body: str | None = None,
+        on_error: Callable[[Exception], Awaitable[None]] | None = None,
+    ) -> None: ...
+    def exception(self, job_id: str) -> Exception | None: ...
+    def remove(self, job_id: str) -> None: ...
+    async def heartbeat(self) -> None: ...
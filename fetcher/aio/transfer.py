@@ -0,0 +1,71 @@
+import asyncio
+from typing import Callable, Sequence, TypeVar
+
+import requests
+from loguru import logger
+
+from fetcher.io.files import PathAPIDown, PathAPIUp
+from fetcher.io.transfer import TransferError, is_transient
+
+_T = TypeVar("_T")
+
+
+async def get_all(
+    files: Sequence[PathAPIDown], max_workers: int = 4, retries: int = 2
+) -> list[requests.Response | None]:
+    """Download all files, with at most `max_workers` in flight.
+
+    The downloads run in the loop's default executor. A download that fails
+    with a transient error (see `io.transfer.is_transient`), e.g., once it ran
+    out of resumes, is retried up to `retries` times with a new download URL.
+    Every download is attempted even if some fail; failures are then raised
+    together as a `TransferError`.
+    """
+    return await _run_all({str(f): f.get for f in files}, max_workers, retries)
+
+
+async def push_all(
+    files: Sequence[PathAPIUp], max_workers: int = 4, retries: int = 2
+) -> list[requests.Response]:
+    """Upload all files, with at most `max_workers` in flight.
+
+    Like `get_all`, with a new upload URL for each retry.
+    """
+    return await _run_all({str(f): f.push for f in files}, max_workers, retries)
+
+
+async def _with_retries(task: Callable[[], _T], name: str, retries: int) -> _T:
+    attempt = 0
+    while True:
+        try:
+            return await asyncio.to_thread(task)
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            attempt += 1
+            logger.warning(f"Transfer of {name} failed ({e!r}), retry {attempt}.")
+            await asyncio.sleep(2**attempt)
+
+
+async def _run_all(
+    tasks: dict[str, Callable[[], _T]], max_workers: int, retries: int = 0
+) -> list[_T]:
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(name: str, task: Callable[[], _T]) -> _T:
+        async with semaphore:
+            return await _with_retries(task, name, retries)
+
+    results = await asyncio.gather(
+        *(run(name, task) for name, task in tasks.items()), return_exceptions=True
+    )
+    errors: dict[str, Exception] = {}
+    for name, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.error(f"Transfer of {name} failed: {result!r}")
+            errors[name] = result
+        elif isinstance(result, BaseException):
+            raise result
+    if errors:
+        raise TransferError(errors)
+    return [r for r in results if not isinstance(r, BaseException)]
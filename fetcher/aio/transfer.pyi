@@ -0,0 +1,12 @@
+from typing import Sequence
+
+import requests
+
+from fetcher.io.files import PathAPIDown, PathAPIUp
+
+async def get_all(
+    files: Sequence[PathAPIDown], max_workers: int = 4, retries: int = 2
+) -> list[requests.Response | None]: ...
+async def push_all(
+    files: Sequence[PathAPIUp], max_workers: int = 4, retries: int = 2
+) -> list[requests.Response]: ...
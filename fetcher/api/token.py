@@ -1,14 +1,23 @@
 import abc
 import datetime
+import json
+import os
+import threading
+from pathlib import Path
 from typing import Any
 
 import boto3
+import botocore.exceptions
+from loguru import logger
 
-from fetcher.session import session
+from fetcher import transport
+
+# between background refreshes, however short-lived the tokens
+_MIN_REFRESH_DELAY = 10.0
 
 
 def get_access_info(api_url: str) -> dict[str, Any]:
-    response = session.get(f"{api_url}/access_info")
+    response = transport.auth.get(f"{api_url}/access_info")
     return response.json()  # type: ignore
 
 
@@ -36,33 +45,140 @@ class AccessTokenAuth(AccessToken):
         username: str,
         password: str,
         min_validity: int = 300,
+        path_cache: Path | None = None,
     ):
-        """Token that is refreshed automatically when it is close to expiry."""
+        """Token that is refreshed automatically when it is close to expiry.
+
+        Once `start`ed, a background thread refreshes the token a minute before
+        `access_token` would have to, or halfway through its lifetime if that
+        is sooner, so that requests do not wait for Cognito.
+        Refreshes use the refresh token, and only fall back to the password when
+        it is rejected (e.g., expired). A lock ensures that only one refresh runs
+        at a time.
+
+        :param path_cache: File to keep the tokens in (readable by the owner
+            only), so that a restarted worker can skip authentication.
+        """
         self._client_id = client_id
         self._username = username
         self._password = password
         self._min_validity = min_validity
+        self._path_cache = path_cache
         self._cognito_client = boto3.client("cognito-idp", region_name=region)
-        self._refresh()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresh_token: str | None = None
+        self._expiry = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+        # of the current token, in seconds
+        self._lifetime = 0.0
+        if not self._load_cache() or self._remaining() < self._min_validity:
+            self._refresh()
 
     @property
     def access_token(self) -> str:
-        if self._expiry < datetime.datetime.now(
-            tz=datetime.timezone.utc
-        ) + datetime.timedelta(seconds=self._min_validity):
-            self._refresh()
-        return self._access_token
+        with self._lock:
+            # only if the background refresh is not running, or failed
+            if self._remaining() < self._min_validity:
+                self._refresh()
+            return self._access_token
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._thread.join()
+
+    def _remaining(self) -> float:
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        return (self._expiry - now).total_seconds()
+
+    def _refresh_ahead(self) -> float:
+        # a minute before `access_token` would refresh the token itself, unless
+        # the tokens are too short-lived for that
+        return min(self._min_validity + 60, self._lifetime / 2)
+
+    def _refresh_loop(self) -> None:
+        while True:
+            delay = self._remaining() - self._refresh_ahead()
+            if self._stop_event.wait(timeout=max(_MIN_REFRESH_DELAY, delay)):
+                return
+            try:
+                with self._lock:
+                    if self._remaining() < self._refresh_ahead():
+                        self._refresh()
+            except Exception as e:
+                logger.warning(f"Token refresh failed ({e!r}), retrying.")
+                if self._stop_event.wait(timeout=10):
+                    return
 
     def _refresh(self) -> None:
-        response = self._cognito_client.initiate_auth(
-            AuthFlow="USER_PASSWORD_AUTH",
-            AuthParameters={
-                "USERNAME": self._username,
-                "PASSWORD": self._password,
-            },
-            ClientId=self._client_id,
-        )
-        self._access_token: str = response["AuthenticationResult"]["IdToken"]
+        response = None
+        if self._refresh_token is not None:
+            try:
+                response = self._cognito_client.initiate_auth(
+                    AuthFlow="REFRESH_TOKEN_AUTH",
+                    AuthParameters={"REFRESH_TOKEN": self._refresh_token},
+                    ClientId=self._client_id,
+                )
+            except botocore.exceptions.ClientError as e:
+                logger.info(f"Refresh token rejected ({e!r}), authenticating again.")
+                self._refresh_token = None
+        if response is None:
+            response = self._cognito_client.initiate_auth(
+                AuthFlow="USER_PASSWORD_AUTH",
+                AuthParameters={
+                    "USERNAME": self._username,
+                    "PASSWORD": self._password,
+                },
+                ClientId=self._client_id,
+            )
+        result = response["AuthenticationResult"]
+        self._access_token: str = result["IdToken"]
+        # not returned by REFRESH_TOKEN_AUTH: the previous one stays valid
+        self._refresh_token = result.get("RefreshToken", self._refresh_token)
+        self._lifetime = float(result["ExpiresIn"])
         self._expiry = datetime.datetime.now(
             tz=datetime.timezone.utc
-        ) + datetime.timedelta(seconds=response["AuthenticationResult"]["ExpiresIn"])
+        ) + datetime.timedelta(seconds=self._lifetime)
+        self._save_cache()
+
+    def _load_cache(self) -> bool:
+        if self._path_cache is None or not self._path_cache.exists():
+            return False
+        try:
+            cached = json.loads(self._path_cache.read_text())
+            if (cached["client_id"], cached["username"]) != (
+                self._client_id,
+                self._username,
+            ):
+                return False
+            self._access_token = cached["access_token"]
+            self._refresh_token = cached["refresh_token"]
+            self._expiry = datetime.datetime.fromisoformat(cached["expiry"])
+            # at least what is left of it
+            self._lifetime = max(0.0, self._remaining())
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring token cache {self._path_cache}: {e!r}")
+            return False
+        return True
+
+    def _save_cache(self) -> None:
+        if self._path_cache is None:
+            return
+        cached = {
+            "client_id": self._client_id,
+            "username": self._username,
+            "access_token": self._access_token,
+            "refresh_token": self._refresh_token,
+            "expiry": self._expiry.isoformat(),
+        }
+        self._path_cache.parent.mkdir(parents=True, exist_ok=True)
+        path_tmp = self._path_cache.with_suffix(".tmp")
+        path_tmp.unlink(missing_ok=True)
+        fd = os.open(path_tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(cached, f)
+        path_tmp.replace(self._path_cache)
@@ -1,4 +1,6 @@
 import abc
+import datetime
+from pathlib import Path
 from typing import Any
 
 class AccessToken(abc.ABC):
@@ -12,6 +14,7 @@ class AccessTokenFixed(AccessToken):
     def access_token(self) -> str: ...
 
 class AccessTokenAuth(AccessToken):
+    _expiry: datetime.datetime
     def __init__(
         self,
         client_id: str,
@@ -19,9 +22,12 @@ class AccessTokenAuth(AccessToken):
         username: str,
         password: str,
         min_validity: int = 300,
+        path_cache: Path | None = None,
     ) -> None: ...
     @property
     def access_token(self) -> str: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
     def _refresh(self) -> None: ...
 
 def get_access_info(api_url: str) -> dict[str, Any]: ...
@@ -1,18 +1,38 @@
 import os
+import time
+from concurrent import futures
 from pathlib import Path
 from typing import Any
 
 import requests
+from loguru import logger
 
+from fetcher import metrics, transport
 from fetcher.api import model, token
 from fetcher.models import FileType, Status
-from fetcher.session import session
+from fetcher.scheduling import backoff
 
 
 class API:
-    def __init__(self, base_url: str, access_token: token.AccessToken | None = None):
+    def __init__(
+        self,
+        base_url: str,
+        access_token: token.AccessToken | None = None,
+        multipart_threshold: int | None = None,
+        part_size: int = 16 << 20,
+        part_workers: int = 4,
+    ):
+        """
+        :param multipart_threshold: Size in bytes from which files are uploaded
+            in parts of `part_size` bytes, `part_workers` at a time (never if None).
+        """
         self.base_url = base_url
         self.access_token = access_token
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.part_workers = part_workers
+        # delay requested by the API with the last `fetch_jobs` response, if any
+        self.retry_after: float | None = None
 
     @property
     def header(self) -> dict[str, str] | None:
@@ -21,35 +41,132 @@ class API:
         return {"Authorization": f"Bearer {self.access_token.access_token}"}
 
     def fetch_jobs(self, **kwargs: Any) -> dict[str, model.JobSpecs]:
-        response = self._request("GET", "/jobs", params=kwargs)
+        """Fetch jobs matching the worker's resources (`kwargs`).
+
+        With `wait=<seconds>`, the API may hold the request until a job
+        is available (long polling).
+        """
+        response = self._request(
+            "GET",
+            "/jobs",
+            params=kwargs,
+            # the API may hold the request for up to `wait` seconds
+            timeout=transport.api.timeout(extra_read=kwargs.get("wait") or 0),
+        )
+        self.retry_after = backoff.parse_retry_after(
+            response.headers.get("Retry-After")
+        )
         return {k: model.JobSpecs(**v) for k, v in response.json().items()}
 
-    def get_file(self, file_id: str, path: Path) -> requests.Response:
+    def put_statuses(self, statuses: dict[str, Status]) -> dict[str, str]:
+        """Report the status of several jobs at once, without details.
+        :return: The result for each job, e.g. "ok" or "not_found".
+        """
+        response = self._request(
+            "PUT",
+            "/jobs/status",
+            json={"statuses": statuses},
+        )
+        return dict(response.json())
+
+    def get_file(
+        self,
+        file_id: str,
+        path: Path,
+        chunk_size: int = 2**20,
+        max_resumes: int = 5,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response:
+        """Stream a file to disk, chunk by chunk.
+
+        After a transient failure, the download is resumed from the last written
+        byte with a Range request (up to `max_resumes` times).
+        `headers` are added to the download request (e.g., `If-None-Match`);
+        if the server answers 304 Not Modified, `path` is left untouched.
+        """
         url_getter = self.build_file_url(file_id)
-        response = session.get(url_getter, headers=self.header)
+        response = transport.api.get(url_getter, headers=self.header)
 
         # ToDo: check if response is a URL or a path, currently only URL
-        request_kwargs = response.json()
-        response = session.request(**request_kwargs)  # may contain authorization header
-        path.write_bytes(response.content)
-        return response
+        request_kwargs = response.json()  # may contain authorization header
+        if headers:
+            request_kwargs["headers"] = {
+                **(request_kwargs.get("headers") or {}),
+                **headers,
+            }
+        start = time.perf_counter()
+        try:
+            return _download(request_kwargs, path, chunk_size, max_resumes)
+        finally:
+            metrics.transfer_seconds.inc(time.perf_counter() - start, direction="down")
 
     def build_file_url(self, file_id: str) -> str:
         return f"{self.base_url}/files/{file_id}/url"
 
-    def _request(
-        self, method: str, endpoint: str, **kwargs: dict[str, Any]
-    ) -> requests.Response:
+    def _request(self, method: str, endpoint: str, **kwargs: Any) -> requests.Response:
         url = self.base_url + endpoint
-        response = session.request(
+        response = transport.api.request(
             method=method,
             url=url,
             headers=self.header,
-            **kwargs,  # type: ignore
+            **kwargs,
         )
         return response
 
 
+def _download(
+    request_kwargs: dict[str, Any], path: Path, chunk_size: int, max_resumes: int
+) -> requests.Response:
+    request_kwargs = dict(request_kwargs)
+    headers = dict(request_kwargs.pop("headers", None) or {})
+    path_part = path.with_name(path.name + ".part")
+    offset = 0
+    n_resumes = 0
+    while True:
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            with transport.storage.request(
+                **request_kwargs, headers=headers, stream=True
+            ) as response:
+                if response.status_code == 304:
+                    return response
+                content_range = response.headers.get("Content-Range", "")
+                if offset and (
+                    response.status_code != 206
+                    or not content_range.startswith(f"bytes {offset}-")
+                ):
+                    logger.warning(f"Range not honored for {path}, restarting.")
+                    offset = 0
+                with path_part.open("ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        metrics.transfer_bytes.inc(len(chunk), direction="down")
+            break
+        except requests.HTTPError as e:
+            # the previous attempt failed right after receiving the last byte
+            if offset and e.response is not None and e.response.status_code == 416:
+                response = e.response
+                break
+            raise
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as e:
+            if n_resumes >= max_resumes:
+                raise
+            n_resumes += 1
+            logger.warning(
+                f"Download of {path} interrupted at byte {offset} ({e!r}), "
+                f"resuming ({n_resumes}/{max_resumes})."
+            )
+            time.sleep(n_resumes)
+    path_part.replace(path)
+    return response
+
+
 class JobAPI:
     def __init__(self, job_id: str, base_api: API):
         self.job_id = job_id
@@ -67,6 +184,10 @@ class JobAPI:
     def file_post_url(self) -> str:
         return f"{self.job_url}/files/url"
 
+    @property
+    def multipart_url(self) -> str:
+        return f"{self.job_url}/files/multipart"
+
     def ping(
         self,
         status: Status,
@@ -78,21 +199,25 @@ class JobAPI:
             runtime_details = f"exit_code: {exit_code} "
         if body is not None:
             runtime_details = (runtime_details or "") + body
-        return session.put(
+        return transport.api.put(
             self.status_url,
             params={"status": status, "runtime_details": body},
             headers=self._base_api.header,
         )
 
-    def get_file(self, file_id: str, path: Path) -> requests.Response:
-        return self._base_api.get_file(file_id, path)
+    def get_file(self, file_id: str, path: Path, **kwargs: Any) -> requests.Response:
+        return self._base_api.get_file(file_id, path, **kwargs)
 
     def put_file(
         self, path: Path, path_api: str | Path | None, file_type: str
     ) -> requests.Response:
+        threshold = self._base_api.multipart_threshold
+        if threshold is not None and path.stat().st_size >= threshold:
+            return self.put_file_multipart(path, path_api, file_type)
+
         # Get file upload pre-signed URL
         base_path = os.path.dirname(path_api) if path_api is not None else None
-        response = session.post(
+        response = transport.api.post(
             self.file_post_url,
             params={"base_path": base_path, "type": file_type},
             headers=self._base_api.header,
@@ -103,10 +228,100 @@ class JobAPI:
         file_name = (
             str(os.path.split(path_api)[-1]) if path_api is not None else path.name
         )
-        f = {"file": (file_name, open(path, "rb"))}
-        return session.request(**request_kwargs, files=f)
+        start = time.perf_counter()
+        with open(path, "rb") as fh:
+            response = transport.storage.request(
+                **request_kwargs, files={"file": (file_name, fh)}
+            )
+        metrics.transfer_seconds.inc(time.perf_counter() - start, direction="up")
+        metrics.transfer_bytes.inc(path.stat().st_size, direction="up")
+        return response
+
+    def put_file_multipart(
+        self,
+        path: Path,
+        path_api: str | Path | None,
+        file_type: str,
+        max_retries: int = 3,
+    ) -> requests.Response:
+        """Upload a file in parts, to pre-signed URLs of each part, in parallel.
+
+        A part that fails with a transient error is sent again on its own, up
+        to `max_retries` times; if it still fails, the upload is aborted.
+        """
+        base_api = self._base_api
+        base_path = os.path.dirname(path_api) if path_api is not None else None
+        file_name = (
+            str(os.path.split(path_api)[-1]) if path_api is not None else path.name
+        )
+        response = transport.api.post(
+            self.multipart_url,
+            params={
+                "base_path": base_path,
+                "type": file_type,
+                "file_name": file_name,
+                "size": path.stat().st_size,
+                "part_size": base_api.part_size,
+            },
+            headers=base_api.header,
+        )
+        upload = response.json()
+        upload_url = f"{self.multipart_url}/{upload['upload_id']}"
+        part_size = upload.get("part_size", base_api.part_size)
+        try:
+            with futures.ThreadPoolExecutor(base_api.part_workers) as executor:
+                etags = list(
+                    executor.map(
+                        lambda part: _put_part(path, part, part_size, max_retries),
+                        upload["parts"],
+                    )
+                )
+        except Exception:
+            logger.warning(f"Aborting multipart upload of {path}.")
+            transport.api.delete(upload_url, headers=base_api.header)
+            raise
+        return transport.api.post(
+            f"{upload_url}/complete",
+            json={
+                "parts": [
+                    {"part_number": part["part_number"], "etag": etag}
+                    for part, etag in zip(upload["parts"], etags)
+                ]
+            },
+            headers=base_api.header,
+        )
 
     def put_file_native(
         self, path: Path, f_type: FileType, path_api: Path
     ) -> requests.Response:
         return self.put_file(path, path_api, file_type=f_type)
+
+
+def _put_part(
+    path: Path, part: dict[str, Any], part_size: int, max_retries: int
+) -> str:
+    """Upload a part of a multipart upload, returning its ETag."""
+    request_kwargs = dict(part)
+    part_number = request_kwargs.pop("part_number")
+    with open(path, "rb") as fh:
+        fh.seek((part_number - 1) * part_size)
+        data = fh.read(part_size)
+    n_retries = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            response = transport.storage.request(
+                **{"method": "put", **request_kwargs}, data=data
+            )
+            metrics.transfer_seconds.inc(time.perf_counter() - start, direction="up")
+            metrics.transfer_bytes.inc(len(data), direction="up")
+            return str(response.headers["ETag"])
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if n_retries >= max_retries:
+                raise
+            n_retries += 1
+            logger.warning(
+                f"Upload of part {part_number} of {path} failed ({e!r}), "
+                f"retrying ({n_retries}/{max_retries})."
+            )
+            time.sleep(n_retries)
@@ -6,16 +6,35 @@ import requests
 from fetcher.api import model, token
 
 class API:
+    base_url: str
+    access_token: token.AccessToken | None
+    retry_after: float | None
+    multipart_threshold: int | None
+    part_size: int
+    part_workers: int
     def __init__(
-        self, base_url: str, access_token: token.AccessToken | None = None
+        self,
+        base_url: str,
+        access_token: token.AccessToken | None = None,
+        multipart_threshold: int | None = None,
+        part_size: int = 16 << 20,
+        part_workers: int = 4,
     ) -> None: ...
     @property
     def header(self) -> dict[str, str] | None: ...
     def fetch_jobs(self, **kwargs: Any) -> dict[str, model.JobSpecs]: ...
-    def get_file(self, file_id: str, path: Path) -> requests.Response: ...
+    def put_statuses(self, statuses: dict[str, Any]) -> dict[str, str]: ...
+    def get_file(
+        self,
+        file_id: str,
+        path: Path,
+        chunk_size: int = 2**20,
+        max_resumes: int = 5,
+        headers: dict[str, str] | None = None,
+    ) -> requests.Response: ...
     def build_file_url(self, file_id: str) -> str: ...
     def _request(
-        self, method: str, endpoint: str, **kwargs: dict[str, Any]
+        self, method: str, endpoint: str, **kwargs: Any
     ) -> requests.Response: ...
 
 class JobAPI:
@@ -26,13 +45,24 @@ class JobAPI:
     def status_url(self) -> str: ...
     @property
     def file_post_url(self) -> str: ...
+    @property
+    def multipart_url(self) -> str: ...
     def ping(
         self, status: str, exit_code: int | None, body: str | None
     ) -> requests.Response: ...
-    def get_file(self, file_id: str, path: Path) -> requests.Response: ...
+    def get_file(
+        self, file_id: str, path: Path, **kwargs: Any
+    ) -> requests.Response: ...
     def put_file(
         self, path: Path, path_api: str | Path | None, file_type: str
     ) -> requests.Response: ...
+    def put_file_multipart(
+        self,
+        path: Path,
+        path_api: str | Path | None,
+        file_type: str,
+        max_retries: int = 3,
+    ) -> requests.Response: ...
     def put_file_native(
         self, path: Path, f_type: str, path_api: Path
     ) -> requests.Response: ...
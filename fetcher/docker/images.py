@@ -0,0 +1,113 @@
+import collections
+import queue
+import threading
+import time
+
+import docker
+import docker.errors
+import docker.models
+import docker.models.images
+from loguru import logger
+
+
+class ImageCache:
+    def __init__(self, client: docker.DockerClient | None = None, ttl: float = 600):
+        """Remembers which image each tag resolved to, to skip recent pulls.
+
+        A tag pulled less than `ttl` seconds ago is not pulled again, as long as
+        the image it resolved to is still present locally.
+        Concurrent pulls of the same tag are merged into one.
+        """
+        self._client = client if client is not None else docker.from_env()
+        self._ttl = ttl
+        self._pulled: dict[str, tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self._image_locks: dict[str, threading.Lock] = collections.defaultdict(
+            threading.Lock
+        )
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def age(self, image: str) -> float | None:
+        """Seconds since `image` was last pulled, None if it never was."""
+        with self._lock:
+            entry = self._pulled.get(image)
+        return time.monotonic() - entry[0] if entry is not None else None
+
+    def pull(self, image: str, force: bool = False) -> docker.models.images.Image:
+        with self._lock:
+            image_lock = self._image_locks[image]
+        with image_lock:
+            age = self.age(image)
+            if not force and age is not None and age < self._ttl:
+                try:
+                    return self._client.images.get(self._pulled[image][1])
+                except docker.errors.ImageNotFound:
+                    logger.info(f"Image {image} was removed, pulling it again.")
+            t_start = time.monotonic()
+            pulled = self._client.images.pull(image)
+            logger.info(f"Pulled {image} in {time.monotonic() - t_start:.1f}s.")
+            with self._lock:
+                self._pulled[image] = (time.monotonic(), str(pulled.id))
+            return pulled
+
+
+class Prefetcher:
+    def __init__(self, cache: ImageCache, interval: float = 60, max_images: int = 8):
+        """Pulls images in the background, so that jobs find them ready.
+
+        Images passed to `add` are pulled right away. The `max_images` most
+        recently added ones are then pulled again in the background before their
+        cache entry expires.
+        """
+        self._cache = cache
+        self._interval = interval
+        self._max_images = max_images
+        self._recent: collections.OrderedDict[str, None] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[str] = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+
+    def add(self, image: str) -> None:
+        with self._lock:
+            self._recent[image] = None
+            self._recent.move_to_end(image)
+            while len(self._recent) > self._max_images:
+                self._recent.popitem(last=False)
+        self._queue.put(image)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._queue.put("")  # wake up the thread
+        self._thread.join()
+
+    def _prefetch_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                images = [self._queue.get(timeout=self._interval)]
+                force = False
+            except queue.Empty:
+                # refresh the images that would expire before the next check
+                with self._lock:
+                    recent = list(self._recent)
+                refresh_after = self._cache.ttl - 2 * self._interval
+                images = [
+                    image
+                    for image in recent
+                    if (self._cache.age(image) or 0) > refresh_after
+                ]
+                force = True
+            for image in images:
+                if not image or self._stop_event.is_set():
+                    continue
+                try:
+                    self._cache.pull(image, force=force)
+                except Exception as e:
+                    logger.warning(f"Could not prefetch image {image}: {e!r}")
@@ -0,0 +1,20 @@
+import docker
+import docker.models
+import docker.models.images
+
+class ImageCache:
+    def __init__(
+        self, client: docker.DockerClient | None = None, ttl: float = 600
+    ) -> None: ...
+    @property
+    def ttl(self) -> float: ...
+    def age(self, image: str) -> float | None: ...
+    def pull(self, image: str, force: bool = False) -> docker.models.images.Image: ...
+
+class Prefetcher:
+    def __init__(
+        self, cache: ImageCache, interval: float = 60, max_images: int = 8
+    ) -> None: ...
+    def add(self, image: str) -> None: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
@@ -6,11 +6,20 @@ import docker.models.containers
 import docker.models.images
 import docker.types
 
+from fetcher import tracing
+from fetcher.docker.images import ImageCache
+
 
 class Manager:
-    def __init__(self, image: str, client: docker.DockerClient | None = None):
+    def __init__(
+        self,
+        image: str,
+        client: docker.DockerClient | None = None,
+        image_cache: ImageCache | None = None,
+    ):
         self.image = image
         self._client = client if client is not None else docker.from_env()
+        self._image_cache = image_cache
 
     def auto_run(
         self,
@@ -35,27 +44,31 @@ class Manager:
         environment: dict[str, str] | None = None,
         mounts: list[docker.types.Mount] | None = None,
         detach: bool = True,
-        **kwargs: dict[str, Any],
+        **kwargs: Any,
     ) -> bytes | docker.models.containers.Container:
         if isinstance(command, list):
             command = " ".join(command)
         if command is not None:
             command = ["/bin/sh", "-c", command]
-        return cast(
-            bytes | docker.models.containers.Container,
-            self._client.containers.run(
-                self.image,
-                command=command,
-                environment=environment,
-                mounts=mounts,
-                detach=detach,
-                stdout=True,
-                stderr=True,
-                **kwargs,  # type: ignore
-            ),
-        )
+        with tracing.span("docker.run", image=self.image):
+            return cast(
+                bytes | docker.models.containers.Container,
+                self._client.containers.run(
+                    self.image,
+                    command=command,
+                    environment=environment,
+                    mounts=mounts,
+                    detach=detach,
+                    stdout=True,
+                    stderr=True,
+                    **kwargs,
+                ),
+            )
 
     def pull(self) -> docker.models.images.Image:
-        # always pull: if the image is already present and up-to-date,
-        # it will be a no-op taking little time
-        return self._client.images.pull(self.image)
+        with tracing.span("docker.pull", image=self.image):
+            if self._image_cache is not None:
+                return self._image_cache.pull(self.image)
+            # always pull: if the image is already present and up-to-date,
+            # it will be a no-op taking little time
+            return self._client.images.pull(self.image)
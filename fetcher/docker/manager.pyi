@@ -4,9 +4,14 @@ import docker
 import docker.models
 import docker.types
 
+from fetcher.docker.images import ImageCache
+
 class Manager:
     def __init__(
-        self, image: str, client: docker.DockerClient | None = None
+        self,
+        image: str,
+        client: docker.DockerClient | None = None,
+        image_cache: ImageCache | None = None,
     ) -> None: ...
     def auto_run(
         self,
@@ -22,6 +27,6 @@ class Manager:
         environment: dict[str, str] | None = None,
         mounts: list[docker.types.Mount] | None = None,
         detach: bool = True,
-        **kwargs: dict[str, Any],
+        **kwargs: Any,
     ) -> bytes | docker.models.containers.Container: ...
     def pull(self) -> docker.models.images.Image: ...
@@ -1,6 +1,8 @@
 import os
 import platform
+import re
 import socket
+from pathlib import Path
 
 import GPUtil
 import psutil
@@ -27,6 +29,13 @@ class CPUInfo(BaseModel):
 class GPUInfo(BaseModel):
     model: str
     memory: int
+    uuid: str
+
+
+class NUMANode(BaseModel):
+    index: int
+    cpus: list[int]
+    memory: int
 
 
 class SystemInfo(BaseModel):
@@ -34,6 +43,7 @@ class SystemInfo(BaseModel):
     os: OSInfo
     sys: CPUInfo
     gpus: list[GPUInfo]
+    numa: list[NUMANode] = []
 
 
 def collect() -> SystemInfo:
@@ -42,6 +52,7 @@ def collect() -> SystemInfo:
         os=collect_os(),
         sys=collect_sys(),
         gpus=collect_gpus(),
+        numa=collect_numa(),
     )
 
 
@@ -71,6 +82,55 @@ def collect_gpus() -> list[GPUInfo]:
         GPUInfo(
             model=gpu.name,
             memory=int(gpu.memoryTotal),
+            uuid=gpu.uuid,
         )
         for gpu in GPUtil.getGPUs()
     ]
+
+
+def collect_numa(path: Path = Path("/sys/devices/system/node")) -> list[NUMANode]:
+    """NUMA nodes, with the CPUs the worker may use and their memory (in MB).
+
+    Empty if the topology is unknown (e.g., not on Linux).
+    """
+    affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    nodes = []
+    for path_node in sorted(path.glob("node[0-9]*"), key=lambda p: int(p.name[4:])):
+        try:
+            cpus = parse_cpulist((path_node / "cpulist").read_text())
+            meminfo = (path_node / "meminfo").read_text()
+        except OSError:
+            continue
+        if affinity is not None:
+            cpus = [c for c in cpus if c in affinity]
+        match = re.search(r"MemTotal:\s*(\d+) kB", meminfo)
+        if not cpus or match is None:
+            continue  # e.g., memory-only node
+        nodes.append(
+            NUMANode(
+                index=int(path_node.name[4:]), cpus=cpus, memory=int(match[1]) >> 10
+            )
+        )
+    return nodes
+
+
+def parse_cpulist(cpulist: str) -> list[int]:
+    """CPUs of a list in the kernel's format, e.g., `0-3,8`."""
+    cpus = []
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def format_cpulist(cpus: list[int]) -> str:
+    """The inverse of `parse_cpulist`, e.g., for Docker's `cpuset_cpus`."""
+    ranges: list[list[int]] = []
+    for cpu in sorted(set(cpus)):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import List
 
 from pydantic import BaseModel
@@ -19,15 +20,25 @@ class CPUInfo(BaseModel):
 class GPUInfo(BaseModel):
     model: str
     memory: int
+    uuid: str
+
+class NUMANode(BaseModel):
+    index: int
+    cpus: List[int]
+    memory: int
 
 class SystemInfo(BaseModel):
     host: HostInfo
     os: OSInfo
     sys: CPUInfo
     gpus: List[GPUInfo]
+    numa: List[NUMANode] = ...
 
 def collect() -> SystemInfo: ...
 def collect_host() -> HostInfo: ...
 def collect_os() -> OSInfo: ...
 def collect_sys() -> CPUInfo: ...
 def collect_gpus() -> List[GPUInfo]: ...
+def collect_numa(path: Path = ...) -> List[NUMANode]: ...
+def parse_cpulist(cpulist: str) -> List[int]: ...
+def format_cpulist(cpus: List[int]) -> str: ...
@@ -1 +1,5 @@
+from . import cache as cache
 from . import files as files
+from . import manifest as manifest
+from . import transfer as transfer
+from . import watch as watch
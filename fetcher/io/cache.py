@@ -0,0 +1,192 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+import requests
+from loguru import logger
+from pydantic import BaseModel
+
+# ioctl to share the data blocks of two files (copy-on-write), see ioctl_ficlone(2)
+_FICLONE = 0x40049409
+
+
+class CacheEntry(BaseModel):
+    digest: str
+    size: int
+    etag: str | None = None
+    last_used: float
+
+
+class FileCache:
+    def __init__(self, path: str | Path, max_bytes: int):
+        """Content-addressed cache of downloaded files, shared by all jobs of a worker.
+
+        Files are stored once per SHA-256 digest under `blobs/`, and indexed by
+        file ID. A cached file is revalidated with `If-None-Match` when the
+        server gave it an ETag, else the file ID is assumed to be immutable.
+        When the cache is larger than `max_bytes`, least recently used files
+        are evicted. Cached files are read-only: jobs must not modify their
+        inputs in place.
+        """
+        self._path = Path(path)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        (self._path / "blobs").mkdir(parents=True, exist_ok=True)
+        self._index = self._load()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(e.size for e in self._unique_entries())
+
+    def get(
+        self,
+        file_id: str,
+        path: Path,
+        download: Callable[..., requests.Response],
+    ) -> requests.Response | None:
+        """Place the file `file_id` at `path`, downloading it only if needed.
+
+        `download(file_id, path, headers=...)` is called on a cache miss, or to
+        revalidate a cached file that has an ETag. Returns its response, or
+        None if the cached file was used without asking the server.
+        """
+        with self._lock:
+            entry = self._index.get(file_id)
+            if entry is not None and not self._blob(entry.digest).is_file():
+                del self._index[file_id]
+                entry = None
+
+        if entry is not None and entry.etag is None:
+            if self._hit(file_id, entry, path):
+                logger.debug(f"Cache hit for {file_id}.")
+                return None
+            entry = None
+
+        headers = {"If-None-Match": entry.etag} if entry and entry.etag else {}
+        response = download(file_id, path, headers=headers)
+        if entry is not None and response.status_code == 304:
+            if self._hit(file_id, entry, path):
+                logger.debug(f"Cache hit for {file_id} (revalidated).")
+                return response
+            response = download(file_id, path, headers={})
+        self._add(file_id, path, response.headers.get("ETag"))
+        return response
+
+    def _hit(self, file_id: str, entry: CacheEntry, path: Path) -> bool:
+        """Place the cached file at `path`, unless it was evicted in the meantime.
+
+        The copy is made without the lock, so that jobs do not wait for each other.
+        """
+        try:
+            _place(self._blob(entry.digest), path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            entry.last_used = time.time()
+            if self._index.get(file_id) is entry:
+                self._save()
+        return True
+
+    def _add(self, file_id: str, path: Path, etag: str | None) -> None:
+        with path.open("rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        blob = self._blob(digest)
+        if blob.is_file():
+            # same content under another file ID: keep a single copy
+            source, target = blob, path
+        else:
+            source, target = path, blob
+        # copied without the lock, then renamed so that `target` is always whole
+        path_tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+        try:
+            _place(source, path_tmp)
+            if target == blob:
+                path_tmp.chmod(0o444)
+            path_tmp.replace(target)
+        except FileNotFoundError:
+            # the blob was evicted in the meantime: `path` is kept as downloaded
+            path_tmp.unlink(missing_ok=True)
+        with self._lock:
+            if not blob.is_file():
+                return
+            old = self._index.get(file_id)
+            self._index[file_id] = CacheEntry(
+                digest=digest,
+                size=blob.stat().st_size,
+                etag=etag,
+                last_used=time.time(),
+            )
+            if old is not None and old.digest != digest:
+                # e.g., changed on the server: the old content is not evicted else
+                self._unlink_unused(old.digest)
+            self._evict()
+            self._save()
+
+    def _evict(self) -> None:
+        entries = sorted(self._unique_entries(), key=lambda e: e.last_used)
+        size = sum(e.size for e in entries)
+        for entry in entries:
+            if size <= self._max_bytes:
+                break
+            logger.debug(f"Evicting {entry.digest} from the cache.")
+            self._index = {
+                k: v for k, v in self._index.items() if v.digest != entry.digest
+            }
+            self._unlink_unused(entry.digest)
+            size -= entry.size
+
+    def _unlink_unused(self, digest: str) -> None:
+        if all(e.digest != digest for e in self._index.values()):
+            self._blob(digest).unlink(missing_ok=True)
+
+    def _unique_entries(self) -> list[CacheEntry]:
+        # entries with the same digest share a blob; keep the most recently used
+        by_digest: dict[str, CacheEntry] = {}
+        for entry in self._index.values():
+            other = by_digest.get(entry.digest)
+            if other is None or other.last_used < entry.last_used:
+                by_digest[entry.digest] = entry
+        return list(by_digest.values())
+
+    def _blob(self, digest: str) -> Path:
+        return self._path / "blobs" / digest
+
+    def _load(self) -> dict[str, CacheEntry]:
+        path_index = self._path / "index.json"
+        if not path_index.is_file():
+            return {}
+        index = {
+            k: CacheEntry(**v) for k, v in json.loads(path_index.read_text()).items()
+        }
+        return {k: v for k, v in index.items() if self._blob(v.digest).is_file()}
+
+    def _save(self) -> None:
+        path_tmp = self._path / "index.json.tmp"
+        path_tmp.write_text(
+            json.dumps({k: v.model_dump() for k, v in self._index.items()})
+        )
+        path_tmp.replace(self._path / "index.json")
+
+
+def _place(src: Path, dst: Path) -> None:
+    """Make `dst` a copy of `src`: reflink if supported, else hardlink, else copy."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    try:
+        with src.open("rb") as f_src, dst.open("wb") as f_dst:
+            fcntl.ioctl(f_dst.fileno(), _FICLONE, f_src.fileno())
+        return
+    except OSError:
+        dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
@@ -0,0 +1,24 @@
+from pathlib import Path
+from typing import Callable
+
+import requests
+from pydantic import BaseModel
+
+class CacheEntry(BaseModel):
+    digest: str
+    size: int
+    etag: str | None = ...
+    last_used: float
+
+class FileCache:
+    def __init__(self, path: str | Path, max_bytes: int) -> None: ...
+    @property
+    def size(self) -> int: ...
+    def get(
+        self,
+        file_id: str,
+        path: Path,
+        download: Callable[..., requests.Response],
+    ) -> requests.Response | None: ...
+
+def _place(src: Path, dst: Path) -> None: ...
@@ -1,12 +1,15 @@
+import tarfile
+import uuid
 from abc import abstractmethod
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any, Generator, Sequence
 
 import requests
 
+from fetcher import tracing, transport
 from fetcher.api import worker
+from fetcher.io.cache import FileCache
 from fetcher.models import FileType
-from fetcher.session import session
 
 
 class PathAPIbase:
@@ -53,7 +56,10 @@ class PathAPIUp(PathAPIbase):
     def push(self) -> requests.Response:
         if self._path.is_dir():
             raise NotImplementedError("Directory upload not implemented")
-        return self._api.put_file_native(self._path, self._f_type, self.path_api_rel)
+        with tracing.span("push", path=str(self._path)):
+            return self._api.put_file_native(
+                self._path, self._f_type, self.path_api_rel
+            )
 
     def glob(self, pattern: str) -> Generator["PathAPIUp", Any, None]:
         return (
@@ -68,21 +74,111 @@ class PathAPIUp(PathAPIbase):
         )
 
 
+class PathAPIBundle(PathAPIUp):
+    def __init__(self, files: Sequence[PathAPIUp], dir_up: PathAPIUp, path_tmp: Path):
+        """Tar archive of files of the upload directory `dir_up`, uploaded as one.
+
+        The archive is only built when pushed, in `path_tmp`, and uploaded to
+        `<dir_up>/bundle-<id>.tar`; it keeps the files' paths relative to `dir_up`.
+        """
+        name = f"bundle-{uuid.uuid4().hex[:12]}.tar"
+        super().__init__(
+            dir_up._path / name, dir_up._f_type, dir_up._path_api, dir_up._api
+        )
+        self._files = list(files)
+        self._dir_up = dir_up
+        self._path_tmp = path_tmp
+
+    @property
+    def files(self) -> list[PathAPIUp]:
+        """The files in the archive."""
+        return self._files
+
+    def __repr__(self) -> str:
+        return f"PathAPIBundle({self._files!r}, {self._dir_up!r}, {self._path_tmp!r})"
+
+    def push(self) -> requests.Response:
+        self._path_tmp.mkdir(parents=True, exist_ok=True)
+        path_tar = self._path_tmp / self._path.name
+        try:
+            with tracing.span("bundle", path=str(self._path), n_files=len(self._files)):
+                with tarfile.open(path_tar, "w") as tar:
+                    for f in self._files:
+                        arcname = str(f._path.relative_to(self._dir_up._path))
+                        tar.add(f._path, arcname=arcname)
+            with tracing.span("push", path=str(self._path)):
+                return self._api.put_file_native(
+                    path_tar, self._f_type, self.path_api_rel
+                )
+        finally:
+            path_tar.unlink(missing_ok=True)
+
+
+def bundle_small(
+    files: Sequence[PathAPIUp],
+    dirs_up: Sequence[PathAPIUp],
+    threshold: int,
+    path_tmp: Path,
+) -> list[PathAPIUp]:
+    """Bundle the files smaller than `threshold` bytes into one archive per
+    upload directory, to upload them with one request instead of one each.
+
+    Args:
+        files: files to upload, all within `dirs_up`
+        dirs_up: upload directories, one per file type
+        threshold: size in bytes from which files are uploaded on their own
+        path_tmp: directory to build the archives in, outside of `dirs_up`
+    """
+    out: list[PathAPIUp] = []
+    small: dict[Path, list[PathAPIUp]] = {d._path: [] for d in dirs_up}
+    for f in files:
+        dir_path = next((d for d in small if f._path.is_relative_to(d)), None)
+        if dir_path is None or f._path.stat().st_size >= threshold:
+            out.append(f)
+        else:
+            small[dir_path].append(f)
+    for dir_up in dirs_up:
+        files_small = small[dir_up._path]
+        if len(files_small) > 1:
+            out.append(PathAPIBundle(files_small, dir_up, path_tmp))
+        else:
+            out.extend(files_small)
+    return out
+
+
 class PathAPIDown(PathAPIbase):
-    def __init__(self, path: str | Path, file_id: str, api: worker.JobAPI):
+    def __init__(
+        self,
+        path: str | Path,
+        file_id: str,
+        api: worker.JobAPI,
+        cache: FileCache | None = None,
+    ):
+        """
+
+        Args:
+            path:
+            file_id: id of the file in API world
+            api: api backend
+            cache: cache of previously downloaded files to get the file from
+        """
         self._path = Path(path) if not isinstance(path, Path) else path
         self._file_id = file_id
         self._api = api
+        self._cache = cache
 
     def __repr__(self) -> str:
         return (
             f"PathAPIDown({repr(self._path)}, {repr(self._file_id)}, {repr(self._api)})"
         )
 
-    def get(self, mkdir: bool = True, parents: bool = True) -> requests.Response:
+    def get(self, mkdir: bool = True, parents: bool = True) -> requests.Response | None:
         if mkdir:
             self._path.parent.mkdir(parents=parents, exist_ok=True)
-        return self._api.get_file(self._file_id, self._path)
+        with tracing.span("get", path=str(self._path), file_id=self._file_id):
+            if self._cache is not None:
+                return self._cache.get(self._file_id, self._path, self._api.get_file)
+            return self._api.get_file(self._file_id, self._path)
 
 
 class Uploader:
@@ -102,11 +198,12 @@ class APIUploader(Uploader):
         self, path: Path, type: str, path_api: str | None = None
     ) -> requests.Response:
         path_api = path.stem if path_api is None else path_api
-        f = {"file": (path_api, open(path, "rb"))}
-        response = session.post(
-            self._url, params={"path": path_api, "type": type}, files=f
-        )
-        return response
+        with open(path, "rb") as fh:
+            return transport.api.post(
+                self._url,
+                params={"path": path_api, "type": type},
+                files={"file": (path_api, fh)},
+            )
 
 
 class Downloader:
@@ -122,7 +219,7 @@ class Downloader:
 
 class APIDownloader(Downloader):
     def get(self, url: str, path: Path) -> requests.Response:
-        response = session.get(url, allow_redirects=True)
+        response = transport.storage.get(url, allow_redirects=True)
         path = path if path is not None else self._path
         with path.open("wb") as f:
             f.write(response.content)
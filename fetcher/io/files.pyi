@@ -1,9 +1,11 @@
 from abc import abstractmethod
 from pathlib import Path
-from typing import Any, Generator
+from typing import Any, Generator, Sequence
 
 import requests
 
+from fetcher.io.cache import FileCache
+
 class PathAPIbase:
     _path: Path
     def __str__(self) -> str: ...
@@ -20,10 +22,34 @@ class PathAPIUp(PathAPIbase):
     def glob(self, pattern: str) -> Generator["PathAPIUp", Any, None]: ...
     def rglob(self, pattern: str) -> Generator["PathAPIUp", Any, None]: ...
 
+class PathAPIBundle(PathAPIUp):
+    def __init__(
+        self, files: Sequence[PathAPIUp], dir_up: PathAPIUp, path_tmp: Path
+    ) -> None: ...
+    @property
+    def files(self) -> list[PathAPIUp]: ...
+    def __repr__(self) -> str: ...
+    def push(self) -> requests.Response: ...
+
+def bundle_small(
+    files: Sequence[PathAPIUp],
+    dirs_up: Sequence[PathAPIUp],
+    threshold: int,
+    path_tmp: Path,
+) -> list[PathAPIUp]: ...
+
 class PathAPIDown(PathAPIbase):
-    def __init__(self, path: str | Path, file_id: str, api: Any) -> None: ...
+    def __init__(
+        self,
+        path: str | Path,
+        file_id: str,
+        api: Any,
+        cache: FileCache | None = None,
+    ) -> None: ...
     def __repr__(self) -> str: ...
-    def get(self, mkdir: bool = True, parents: bool = True) -> requests.Response: ...
+    def get(
+        self, mkdir: bool = True, parents: bool = True
+    ) -> requests.Response | None: ...
 
 class Uploader:
     @abstractmethod
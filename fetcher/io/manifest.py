@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from loguru import logger
+from pydantic import BaseModel
+
+
+class ManifestEntry(BaseModel):
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class UploadManifest:
+    def __init__(self, path: str | Path):
+        """Record of the files uploaded for a job, persisted as JSON at `path`.
+
+        It survives retries and restarts of the job's postprocessing, so that
+        only files that are missing or changed since are uploaded again.
+        """
+        self._path = Path(path)
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def uploaded(self, key: str, path: Path) -> bool:
+        """Whether `path` was uploaded as `key` with its current content.
+        The file is only hashed if its size matches but its mtime does not.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        if _sha256(path) != entry.sha256:
+            return False
+        self.record({key: (path, (stat.st_size, stat.st_mtime_ns))})
+        return True
+
+    def record(self, files: dict[str, tuple[Path, tuple[int, int]]]) -> None:
+        """Record uploaded files, by key: their path and (size, mtime_ns) when
+        uploaded. Files that changed since are not recorded.
+        """
+        entries = {}
+        for key, (path, (size, mtime_ns)) in files.items():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                continue
+            entries[key] = ManifestEntry(
+                size=size, mtime_ns=mtime_ns, sha256=_sha256(path)
+            )
+        with self._lock:
+            self._entries.update(entries)
+            self._save()
+
+    def _load(self) -> dict[str, ManifestEntry]:
+        if not self._path.is_file():
+            return {}
+        try:
+            return {
+                k: ManifestEntry(**v)
+                for k, v in json.loads(self._path.read_text()).items()
+            }
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid upload manifest {self._path}: {e!r}")
+            return {}
+
+    def _save(self) -> None:
+        path_tmp = self._path.with_name(self._path.name + ".tmp")
+        path_tmp.write_text(
+            json.dumps({k: v.model_dump() for k, v in self._entries.items()})
+        )
+        path_tmp.replace(self._path)
+
+
+def _sha256(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
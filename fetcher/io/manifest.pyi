@@ -0,0 +1,14 @@
+from pathlib import Path
+
+from pydantic import BaseModel
+
+class ManifestEntry(BaseModel):
+    size: int
+    mtime_ns: int
+    sha256: str
+
+class UploadManifest:
+    def __init__(self, path: str | Path) -> None: ...
+    def __len__(self) -> int: ...
+    def uploaded(self, key: str, path: Path) -> bool: ...
+    def record(self, files: dict[str, tuple[Path, tuple[int, int]]]) -> None: ...
@@ -0,0 +1,27 @@
+import requests
+
+
+class TransferError(Exception):
+    def __init__(self, errors: dict[str, Exception]):
+        """Raised when some files of a batch could not be transferred.
+        :param errors: The error of each failed file, by path.
+        """
+        self.errors = errors
+        details = "; ".join(f"{path}: {err!r}" for path, err in errors.items())
+        super().__init__(f"{len(errors)} transfer(s) failed: {details}")
+
+
+def is_transient(e: Exception) -> bool:
+    """Whether retrying might succeed: connection error, timeout or server error."""
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    return isinstance(
+        e,
+        (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            # server errors or connection errors, after retries
+            requests.exceptions.RetryError,
+        ),
+    )
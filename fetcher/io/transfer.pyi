@@ -0,0 +1,5 @@
+class TransferError(Exception):
+    errors: dict[str, Exception]
+    def __init__(self, errors: dict[str, Exception]) -> None: ...
+
+def is_transient(e: Exception) -> bool: ...
@@ -0,0 +1,81 @@
+import itertools
+import stat
+from pathlib import Path
+from typing import Sequence
+
+from fetcher.io.files import PathAPIUp
+from fetcher.io.manifest import UploadManifest
+
+_Signature = tuple[int, int]
+
+
+class UploadTracker:
+    def __init__(
+        self, dirs_up: Sequence[PathAPIUp], manifest: UploadManifest | None = None
+    ):
+        """Tracks the files written to the upload directories of a running job.
+
+        A file is considered complete once its size and modification time did
+        not change between two scans. Files are only returned again after they
+        changed since being marked as uploaded, here or in `manifest`.
+        """
+        self._dirs_up = list(dirs_up)
+        self._manifest = manifest
+        self._scanned: dict[Path, _Signature] = {}
+        self._uploaded: dict[Path, _Signature] = {}
+        self._selected: dict[Path, _Signature] = {}
+
+    @property
+    def dirs_up(self) -> list[PathAPIUp]:
+        return self._dirs_up
+
+    def stable(self) -> list[PathAPIUp]:
+        """Files unchanged since the previous call and not uploaded as they are."""
+        previous = self._scanned
+        files = self._scan()
+        self._scanned = {path: sig for path, (_, sig) in files.items()}
+        return self._select(
+            {p: entry for p, entry in files.items() if previous.get(p) == entry[1]}
+        )
+
+    def pending(self) -> list[PathAPIUp]:
+        """All files not uploaded as they are, stable or not."""
+        return self._select(self._scan())
+
+    def mark_uploaded(self, files: Sequence[PathAPIUp]) -> None:
+        """Record files returned by `stable` or `pending` as uploaded."""
+        recorded = {}
+        for f in files:
+            path = Path(str(f))
+            sig = self._selected.pop(path)
+            self._uploaded[path] = sig
+            recorded[str(f.path_api_rel)] = (path, sig)
+        if self._manifest is not None:
+            self._manifest.record(recorded)
+
+    def _select(
+        self, files: dict[Path, tuple[PathAPIUp, _Signature]]
+    ) -> list[PathAPIUp]:
+        selected = []
+        for path, (f, sig) in files.items():
+            if self._uploaded.get(path) == sig:
+                continue
+            if self._manifest is not None and self._manifest.uploaded(
+                str(f.path_api_rel), path
+            ):
+                self._uploaded[path] = sig
+                continue
+            self._selected[path] = sig
+            selected.append(f)
+        return selected
+
+    def _scan(self) -> dict[Path, tuple[PathAPIUp, _Signature]]:
+        files = {}
+        for f in itertools.chain(*[d.rglob("*") for d in self._dirs_up]):
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                continue  # removed while scanning
+            if stat.S_ISREG(st.st_mode):
+                files[Path(str(f))] = (f, (st.st_size, st.st_mtime_ns))
+        return files
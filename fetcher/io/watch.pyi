@@ -0,0 +1,14 @@
+from typing import Sequence
+
+from fetcher.io.files import PathAPIUp
+from fetcher.io.manifest import UploadManifest
+
+class UploadTracker:
+    def __init__(
+        self, dirs_up: Sequence[PathAPIUp], manifest: UploadManifest | None = None
+    ) -> None: ...
+    @property
+    def dirs_up(self) -> list[PathAPIUp]: ...
+    def stable(self) -> list[PathAPIUp]: ...
+    def pending(self) -> list[PathAPIUp]: ...
+    def mark_uploaded(self, files: Sequence[PathAPIUp]) -> None: ...
@@ -0,0 +1,211 @@
+import contextlib
+import http.server
+import math
+import threading
+import time
+from typing import Iterator, Sequence
+
+_Labels = tuple[str, ...]
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> _Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} has labels {self.labelnames}, got {labels}")
+        return tuple(str(labels[k]) for k in self.labelnames)
+
+    def _format(self, key: _Labels, extra: dict[str, str] | None = None) -> str:
+        pairs = [*zip(self.labelnames, key), *(extra or {}).items()]
+        if not pairs:
+            return ""
+        escaped = (
+            (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in pairs
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples()) + "\n"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[_Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{self._format(k)} {v}" for k, v in values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: count in each bucket (not cumulative), sum, count
+        self._values: dict[_Labels, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(key, ([0] * len(self.buckets), 0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, n + 1)
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return self._values.get(self._key(labels), ([], 0, 0))[2]
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = {k: (list(c), s, n) for k, (c, s, n) in self._values.items()}
+        lines = []
+        for key, (counts, total, n) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = self._format(key, {"le": _format_bound(bound)})
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = self._format(key, {"le": "+Inf"})
+            lines.append(f"{self.name}_bucket{le} {n}")
+            lines.append(f"{self.name}_sum{self._format(key)} {total}")
+            lines.append(f"{self.name}_count{self._format(key)} {n}")
+        return lines
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        return "".join(m.render() for m in self._metrics.values())
+
+
+REGISTRY = Registry()
+
+phase_seconds = Histogram(
+    "fetcher_phase_seconds",
+    "Duration of the phases of jobs (fetch, download, slot, pull, run, upload).",
+    ["phase"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 4 * 3600, 24 * 3600),
+)
+transfer_bytes = Counter(
+    "fetcher_transfer_bytes_total", "Bytes of files transferred.", ["direction"]
+)
+transfer_seconds = Counter(
+    "fetcher_transfer_seconds_total",
+    "Time spent transferring files, summed over parallel transfers.",
+    ["direction"],
+)
+idle_seconds = Counter(
+    "fetcher_idle_seconds_total", "Time spent waiting for jobs to be available."
+)
+api_errors = Counter(
+    "fetcher_api_errors_total", "Failed HTTP requests.", ["transport", "reason"]
+)
+slots_total = Gauge("fetcher_slots", "Slots to run jobs in.")
+slots_busy = Gauge("fetcher_slots_busy", "Slots running a job.")
+jobs_total = Counter("fetcher_jobs_total", "Jobs processed, by outcome.", ["status"])
+for _metric in (
+    phase_seconds,
+    transfer_bytes,
+    transfer_seconds,
+    idle_seconds,
+    api_errors,
+    slots_total,
+    slots_busy,
+    jobs_total,
+):
+    REGISTRY.register(_metric)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass  # scraped every few seconds
+
+
+def serve(
+    port: int, host: str = "0.0.0.0", registry: Registry = REGISTRY
+) -> http.server.ThreadingHTTPServer:
+    """Serve `GET /metrics` from a background thread; `shutdown()` to stop."""
+    handler = type("Handler", (_Handler,), {"registry": registry})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,54 @@
+import contextlib
+import http.server
+from typing import Iterator, Sequence
+
+class _Metric:
+    type: str
+    name: str
+    help: str
+    labelnames: tuple[str, ...]
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = ()
+    ) -> None: ...
+    def samples(self) -> list[str]: ...
+    def render(self) -> str: ...
+
+class Counter(_Metric):
+    def inc(self, amount: float = 1, **labels: str) -> None: ...
+    def value(self, **labels: str) -> float: ...
+
+class Gauge(Counter):
+    def set(self, value: float, **labels: str) -> None: ...
+
+class Histogram(_Metric):
+    buckets: tuple[float, ...]
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = ...,
+    ) -> None: ...
+    def observe(self, value: float, **labels: str) -> None: ...
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]: ...
+    def count(self, **labels: str) -> int: ...
+
+class Registry:
+    def __init__(self) -> None: ...
+    def register(self, metric: _Metric) -> None: ...
+    def render(self) -> str: ...
+
+REGISTRY: Registry
+phase_seconds: Histogram
+transfer_bytes: Counter
+transfer_seconds: Counter
+idle_seconds: Counter
+api_errors: Counter
+slots_total: Gauge
+slots_busy: Gauge
+jobs_total: Counter
+
+def serve(
+    port: int, host: str = "0.0.0.0", registry: Registry = ...
+) -> http.server.ThreadingHTTPServer: ...
@@ -0,0 +1,5 @@
+from . import backoff as backoff
+from . import breaker as breaker
+from . import gpus as gpus
+from . import journal as journal
+from . import slots as slots
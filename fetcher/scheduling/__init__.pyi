@@ -0,0 +1 @@
+# ...existing code...
@@ -0,0 +1,52 @@
+import datetime
+import email.utils
+import random
+
+
+class Backoff:
+    def __init__(
+        self,
+        base: float = 1,
+        maximum: float = 60,
+        factor: float = 2,
+        rng: random.Random | None = None,
+    ):
+        """Exponential backoff with jitter, e.g., to poll an empty job queue.
+
+        The n-th consecutive delay is drawn uniformly from the upper half of
+        `min(maximum, base * factor**n)`, so that many workers started at the
+        same time do not keep polling in synchronized waves.
+        """
+        self.base = base
+        self.maximum = maximum
+        self.factor = factor
+        self._rng = rng if rng is not None else random.Random()
+        self._attempt = 0
+
+    def next(self, retry_after: float | None = None) -> float:
+        """Delay before the next attempt, at least `retry_after` if given."""
+        cap = min(self.maximum, self.base * self.factor**self._attempt)
+        self._attempt += 1
+        delay = self._rng.uniform(cap / 2, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def reset(self) -> None:
+        self._attempt = 0
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait according to a `Retry-After` header (delay or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    return max(0.0, (date - now).total_seconds())
@@ -0,0 +1,17 @@
+import random
+
+class Backoff:
+    base: float
+    maximum: float
+    factor: float
+    def __init__(
+        self,
+        base: float = 1,
+        maximum: float = 60,
+        factor: float = 2,
+        rng: random.Random | None = None,
+    ) -> None: ...
+    def next(self, retry_after: float | None = None) -> float: ...
+    def reset(self) -> None: ...
+
+def parse_retry_after(value: str | None) -> float | None: ...
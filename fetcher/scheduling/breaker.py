@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from typing import Callable, Literal
+
+State = Literal["closed", "open", "half_open"]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ):
+        """Stops sending requests to a service that keeps failing.
+
+        After `failure_threshold` consecutive failures, the circuit opens:
+        requests are refused right away. After a delay drawn from the upper half
+        of `reset_timeout` (so that a fleet of workers does not come back in
+        lock-step), a single probe request is let through: if it succeeds, the
+        circuit closes again, else it stays open for another delay.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._rng = rng if rng is not None else random.Random()
+        self._lock = threading.Lock()
+        self._n_failures = 0
+        self._open_until: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> State:
+        with self._lock:
+            if self._open_until is None:
+                return "closed"
+            if self._probing or self._clock() >= self._open_until:
+                return "half_open"
+            return "open"
+
+    @property
+    def retry_after(self) -> float | None:
+        """Seconds until a request may be let through again, if refused now."""
+        with self._lock:
+            if self._open_until is None:
+                return None
+            return max(0.0, self._open_until - self._clock())
+
+    def allow(self) -> bool:
+        """Whether a request may be sent; if so, report its outcome."""
+        with self._lock:
+            if self._open_until is None:
+                return True
+            if self._probing or self._clock() < self._open_until:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._n_failures = 0
+            self._open_until = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._n_failures += 1
+            if self._probing or self._n_failures >= self.failure_threshold:
+                delay = self._rng.uniform(self.reset_timeout / 2, self.reset_timeout)
+                self._open_until = self._clock() + delay
+            self._probing = False
+
+
+class RetryBudget:
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1,
+        capacity: float = 10,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Limits retries to a share of the requests.
+
+        Each request earns `ratio` retries, and `min_per_second` are earned over
+        time anyway, up to `capacity` saved. While a service fails, retries
+        then add at most `ratio` to the load, instead of multiplying it.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._balance = capacity
+        self._last = clock()
+
+    def deposit(self) -> None:
+        """Record a request."""
+        with self._lock:
+            self._refill()
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Whether a retry is allowed; if so, it is accounted for."""
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+    def _refill(self) -> None:
+        now = self._clock()
+        earned = (now - self._last) * self.min_per_second
+        self._balance = min(self.capacity, self._balance + earned)
+        self._last = now
@@ -0,0 +1,36 @@
+import random
+from typing import Callable
+
+State: object
+
+class CircuitBreaker:
+    failure_threshold: int
+    reset_timeout: float
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        clock: Callable[[], float] = ...,
+        rng: random.Random | None = None,
+    ) -> None: ...
+    @property
+    def state(self) -> str: ...
+    @property
+    def retry_after(self) -> float | None: ...
+    def allow(self) -> bool: ...
+    def record_success(self) -> None: ...
+    def record_failure(self) -> None: ...
+
+class RetryBudget:
+    ratio: float
+    min_per_second: float
+    capacity: float
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1,
+        capacity: float = 10,
+        clock: Callable[[], float] = ...,
+    ) -> None: ...
+    def deposit(self) -> None: ...
+    def withdraw(self) -> bool: ...
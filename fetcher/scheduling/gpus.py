@@ -0,0 +1,105 @@
+import threading
+from typing import Any
+
+from fetcher.api.model import HardwareSpecs
+from fetcher.info.sys import GPUInfo
+
+
+def needs_gpu(hardware: HardwareSpecs) -> bool:
+    return any(
+        v is not None
+        for v in (hardware.gpu_model, hardware.gpu_archi, hardware.gpu_mem)
+    )
+
+
+class GPUAllocator:
+    def __init__(self, gpus: list[GPUInfo]):
+        """Thread-safe inventory of the worker's GPUs, each used by one job at a time.
+
+        A job that asks for a GPU gets a free one of its `gpu_model` (if any)
+        with at least `gpu_mem` MB, the smallest that fits. On a worker with
+        GPUs, other jobs get the smallest free one too, as they had access to
+        all GPUs before jobs were given their own; on a worker without, none.
+        The architecture (`gpu_archi`) is not known, hence not matched.
+        """
+        self._gpus = list(gpus)
+        self._busy: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def n_total(self) -> int:
+        return len(self._gpus)
+
+    @property
+    def n_free(self) -> int:
+        with self._lock:
+            return len(self._gpus) - len(self._busy)
+
+    def free(self) -> list[GPUInfo]:
+        with self._lock:
+            return [g for g in self._gpus if g.uuid not in self._busy]
+
+    def fetch_kwargs(self) -> dict[str, Any]:
+        """GPU to advertise when fetching a job: the free one with most memory.
+
+        If all GPUs are busy, the one with most memory is advertised anyway: the
+        job is staged ahead (see `EngineConfig.lookahead`) and starts once a GPU
+        is freed.
+        """
+        gpus = self.free() or self._gpus
+        if not gpus:
+            return {"gpu_model": None, "gpu_mem": None}
+        gpu = max(gpus, key=lambda g: g.memory)
+        return {"gpu_model": gpu.model, "gpu_mem": gpu.memory}
+
+    def satisfiable(self, hardware: HardwareSpecs) -> bool:
+        """Whether any GPU of the worker, free or not, fits the job."""
+        return self._gpuless(hardware) or bool(self._matching(hardware, self._gpus))
+
+    def can_allocate(self, hardware: HardwareSpecs) -> bool:
+        return self._gpuless(hardware) or bool(self._matching(hardware, self.free()))
+
+    def allocate(self, hardware: HardwareSpecs) -> list[GPUInfo] | None:
+        """Take the GPU for a job.
+        :return: The GPUs, none if the worker has none for the job, or None if
+            none fits.
+        """
+        if self._gpuless(hardware):
+            return []
+        with self._lock:
+            free = [g for g in self._gpus if g.uuid not in self._busy]
+            matching = self._matching(hardware, free)
+            if not matching:
+                return None
+            self._busy.add(matching[0].uuid)
+            return matching[:1]
+
+    def claim(self, uuids: list[str]) -> list[GPUInfo]:
+        """Take specific GPUs, e.g., those of a re-attached container."""
+        with self._lock:
+            gpus = [g for g in self._gpus if g.uuid in uuids]
+            self._busy.update(g.uuid for g in gpus)
+            return gpus
+
+    def release(self, gpus: list[GPUInfo]) -> None:
+        with self._lock:
+            for gpu in gpus:
+                if gpu.uuid not in self._busy:
+                    raise ValueError(f"GPU {gpu.uuid} is not in use")
+                self._busy.remove(gpu.uuid)
+
+    def _gpuless(self, hardware: HardwareSpecs) -> bool:
+        """Whether the job runs without a GPU: it needs none and there is none."""
+        return not self._gpus and not needs_gpu(hardware)
+
+    @staticmethod
+    def _matching(hardware: HardwareSpecs, gpus: list[GPUInfo]) -> list[GPUInfo]:
+        return sorted(
+            (
+                g
+                for g in gpus
+                if hardware.gpu_model in (None, g.model)
+                and (hardware.gpu_mem or 0) <= g.memory
+            ),
+            key=lambda g: g.memory,
+        )
@@ -0,0 +1,20 @@
+from typing import Any
+
+from fetcher.api.model import HardwareSpecs
+from fetcher.info.sys import GPUInfo
+
+def needs_gpu(hardware: HardwareSpecs) -> bool: ...
+
+class GPUAllocator:
+    def __init__(self, gpus: list[GPUInfo]) -> None: ...
+    @property
+    def n_total(self) -> int: ...
+    @property
+    def n_free(self) -> int: ...
+    def free(self) -> list[GPUInfo]: ...
+    def fetch_kwargs(self) -> dict[str, Any]: ...
+    def satisfiable(self, hardware: HardwareSpecs) -> bool: ...
+    def can_allocate(self, hardware: HardwareSpecs) -> bool: ...
+    def allocate(self, hardware: HardwareSpecs) -> list[GPUInfo] | None: ...
+    def claim(self, uuids: list[str]) -> list[GPUInfo]: ...
+    def release(self, gpus: list[GPUInfo]) -> None: ...
@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel
+
+from fetcher.api.model import JobSpecs
+
+# phases of a job on the worker, in order
+Phase = Literal["preprocessing", "staged", "running", "postprocessing"]
+PHASES: tuple[Phase, ...] = ("preprocessing", "staged", "running", "postprocessing")
+
+
+class JournalEntry(BaseModel):
+    job_id: str
+    job: JobSpecs
+    phase: Phase
+    container_id: str | None = None
+    exit_code: int | None = None
+    oom_killed: bool = False
+
+    def reached(self, phase: Phase) -> bool:
+        return PHASES.index(self.phase) >= PHASES.index(phase)
+
+
+class JobJournal:
+    def __init__(self, path: str | Path):
+        """Durable record of the jobs in progress, in an SQLite database.
+
+        Each job is added when fetched, updated at each phase transition and
+        removed once reported, so that a restarted worker can resume the jobs
+        it was processing instead of starting them over.
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    phase TEXT NOT NULL,
+                    container_id TEXT,
+                    exit_code INTEGER,
+                    oom_killed INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL
+                )"""
+            )
+
+    def add(self, job_id: str, job: JobSpecs) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, job, phase, updated)"
+                " VALUES (?, ?, ?, ?)",
+                (job_id, job.model_dump_json(), "preprocessing", time.time()),
+            )
+
+    def update(
+        self,
+        job_id: str,
+        phase: Phase,
+        container_id: str | None = None,
+        exit_code: int | None = None,
+        oom_killed: bool = False,
+    ) -> None:
+        """Record a phase transition; `container_id` is kept if not given."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET phase = ?, container_id = COALESCE(?, container_id),"
+                " exit_code = ?, oom_killed = ?, updated = ? WHERE job_id = ?",
+                (phase, container_id, exit_code, oom_killed, time.time(), job_id),
+            )
+
+    def remove(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def entries(self) -> list[JournalEntry]:
+        """The jobs in progress, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, job, phase, container_id, exit_code, oom_killed"
+                " FROM jobs ORDER BY rowid"
+            ).fetchall()
+        return [
+            JournalEntry(
+                job_id=job_id,
+                job=JobSpecs.model_validate_json(job),
+                phase=phase,
+                container_id=container_id,
+                exit_code=exit_code,
+                oom_killed=bool(oom_killed),
+            )
+            for job_id, job, phase, container_id, exit_code, oom_killed in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from fetcher.api.model import JobSpecs
+
+# runtime variable, not a type alias, as in fetcher.models
+Phase: object
+PHASES: tuple[str, ...]
+
+class JournalEntry(BaseModel):
+    job_id: str
+    job: JobSpecs
+    phase: str
+    container_id: str | None = ...
+    exit_code: int | None = ...
+    oom_killed: bool = ...
+    def reached(self, phase: str) -> bool: ...
+
+class JobJournal:
+    def __init__(self, path: str | Path) -> None: ...
+    def add(self, job_id: str, job: JobSpecs) -> None: ...
+    def update(
+        self,
+        job_id: str,
+        phase: str,
+        container_id: str | None = None,
+        exit_code: int | None = None,
+        oom_killed: bool = False,
+    ) -> None: ...
+    def remove(self, job_id: str) -> None: ...
+    def entries(self) -> list[JournalEntry]: ...
+    def close(self) -> None: ...
@@ -0,0 +1,176 @@
+import os
+import threading
+from typing import Any
+
+from pydantic import BaseModel
+
+from fetcher.info.sys import NUMANode, SystemInfo
+
+
+class Slot(BaseModel):
+    """Share of the worker's CPUs and memory that runs one job at a time.
+
+    GPUs are not part of slots, but allocated to each job, see `gpus`.
+    """
+
+    index: int
+    cpu_cores: int
+    memory: int
+    # CPUs and NUMA nodes to pin the jobs to (none: not pinned)
+    cpus: list[int] = []
+    mems: list[int] = []
+
+    def fetch_kwargs(self) -> dict[str, Any]:
+        """Resources to advertise when fetching a job for this slot."""
+        return {
+            "cpu_cores": self.cpu_cores,
+            "memory": self.memory,
+        }
+
+
+def split(info: SystemInfo, n_slots: int, reserved_cores: int = 0) -> list[Slot]:
+    """Split the worker's resources into `n_slots` equal slots.
+
+    Each slot gets its own CPUs, within a single NUMA node if there are at
+    least as many slots as nodes, else whole nodes; its memory is its share
+    of that of its nodes.
+    :param reserved_cores: CPUs to keep for the fetcher and the system, in none
+        of the slots.
+    """
+    if n_slots < 1:
+        raise ValueError(f"Expected at least one slot, got {n_slots}")
+    return [
+        Slot(index=i, cpu_cores=len(cpus), memory=memory, cpus=cpus, mems=mems)
+        for i, (cpus, mems, memory) in enumerate(_place(info, n_slots, reserved_cores))
+    ]
+
+
+def _place(
+    info: SystemInfo, n_slots: int, reserved_cores: int
+) -> list[tuple[list[int], list[int], int]]:
+    """The CPUs, NUMA nodes and memory of each slot."""
+    # without the topology: a single node, to which memory is not bound
+    nodes = info.numa or [
+        NUMANode(index=-1, cpus=_usable_cpus(info), memory=info.sys.memory)
+    ]
+    n_cpus = sum(len(n.cpus) for n in nodes)
+    if not 0 <= reserved_cores < n_cpus:
+        raise ValueError(f"Can not reserve {reserved_cores} of {n_cpus} cores")
+    reserved = set([c for n in nodes for c in n.cpus][:reserved_cores])
+    nodes = [
+        n.model_copy(update={"cpus": [c for c in n.cpus if c not in reserved]})
+        for n in nodes
+        if set(n.cpus) - reserved
+    ]
+
+    def mems(group: list[NUMANode]) -> list[int]:
+        return [n.index for n in group if n.index >= 0]
+
+    if n_slots <= len(nodes):
+        # whole nodes for each slot
+        groups = [
+            nodes[i * len(nodes) // n_slots : (i + 1) * len(nodes) // n_slots]
+            for i in range(n_slots)
+        ]
+        return [
+            ([c for n in g for c in n.cpus], mems(g), sum(n.memory for n in g))
+            for g in groups
+        ]
+    # slots within nodes, as many in each as its CPUs allow
+    counts = [1] * len(nodes)
+    for _ in range(n_slots - len(nodes)):
+        i = max(range(len(nodes)), key=lambda i: len(nodes[i].cpus) / counts[i])
+        counts[i] += 1
+    placements = []
+    for node, count in zip(nodes, counts):
+        n = len(node.cpus)
+        for j in range(count):
+            cpus = node.cpus[j * n // count : (j + 1) * n // count]
+            if count > n:
+                # more slots than CPUs: slots share CPUs
+                cpus = [node.cpus[j % n]]
+            placements.append((cpus, mems([node]), node.memory // count))
+    return placements
+
+
+def _usable_cpus(info: SystemInfo) -> list[int]:
+    """The CPUs the worker may use, e.g., those it was started with `--cpuset-cpus`."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(info.sys.cores))
+
+
+class SlotPool:
+    def __init__(self, slots: list[Slot]):
+        """Thread-safe pool of slots; a job can only run while holding a slot."""
+        self._slots = list(slots)
+        self._free = list(slots)
+        self._lock = threading.Condition()
+
+    @classmethod
+    def from_system(
+        cls, info: SystemInfo, n_slots: int = 1, reserved_cores: int = 0
+    ) -> "SlotPool":
+        return cls(split(info, n_slots, reserved_cores))
+
+    @property
+    def n_total(self) -> int:
+        return len(self._slots)
+
+    @property
+    def n_free(self) -> int:
+        with self._lock:
+            return len(self._free)
+
+    def peek(self) -> Slot:
+        """The slot the next job will likely run in, without taking it."""
+        with self._lock:
+            return self._free[0] if self._free else self._slots[0]
+
+    def acquire(
+        self,
+        block: bool = False,
+        timeout: float | None = None,
+        index: int | None = None,
+    ) -> Slot | None:
+        """Take a free slot.
+        :param block: Wait until a slot is free (at most `timeout` seconds).
+        :param index: Take this slot rather than any, e.g., the one of a
+            container that is still running.
+        :return: The slot, or None if all slots (or that one) are busy.
+        """
+        with self._lock:
+            if block:
+                self._lock.wait_for(lambda: self._find(index) is not None, timeout)
+            slot = self._find(index)
+            if slot is not None:
+                self._free.remove(slot)
+            return slot
+
+    def is_free(self, index: int | None = None) -> bool:
+        """Whether any slot, or the one of `index`, is free."""
+        with self._lock:
+            return self._find(index) is not None
+
+    def index_of(self, cpus: list[int]) -> int | None:
+        """The slot whose CPUs include `cpus`, e.g., those a container is pinned to."""
+        if not cpus:
+            return None
+        for slot in self._slots:
+            if set(cpus) <= set(slot.cpus):
+                return slot.index
+        return None
+
+    def _find(self, index: int | None) -> Slot | None:
+        for slot in self._free:
+            if index is None or slot.index == index:
+                return slot
+        return None
+
+    def release(self, slot: Slot) -> None:
+        with self._lock:
+            if slot in self._free:
+                raise ValueError(f"Slot {slot.index} is not in use")
+            self._free.append(slot)
+            self._free.sort(key=lambda s: s.index)
+            self._lock.notify()
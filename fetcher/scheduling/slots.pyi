@@ -0,0 +1,36 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+from fetcher.info.sys import SystemInfo
+
+class Slot(BaseModel):
+    index: int
+    cpu_cores: int
+    memory: int
+    cpus: list[int] = ...
+    mems: list[int] = ...
+    def fetch_kwargs(self) -> dict[str, Any]: ...
+
+def split(info: SystemInfo, n_slots: int, reserved_cores: int = 0) -> list[Slot]: ...
+
+class SlotPool:
+    def __init__(self, slots: list[Slot]) -> None: ...
+    @classmethod
+    def from_system(
+        cls, info: SystemInfo, n_slots: int = 1, reserved_cores: int = 0
+    ) -> "SlotPool": ...
+    @property
+    def n_total(self) -> int: ...
+    @property
+    def n_free(self) -> int: ...
+    def peek(self) -> Slot: ...
+    def acquire(
+        self,
+        block: bool = False,
+        timeout: float | None = None,
+        index: int | None = None,
+    ) -> Slot | None: ...
+    def is_free(self, index: int | None = None) -> bool: ...
+    def index_of(self, cpus: list[int]) -> int | None: ...
+    def release(self, slot: Slot) -> None: ...
@@ -1,3 +1,5 @@
+# Single session for all requests, kept for compatibility; the fetcher itself
+# uses `fetcher.transport`, with separate pools and timeouts per endpoint class.
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
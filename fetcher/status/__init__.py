@@ -1,2 +1,3 @@
+from . import events as events
 from . import pinger as pinger
 from . import status as status
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from typing import Any
+
+import docker
+import docker.models
+import docker.models.containers
+from loguru import logger
+from pydantic import BaseModel
+
+
+class ContainerExit(BaseModel):
+    exit_code: int
+    oom_killed: bool = False
+
+
+class ContainerWatcher:
+    def __init__(self, client: docker.DockerClient | None = None):
+        """Follows the Docker events of containers, to notice exits immediately.
+
+        A single background thread consumes the `die`/`oom` events of all
+        containers; any number of coroutines, of any event loop, can
+        `wait_async` for their container.
+        """
+        self._client = client if client is not None else docker.from_env()
+        self._lock = threading.Lock()
+        self._watched: set[str] = set()
+        self._oom: set[str] = set()
+        self._futures: dict[
+            str, list[tuple[asyncio.AbstractEventLoop, asyncio.Future[ContainerExit]]]
+        ] = {}
+        self._stop_event = threading.Event()
+        self._stream: Any = None
+        self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+
+    def start(self) -> None:
+        if not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._stream is not None:
+            self._stream.close()
+        self._thread.join()
+
+    async def wait_async(
+        self,
+        container: docker.models.containers.Container,
+        poll_interval: float = 300,
+    ) -> ContainerExit:
+        """Wait for the container to exit, without blocking a thread meanwhile.
+        :param poll_interval: Interval to check the container state anyway, in
+            case the event stream missed the exit (e.g., while reconnecting).
+        """
+        loop = asyncio.get_running_loop()
+        container_id = str(container.id)
+        future: asyncio.Future[ContainerExit] = loop.create_future()
+        with self._lock:
+            self._watched.add(container_id)
+            self._futures.setdefault(container_id, []).append((loop, future))
+        try:
+            while True:
+                # the container might have exited before it was watched
+                container_exit = await asyncio.to_thread(_state_exit, container)
+                if container_exit is not None:
+                    return container_exit
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.shield(future), timeout=poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._lock:
+                waiters = self._futures.get(container_id, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                if not waiters:
+                    self._futures.pop(container_id, None)
+                    self._watched.discard(container_id)
+                    self._oom.discard(container_id)
+
+    def _watch_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self._stream = self._client.events(
+                    decode=True,
+                    filters={"type": "container", "event": ["die", "oom"]},
+                )
+                for event in self._stream:
+                    self._handle(event)
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                logger.warning(f"Docker event stream failed ({e!r}), reconnecting.")
+                time.sleep(1)
+
+    def _handle(self, event: dict[str, Any]) -> None:
+        actor = event.get("Actor", {})
+        container_id = actor.get("ID") or event.get("id")
+        with self._lock:
+            if container_id not in self._watched:
+                return
+            match event.get("Action"):
+                case "oom":
+                    self._oom.add(container_id)
+                case "die":
+                    exit_code = int(actor.get("Attributes", {}).get("exitCode", -1))
+                    container_exit = ContainerExit(
+                        exit_code=exit_code, oom_killed=container_id in self._oom
+                    )
+                    for loop, future in self._futures.get(container_id, []):
+                        loop.call_soon_threadsafe(_set_result, future, container_exit)
+
+
+def _set_result(
+    future: "asyncio.Future[ContainerExit]", container_exit: ContainerExit
+) -> None:
+    if not future.done():
+        future.set_result(container_exit)
+
+
+def _state_exit(
+    container: docker.models.containers.Container,
+) -> ContainerExit | None:
+    container.reload()
+    state = container.attrs["State"]
+    if state["Status"] not in ("exited", "dead"):
+        return None
+    return ContainerExit(
+        exit_code=state["ExitCode"], oom_killed=state.get("OOMKilled", False)
+    )
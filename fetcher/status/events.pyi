@@ -0,0 +1,18 @@
+import docker
+import docker.models
+import docker.models.containers
+from pydantic import BaseModel
+
+class ContainerExit(BaseModel):
+    exit_code: int
+    oom_killed: bool = ...
+
+class ContainerWatcher:
+    def __init__(self, client: docker.DockerClient | None = None) -> None: ...
+    def start(self) -> None: ...
+    def stop(self) -> None: ...
+    async def wait_async(
+        self,
+        container: docker.models.containers.Container,
+        poll_interval: float = 300,
+    ) -> ContainerExit: ...
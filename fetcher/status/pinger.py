@@ -29,7 +29,7 @@ class ParallelPinger:
     def _ping_loop(self) -> None:
         while not self._stop_event.is_set():
             self.ping()
-            time.sleep(self.timeout)
+            self._stop_event.wait(self.timeout)
 
     def start(self) -> None:
         if not self._thread.is_alive():
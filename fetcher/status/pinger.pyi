@@ -10,6 +10,8 @@ class Pinger(ABC):
     def stop(self) -> None: ...
 
 class ParallelPinger:
+    ping: Callable[[], bool]
+    timeout: int | float
     def __init__(self, ping: Callable[[], bool], timeout: int | float = 60): ...
     def start(self) -> None: ...
     def stop(self) -> None: ...
@@ -0,0 +1,229 @@
+import abc
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Any, ContextManager, Iterator, Literal
+
+Format = Literal["jsonl", "chrome"]
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        attributes: dict[str, Any],
+    ):
+        """A timed operation, e.g., the download of a file of a job.
+
+        Spans of the same trace (e.g., a job) form a tree through `parent_id`.
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: str | None = None
+        self.thread = threading.get_native_id()
+        try:
+            asyncio.get_running_loop()
+            # on the event loop, spans of concurrent jobs interleave in one thread
+            self.in_loop = True
+        except RuntimeError:
+            self.in_loop = False
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration: float | None = None
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self._start_perf
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "thread": self.thread,
+            "in_loop": self.in_loop,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Exporter(abc.ABC):
+    @abc.abstractmethod
+    def export(self, span: Span) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class _FileExporter(Exporter):
+    def __init__(self, path: Path, mode: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: IO[str] = path.open(mode, buffering=1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class JsonlExporter(_FileExporter):
+    def __init__(self, path: Path):
+        """Appends each span as a line of JSON, when it ends."""
+        super().__init__(path, "a")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+class ChromeExporter(_FileExporter):
+    def __init__(self, path: Path):
+        """Writes spans as a Chrome trace (chrome://tracing, Perfetto).
+
+        Spans of the event loop are shown in one row per trace (i.e., job),
+        those of other threads in one row per thread. The closing bracket is
+        written by `close`; the viewers accept files without it, e.g., after a
+        crash. An existing file is overwritten.
+        """
+        super().__init__(path, "w")
+        self._first = True
+        self._rows: dict[str, int] = {}
+        self._pid = os.getpid()
+        self._file.write("[\n")
+
+    def export(self, span: Span) -> None:
+        assert span.duration is not None
+        with self._lock:
+            tid = span.thread
+            if span.in_loop:
+                tid = self._row(span.trace_id)
+            event = {
+                "name": span.name,
+                "cat": span.trace_id,
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": self._pid,
+                "tid": tid,
+                "args": {**span.attributes, "trace_id": span.trace_id}
+                | ({"error": span.error} if span.error else {}),
+            }
+            self._write(event)
+
+    def _row(self, trace_id: str) -> int:
+        if trace_id not in self._rows:
+            # thread IDs are below 2**22 on Linux
+            self._rows[trace_id] = (1 << 30) + len(self._rows)
+            self._write(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": self._rows[trace_id],
+                    "args": {"name": f"trace {trace_id}"},
+                }
+            )
+        return self._rows[trace_id]
+
+    def _write(self, event: dict[str, Any]) -> None:
+        separator = "" if self._first else ",\n"
+        self._first = False
+        self._file.write(separator + json.dumps(event, default=str))
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.write("\n]\n")
+            self._file.close()
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "span", default=None
+)
+
+
+class Tracer:
+    def __init__(self, exporter: Exporter | None = None):
+        """Records spans with `exporter`, or nothing if None (at almost no cost).
+
+        The current span is kept in a context variable, so that it is the parent
+        of spans in tasks created from it and in `asyncio.to_thread` calls.
+        """
+        self.exporter = exporter
+
+    def span(
+        self, name: str, trace_id: str | None = None, **attributes: Any
+    ) -> ContextManager[Span | None]:
+        """Time the block as a span, child of the current one if any.
+        :param trace_id: ID of a new trace, if not within one (default: new ID).
+        """
+        if self.exporter is None:
+            return _NOOP
+        return self._span(name, trace_id, attributes)
+
+    @contextlib.contextmanager
+    def _span(
+        self, name: str, trace_id: str | None, attributes: dict[str, Any]
+    ) -> Iterator[Span]:
+        assert self.exporter is not None
+        parent = _current.get()
+        if parent is not None and trace_id is None:
+            trace_id = parent.trace_id
+        span = Span(
+            name,
+            trace_id or uuid.uuid4().hex[:16],
+            parent.span_id
+            if parent is not None and parent.trace_id == trace_id
+            else None,
+            attributes,
+        )
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+            self.exporter.export(span)
+
+    def close(self) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+
+
+_NOOP: ContextManager[None] = contextlib.nullcontext()
+_tracer = Tracer()
+
+
+def configure(path: Path | None, format: Format = "jsonl") -> Tracer:
+    """Set the tracer used by `span`: to `path` in `format`, or none if None."""
+    global _tracer
+    exporter: Exporter | None = None
+    if path is not None:
+        exporter = ChromeExporter(path) if format == "chrome" else JsonlExporter(path)
+    _tracer = Tracer(exporter)
+    return _tracer
+
+
+def span(
+    name: str, trace_id: str | None = None, **attributes: Any
+) -> ContextManager[Span | None]:
+    """A span of the configured tracer, see `Tracer.span`."""
+    return _tracer.span(name, trace_id, **attributes)
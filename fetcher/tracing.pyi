@@ -0,0 +1,58 @@
+import abc
+from pathlib import Path
+from typing import Any, ContextManager, Literal
+
+Format: object
+
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    attributes: dict[str, Any]
+    error: str | None
+    thread: int
+    in_loop: bool
+    start: float
+    duration: float | None
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        attributes: dict[str, Any],
+    ) -> None: ...
+    def end(self) -> None: ...
+    def to_dict(self) -> dict[str, Any]: ...
+
+class Exporter(abc.ABC):
+    @abc.abstractmethod
+    def export(self, span: Span) -> None: ...
+    def close(self) -> None: ...
+
+class _FileExporter(Exporter, metaclass=abc.ABCMeta):
+    path: Path
+    def __init__(self, path: Path, mode: str) -> None: ...
+
+class JsonlExporter(_FileExporter):
+    def __init__(self, path: Path) -> None: ...
+    def export(self, span: Span) -> None: ...
+
+class ChromeExporter(_FileExporter):
+    def __init__(self, path: Path) -> None: ...
+    def export(self, span: Span) -> None: ...
+
+class Tracer:
+    exporter: Exporter | None
+    def __init__(self, exporter: Exporter | None = None) -> None: ...
+    def span(
+        self, name: str, trace_id: str | None = None, **attributes: Any
+    ) -> ContextManager[Span | None]: ...
+    def close(self) -> None: ...
+
+def configure(
+    path: Path | None, format: Literal["jsonl", "chrome"] = "jsonl"
+) -> Tracer: ...
+def span(
+    name: str, trace_id: str | None = None, **attributes: Any
+) -> ContextManager[Span | None]: ...
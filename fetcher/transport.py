@@ -0,0 +1,237 @@
+import random
+import threading
+from typing import Any
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util import Retry
+
+from fetcher import metrics
+from fetcher.scheduling import breaker
+
+
+class TransportConfig(BaseModel):
+    # label of the transport in the metrics
+    name: str = "default"
+    connect_timeout: float = 10
+    read_timeout: float = 60
+    pool_size: int = 10
+    retries: int = 3
+    backoff_factor: float = 1
+    backoff_max: float = 10
+    status_forcelist: list[int] = [429, 500, 502, 503, 504]
+    # share of the requests that may be retried (unlimited if None)
+    retry_ratio: float | None = None
+    # consecutive failures after which requests fail fast (never if 0)
+    breaker_threshold: int = 0
+    breaker_timeout: float = 30
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Request refused without being sent, as the service keeps failing."""
+
+
+class BudgetRetry(Retry):
+    def __init__(
+        self,
+        *args: Any,
+        budget: breaker.RetryBudget | None = None,
+        max_backoff: float = 10,
+        **kwargs: Any,
+    ):
+        """`Retry` with jittered backoff, within a retry budget shared by all
+        requests of a transport.
+
+        Only idempotent methods are retried once a request was sent (urllib3's
+        default); e.g., a POST is only retried if the connection failed.
+        """
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+        self.max_backoff = max_backoff
+
+    def new(self, **kwargs: Any) -> "BudgetRetry":
+        retry = super().new(**kwargs)
+        retry.budget = self.budget
+        retry.max_backoff = self.max_backoff
+        return retry
+
+    def get_backoff_time(self) -> float:
+        # upper half of the capped exponential backoff, as `backoff.Backoff`
+        cap = min(self.max_backoff, super().get_backoff_time())
+        return random.uniform(cap / 2, cap)
+
+    def increment(
+        self,
+        method: str | None = None,
+        url: str | None = None,
+        response: Any = None,
+        error: Exception | None = None,
+        _pool: Any = None,
+        _stacktrace: Any = None,
+    ) -> "BudgetRetry":
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        redirect = response is not None and response.get_redirect_location()
+        if self.budget is not None and not redirect and not self.budget.withdraw():
+            reason = error or ResponseError("retry budget exhausted")
+            raise MaxRetryError(_pool, url, reason)
+        return retry
+
+
+class BreakerAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        *args: Any,
+        circuit_breaker: breaker.CircuitBreaker | None = None,
+        budget: breaker.RetryBudget | None = None,
+        **kwargs: Any,
+    ):
+        """`HTTPAdapter` that fails fast while `circuit_breaker` is open.
+
+        Connection errors, timeouts and server errors count as failures (after
+        retries); each request sent adds to `budget`.
+        """
+        super().__init__(*args, **kwargs)
+        self.circuit_breaker = circuit_breaker
+        self.budget = budget
+
+    def send(  # type: ignore[override]
+        self, request: requests.PreparedRequest, **kwargs: Any
+    ) -> requests.Response:
+        circuit_breaker = self.circuit_breaker
+        if circuit_breaker is not None and not circuit_breaker.allow():
+            raise CircuitOpenError(
+                f"Circuit open for {circuit_breaker.retry_after:.0f}s, "
+                f"not sending {request.method} {request.url}",
+                request=request,
+            )
+        if self.budget is not None:
+            self.budget.deposit()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.RequestException:
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            raise
+        if circuit_breaker is not None:
+            if response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+        return response
+
+
+class Transport:
+    def __init__(self, config: TransportConfig):
+        """HTTP client for one class of endpoints, with its own pool and timeouts.
+
+        Each thread gets its own `requests.Session` (sessions are not
+        thread-safe), but all of them share the transport's adapter, i.e., its
+        connection pool, retry budget and circuit breaker. Responses with an
+        error status raise.
+        """
+        self.config = config
+        self.budget = None
+        if config.retry_ratio is not None:
+            self.budget = breaker.RetryBudget(ratio=config.retry_ratio)
+        self.circuit_breaker = None
+        if config.breaker_threshold > 0:
+            self.circuit_breaker = breaker.CircuitBreaker(
+                failure_threshold=config.breaker_threshold,
+                reset_timeout=config.breaker_timeout,
+            )
+        self.adapter = BreakerAdapter(
+            pool_connections=config.pool_size,
+            pool_maxsize=config.pool_size,
+            max_retries=BudgetRetry(
+                total=config.retries,
+                backoff_factor=config.backoff_factor,
+                status_forcelist=config.status_forcelist,
+                budget=self.budget,
+                max_backoff=config.backoff_max,
+            ),
+            circuit_breaker=self.circuit_breaker,
+            budget=self.budget,
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """The session of the calling thread."""
+        session: requests.Session | None = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.hooks = {
+                "response": [lambda r, *args, **kwargs: r.raise_for_status()]
+            }
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def timeout(self, extra_read: float = 0) -> tuple[float, float]:
+        """(connect, read) timeouts, e.g., with the duration of a long poll."""
+        return self.config.connect_timeout, self.config.read_timeout + extra_read
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout())
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            metrics.api_errors.inc(transport=self.config.name, reason=_reason(e))
+            raise
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+
+def _reason(e: requests.RequestException) -> str:
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return str(e.response.status_code)
+    if isinstance(e, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(e, requests.Timeout):
+        return "timeout"
+    if isinstance(e, requests.exceptions.RetryError):
+        return "retries_exhausted"
+    if isinstance(e, requests.ConnectionError):
+        return "connection"
+    return type(e).__name__
+
+
+# control plane: job fetching, status, upload URLs; retried briefly (about 15s
+# at most), then failing fast while the API is down, so that the callers back
+# off instead of blocking on a single call
+api = Transport(
+    TransportConfig(
+        name="api",
+        read_timeout=30,
+        retries=4,
+        retry_ratio=0.2,
+        breaker_threshold=5,
+        breaker_timeout=30,
+    )
+)
+# data plane: transfers to and from pre-signed URLs of the bucket; resumed and
+# retried by the callers, so a stalled transfer fails rather than hangs
+storage = Transport(
+    TransportConfig(
+        name="storage",
+        read_timeout=120,
+        pool_size=32,
+        retries=2,
+        status_forcelist=[500, 502, 503, 504],
+    )
+)
+# authentication
+auth = Transport(TransportConfig(name="auth", pool_size=2))
@@ -0,0 +1,78 @@
+from typing import Any
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from fetcher.scheduling import breaker
+
+class TransportConfig(BaseModel):
+    name: str = ...
+    connect_timeout: float = ...
+    read_timeout: float = ...
+    pool_size: int = ...
+    retries: int = ...
+    backoff_factor: float = ...
+    backoff_max: float = ...
+    status_forcelist: list[int] = ...
+    retry_ratio: float | None = ...
+    breaker_threshold: int = ...
+    breaker_timeout: float = ...
+
+class CircuitOpenError(requests.ConnectionError): ...
+
+class BudgetRetry(Retry):
+    budget: breaker.RetryBudget | None
+    max_backoff: float
+    def __init__(
+        self,
+        *args: Any,
+        budget: breaker.RetryBudget | None = None,
+        max_backoff: float = 10,
+        **kwargs: Any,
+    ) -> None: ...
+    def new(self, **kwargs: Any) -> BudgetRetry: ...
+    def get_backoff_time(self) -> float: ...
+    def increment(
+        self,
+        method: str | None = None,
+        url: str | None = None,
+        response: Any = None,
+        error: Exception | None = None,
+        _pool: Any = None,
+        _stacktrace: Any = None,
+    ) -> BudgetRetry: ...
+
+class BreakerAdapter(HTTPAdapter):
+    circuit_breaker: breaker.CircuitBreaker | None
+    budget: breaker.RetryBudget | None
+    def __init__(
+        self,
+        *args: Any,
+        circuit_breaker: breaker.CircuitBreaker | None = None,
+        budget: breaker.RetryBudget | None = None,
+        **kwargs: Any,
+    ) -> None: ...
+    def send(  # type: ignore[override]
+        self, request: requests.PreparedRequest, **kwargs: Any
+    ) -> requests.Response: ...
+
+class Transport:
+    config: TransportConfig
+    budget: breaker.RetryBudget | None
+    circuit_breaker: breaker.CircuitBreaker | None
+    adapter: BreakerAdapter
+    def __init__(self, config: TransportConfig) -> None: ...
+    @property
+    def session(self) -> requests.Session: ...
+    def timeout(self, extra_read: float = 0) -> tuple[float, float]: ...
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response: ...
+    def get(self, url: str, **kwargs: Any) -> requests.Response: ...
+    def post(self, url: str, **kwargs: Any) -> requests.Response: ...
+    def put(self, url: str, **kwargs: Any) -> requests.Response: ...
+    def delete(self, url: str, **kwargs: Any) -> requests.Response: ...
+
+api: Transport
+storage: Transport
+auth: Transport
@@ -1,9 +1,136 @@
-from typing import Any, Literal
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Literal, MutableMapping
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import Body, FastAPI, File, HTTPException, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+# seconds after which workers should ask again when there is no job
+RETRY_AFTER = 5
+# where uploads are stored, in place of the bucket
+UPLOAD_DIR = Path(os.getenv("MOCK_UPLOAD_DIR", tempfile.mkdtemp(prefix="mock_api_")))
+
+# synthetic jobs queued at startup (instead of the demo job, if any)
+N_JOBS = int(os.getenv("MOCK_JOBS", 0))
+FILES_IN = int(os.getenv("MOCK_FILES_IN", 1))
+SIZE_IN = int(os.getenv("MOCK_SIZE_IN", 1 << 20))
+FILES_OUT = int(os.getenv("MOCK_FILES_OUT", 1))
+SIZE_OUT = int(os.getenv("MOCK_SIZE_OUT", 1 << 20))
+RUN_SECONDS = float(os.getenv("MOCK_RUN_SECONDS", 1))
+IMAGE = os.getenv("MOCK_IMAGE", "busybox:latest")
+
+# faults injected into the requests of the workers
+LATENCY = float(os.getenv("MOCK_LATENCY", 0))
+ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", 0))
+DROP_RATE = float(os.getenv("MOCK_DROP_RATE", 0))
+SEED = os.getenv("MOCK_SEED")
+# seconds after which a job whose worker reported no status is queued again,
+# e.g., when the response with the job was lost (default: 0, never)
+REQUEUE_AFTER = float(os.getenv("MOCK_REQUEUE_AFTER", 0))
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+# requests for testing only, never faulty
+CONTROL_REQUESTS = [
+    ("GET", re.compile(r"/")),
+    ("POST", re.compile(r"/jobs")),
+    ("DELETE", re.compile(r"/jobs(/[^/]+)?")),
+]
+
+
+class FaultInjection:
+    def __init__(
+        self,
+        app: Callable[[Scope, Receive, Send], Awaitable[None]],
+        latency: float = 0,
+        error_rate: float = 0,
+        drop_rate: float = 0,
+        seed: str | None = None,
+    ):
+        """Delay requests, fail them with 503, or drop their connection.
+
+        The delay is uniform between 0 and twice `latency` seconds. A dropped
+        connection is closed halfway through the body of the response, after
+        its headers were sent, as after a network failure.
+        """
+        self.app = app
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or any(
+            scope["method"] == method and pattern.fullmatch(scope["path"])
+            for method, pattern in CONTROL_REQUESTS
+        ):
+            await self.app(scope, receive, send)
+            return
+        if self.latency:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.latency))
+        if self.rng.random() < self.error_rate:
+            await _send_json(send, 503, {"detail": "Injected error"})
+            return
+        if self.rng.random() < self.drop_rate:
+            await self.app(scope, receive, _dropping(send))
+            return
+        await self.app(scope, receive, send)
+
+
+def _dropping(send: Send) -> Send:
+    dropped = False
+
+    async def send_partial(message: Message) -> None:
+        nonlocal dropped
+        if dropped:
+            return
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            # the server closes the connection of the incomplete response
+            dropped = True
+            message = {**message, "body": body[: len(body) // 2], "more_body": True}
+        await send(message)
+
+    return send_partial
+
+
+async def _send_json(send: Send, status: int, content: dict[str, Any]) -> None:
+    body = json.dumps(content).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
 app = FastAPI()
+app.add_middleware(
+    FaultInjection,
+    latency=LATENCY,
+    error_rate=ERROR_RATE,
+    drop_rate=DROP_RATE,
+    seed=SEED,
+)
 
 
 @app.get("/")
@@ -12,8 +139,10 @@ async def root() -> dict[str, str]:
 
 
 @app.get("/files/{file_id}/url")
-async def file_get(file_id: str) -> dict[str, str]:
+async def file_get(request: Request, file_id: str) -> dict[str, str]:
     # return presigned public URL
+    if file_id.startswith("synthetic_"):
+        return {"url": f"{request.base_url}storage/{file_id}", "method": "get"}
     match file_id:
         case "config_file_id":
             url = "https://oc.embl.de/index.php/s/Vt8Tz9c4YlHikOr/download"
@@ -32,6 +161,54 @@ async def file_get(file_id: str) -> dict[str, str]:
     return {"url": url, "method": "get"}
 
 
+def _synthetic_size(file_id: str) -> int:
+    """Size in bytes of a generated file, with ID `synthetic_<size>[_<any>]`."""
+    try:
+        return int(file_id.split("_")[1])
+    except (IndexError, ValueError):
+        raise HTTPException(status_code=404, detail="File not found")
+
+
+def _synthetic_content(file_id: str, start: int, end: int) -> Iterator[bytes]:
+    """Bytes `start` to `end` (excluded) of a generated file, by chunks of 1 MiB."""
+    digest = hashlib.sha256(file_id.encode()).digest()
+    pattern = digest * (2**15 + 1)
+    while start < end:
+        offset = start % len(digest)
+        n = min(2**20, end - start)
+        yield pattern[offset : offset + n]
+        start += n
+
+
+@app.get("/storage/{file_id}")
+async def storage_get(file_id: str, request: Request) -> StreamingResponse:
+    """Stands in for the bucket: generated content of the size in the file ID.
+
+    Supports `Range: bytes=<start>-[<end>]` requests, to resume downloads.
+    """
+    size = _synthetic_size(file_id)
+    start, end = 0, size
+    status_code = 200
+    headers = {"Accept-Ranges": "bytes"}
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+    if match is not None:
+        start = int(match[1])
+        end = min(size, int(match[2]) + 1) if match[2] else size
+        if start >= end:
+            raise HTTPException(
+                status_code=416, headers={"Content-Range": f"bytes */{size}"}
+            )
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    headers["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        _synthetic_content(file_id, start, end),
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
 class HardwareSpecs(BaseModel):
     cpu_cores: int | None = None
     memory: int | None = None
@@ -72,11 +249,78 @@ class JobSpecs(BaseModel):
         orm_mode = True
 
 
+DEMO_JOB: dict[str, Any] = {
+    "app": {
+        "cmd": [
+            "--config-dir=/data/config",
+            "--config-name=config",
+            "Paths.experiment=/data/model",
+            "Paths.logging=/data/log",
+        ],
+        "env": {},
+    },
+    "handler": {
+        "image_url": "public.ecr.aws/d2r7a3u1/decode:dev_multiphot_tar",
+        "aws_job_def": "decode_train_latest",
+        "files_down": {
+            "config/config.yaml": "config_file_id",
+            "data/beads.mat": "beads_file_id",
+            "data/trafo.mat": "trafo_file_id",
+        },
+        "files_up": {"log": "log", "artifact": "model"},
+    },
+    "meta": {"job_id": 9, "date_created": "2023-09-20T14:14:37.596024"},
+    "hardware": {},
+}
+
+
+def synthetic_job(index: int) -> dict[str, Any]:
+    """A job with generated inputs, whose container writes outputs of zeros."""
+    write = (
+        f"for i in $(seq {FILES_OUT}); "
+        f"do head -c {SIZE_OUT} /dev/zero > /files/output/$i.bin; done"
+    )
+    return {
+        "app": {"cmd": [f"sleep {RUN_SECONDS} && {write}"], "env": {}},
+        "handler": {
+            "image_url": IMAGE,
+            "files_down": {
+                f"input/{i}.bin": f"synthetic_{SIZE_IN}_{index}_{i}"
+                for i in range(FILES_IN)
+            },
+            "files_up": {"output": "output"},
+        },
+        "meta": {"job_id": index, "date_created": "2024-01-01T00:00:00"},
+        "hardware": {},
+    }
+
+
+# jobs waiting for a worker, by ID
+job_queue: dict[str, dict[str, Any]] = (
+    {f"synthetic-{i}": synthetic_job(i) for i in range(N_JOBS)}
+    if N_JOBS > 0
+    else {"5": DEMO_JOB}
+)
+job_queue_changed = asyncio.Condition()
+# jobs given to a worker that reported no status yet: (time given, job), by ID
+job_unconfirmed: dict[str, tuple[float, dict[str, Any]]] = {}
+
+
+@app.post("/jobs")
+async def job_post(job_id: str, job: dict[str, Any] = Body(...)) -> dict[str, str]:
+    """Queue a job (not part of the worker-facing API, for testing only)."""
+    async with job_queue_changed:
+        job_queue[job_id] = job
+        job_queue_changed.notify_all()
+    return {"job_id": job_id}
+
+
 @app.get("/jobs")
 async def job_get(
-    hostname: str,
+    response: Response,
     cpu_cores: int,
     memory: int,
+    hostname: str | None = None,
     env: str | None = None,
     gpu_model: str | None = None,
     gpu_archi: str | None = None,
@@ -84,83 +328,55 @@ async def job_get(
     groups: list[str] | None = None,
     limit: int = 1,
     older_than: int | None = None,
+    wait: float | None = None,
 ) -> dict[str, Any]:
-    return {
-        "5": {
-            "app": {
-                "cmd": [
-                    "--config-dir=/data/config",
-                    "--config-name=config",
-                    "Paths.experiment=/data/model",
-                    "Paths.logging=/data/log",
-                ],
-                "env": {},
-            },
-            "handler": {
-                "image_url": "public.ecr.aws/d2r7a3u1/decode:dev_multiphot_tar",
-                "aws_job_def": "decode_train_latest",
-                "files_down": {
-                    "config/config.yaml": "config_file_id",
-                    "data/beads.mat": "beads_file_id",
-                    "data/trafo.mat": "trafo_file_id",
-                },
-                "files_up": {"log": "log", "artifact": "model"},
-            },
-            "meta": {"job_id": 9, "date_created": "2023-09-20T14:14:37.596024"},
-            "hardware": {},
-        }
-    }
-    # return {
-    #     "a6": JobSpecs(
-    #         app=AppSpecs(
-    #             cmd=[
-    #                 # fmt: off
-    #                 # "python", "-m", "cli.train",
-    #                 "--config-dir", "/data/config/",
-    #                 "--config-name", "config",
-    #                 "Trainer.max_epochs=1",
-    #                 # fmt: on
-    #             ]
-    #         ),
-    #         handler=HandlerSpecs(
-    #             image_url="decode:dev_multiphot_tar",
-    #             files_down={
-    #                 "config/config.yaml": "config_a6",
-    #                 "data/beads.mat": "beads_a6",
-    #                 "data/trafo.mat": "trafo_a6",
-    #             },
-    #             files_up={"artifact": "output/", "log": "log/"},
-    #         ),
-    #         meta=MetaSpecs(date_created="2021-08-01T12:00:00+00:00"),
-    #     )
-    # }
-    # return {
-    #     "mock_a6": JobSpecs(
-    #         app=AppSpecs(
-    #             cmd=None
-    #         ),
-    #         handler=HandlerSpecs(
-    #             image_url="mock_decode:0.0.6",
-    #             files_down={
-    #                 "config/config.yaml": "config_a6",
-    #                 "data/beads.mat": "beads_a6",
-    #                 "data/trafo.mat": "trafo_a6",
-    #             },
-    #             files_up={"artifact": "artifact/", "log": "log/", "output": "output/"},
-    #         ),
-    #         meta=MetaSpecs(date_created="2021-08-01T12:00:00+00:00"),
-    #     )
-    # }
+    async with job_queue_changed:
+        if REQUEUE_AFTER > 0:
+            now = time.monotonic()
+            for job_id, (given, job) in list(job_unconfirmed.items()):
+                if now - given > REQUEUE_AFTER:
+                    del job_unconfirmed[job_id]
+                    job_queue[job_id] = job
+        if not job_queue and wait:
+            # long polling: hold the request until a job is queued
+            try:
+                await asyncio.wait_for(
+                    job_queue_changed.wait_for(lambda: bool(job_queue)), timeout=wait
+                )
+            except asyncio.TimeoutError:
+                pass
+        jobs = {k: job_queue.pop(k) for k in list(job_queue)[:limit]}
+        if REQUEUE_AFTER > 0:
+            job_unconfirmed.update({k: (time.monotonic(), v) for k, v in jobs.items()})
+    if not jobs:
+        response.headers["Retry-After"] = str(RETRY_AFTER)
+    return jobs
 
 
 @app.post("/jobs/{job_id}/files/url")
 async def job_file_post(
+    request: Request,
     job_id: str,
     type: Literal["artifact", "log", "output"],
     base_path: str = "",
-    file: UploadFile = File(...),
 ) -> dict[str, Any]:
-    return {"url": "https://fake_url.com", "method": "put", "data": {}}
+    # stands in for the bucket's pre-signed POST URL
+    url = f"{request.base_url}uploads/{job_id}/{type}"
+    if base_path:
+        url = f"{url}/{base_path}"
+    return {"url": url, "method": "post", "data": {}}
+
+
+@app.post("/uploads/{path:path}")
+async def upload_post(path: str, file: UploadFile = File(...)) -> dict[str, str]:
+    """Write an uploaded file to `$MOCK_UPLOAD_DIR/<job_id>/<type>/<path>`."""
+    path_file = UPLOAD_DIR / path / (file.filename or "file")
+    if not path_file.resolve().is_relative_to(UPLOAD_DIR.resolve()):
+        raise HTTPException(status_code=400, detail="Invalid path")
+    path_file.parent.mkdir(parents=True, exist_ok=True)
+    with path_file.open("wb") as f:
+        shutil.copyfileobj(file.file, f, 2**20)
+    return {"path": str(path_file.relative_to(UPLOAD_DIR))}
 
 
 @app.get("/jobs/{job_id}/status")
@@ -168,14 +384,139 @@ async def job_status_get(job_id: int) -> dict[str, str]:
     return {"message": f"The job with ID {job_id}."}
 
 
+Status = Literal["preprocessing", "running", "postprocessing", "finished", "error"]
+
+# last status reported by the workers, by job ID
+job_statuses: dict[str, str] = {}
+
+
 @app.put("/jobs/{job_id}/status")
 async def job_status_put(
     job_id: str,
-    status: Literal["preprocessing", "running", "postprocessing", "finished", "error"],
+    status: Status,
     runtime_details: str | None = None,
 ) -> dict[str, Any]:
+    job_statuses[job_id] = status
+    job_unconfirmed.pop(job_id, None)
     return {
         "job_id": job_id,
         "status": status,
         "runtime_details": runtime_details,
     }
+
+
+@app.put("/jobs/status")
+async def jobs_status_put(
+    statuses: dict[str, Status] = Body(..., embed=True),
+) -> dict[str, str]:
+    """Heartbeats of all jobs of a worker; only known jobs are updated."""
+    results = {}
+    for job_id, status in statuses.items():
+        if job_id in job_statuses:
+            job_statuses[job_id] = status
+            results[job_id] = "ok"
+        else:
+            results[job_id] = "not_found"
+    return results
+
+
+@app.delete("/jobs")
+async def job_delete_all() -> dict[str, list[str]]:
+    """Remove all jobs not finished yet (for testing only), e.g., the demo job."""
+    async with job_queue_changed:
+        job_ids = [*job_queue, *job_unconfirmed]
+        job_queue.clear()
+        job_unconfirmed.clear()
+    return {"job_ids": job_ids}
+
+
+@app.delete("/jobs/{job_id}")
+async def job_delete(job_id: str) -> dict[str, str]:
+    """Delete a job, as a user would (not part of the worker-facing API)."""
+    job_queue.pop(job_id, None)
+    job_unconfirmed.pop(job_id, None)
+    if job_statuses.pop(job_id, None) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id}
+
+
+# multipart uploads in progress, by upload ID
+multipart_uploads: dict[str, dict[str, Any]] = {}
+
+
+@app.post("/jobs/{job_id}/files/multipart")
+async def job_multipart_post(
+    request: Request,
+    job_id: str,
+    type: Literal["artifact", "log", "output"],
+    file_name: str,
+    size: int,
+    part_size: int,
+    base_path: str = "",
+) -> dict[str, Any]:
+    path_file = UPLOAD_DIR / job_id / type / base_path / file_name
+    if not path_file.resolve().is_relative_to(UPLOAD_DIR.resolve()):
+        raise HTTPException(status_code=400, detail="Invalid path")
+    upload_id = uuid.uuid4().hex
+    multipart_uploads[upload_id] = {
+        "path": path_file,
+        "n_parts": max(1, math.ceil(size / part_size)),
+    }
+    (UPLOAD_DIR / ".parts" / upload_id).mkdir(parents=True)
+    return {
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "parts": [
+            {
+                "part_number": n,
+                "method": "put",
+                # stands in for the bucket's pre-signed part URL
+                "url": f"{request.base_url}uploads/{upload_id}/{n}",
+            }
+            for n in range(1, multipart_uploads[upload_id]["n_parts"] + 1)
+        ],
+    }
+
+
+@app.put("/uploads/{upload_id}/{part_number}")
+async def upload_part_put(
+    request: Request, response: Response, upload_id: str, part_number: int
+) -> None:
+    if upload_id not in multipart_uploads:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    data = await request.body()
+    (UPLOAD_DIR / ".parts" / upload_id / str(part_number)).write_bytes(data)
+    response.headers["ETag"] = f'"{hashlib.md5(data).hexdigest()}"'
+
+
+@app.post("/jobs/{job_id}/files/multipart/{upload_id}/complete")
+async def job_multipart_complete(
+    job_id: str, upload_id: str, parts: list[dict[str, Any]] = Body(..., embed=True)
+) -> dict[str, str]:
+    upload = multipart_uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    path_parts = UPLOAD_DIR / ".parts" / upload_id
+    if sorted(p["part_number"] for p in parts) != list(range(1, upload["n_parts"] + 1)):
+        raise HTTPException(status_code=400, detail="Missing parts")
+    for part in parts:
+        path_part = path_parts / str(part["part_number"])
+        if not path_part.exists() or part["etag"] != (
+            f'"{hashlib.md5(path_part.read_bytes()).hexdigest()}"'
+        ):
+            raise HTTPException(status_code=400, detail="Invalid part")
+    path = upload["path"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as f:
+        for part in sorted(parts, key=lambda p: p["part_number"]):
+            f.write((path_parts / str(part["part_number"])).read_bytes())
+    shutil.rmtree(path_parts)
+    del multipart_uploads[upload_id]
+    return {"path": str(path.relative_to(UPLOAD_DIR))}
+
+
+@app.delete("/jobs/{job_id}/files/multipart/{upload_id}")
+async def job_multipart_delete(job_id: str, upload_id: str) -> None:
+    if multipart_uploads.pop(upload_id, None) is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    shutil.rmtree(UPLOAD_DIR / ".parts" / upload_id)
@@ -0,0 +1,390 @@
+"""End-to-end benchmark of the job fetcher against mock_api, without Docker.
+
+The fetcher's engine runs in this process as in production, but talks to a local
+mock_api (started here, unless `--api-url` is given) that serves generated input
+files and stores the uploads. Containers are faked: they "run" for a fixed time,
+then write their outputs. The report (JSON) records the scenario, the
+environment and the results, so that runs can be compared over time.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, cast
+
+import docker
+import requests
+import uvicorn
+from loguru import logger
+from pydantic import BaseModel
+
+from fetcher import metrics, tracing
+from fetcher.aio.api import AsyncAPI
+from fetcher.aio.engine import Engine, EngineConfig
+from fetcher.api import worker
+from fetcher.scheduling import slots
+from fetcher.status import events
+
+
+class Scenario(BaseModel):
+    n_jobs: int = 20
+    n_files_in: int = 4
+    size_in: int = 4 << 20
+    n_files_out: int = 4
+    size_out: int = 4 << 20
+    run_seconds: float = 0.5
+    n_slots: int = 2
+    lookahead: int = 2
+    n_download_workers: int = 4
+    n_upload_workers: int = 4
+    multipart_threshold: int = 0
+    part_size: int = 16 << 20
+    bundle_threshold: int = 0
+    upload_interval: float = 0.0
+    # faults injected by mock_api, if started here (see mock_api/app/app.py)
+    latency: float = 0.0
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    seed: int = 0
+    # jobs lost with a dropped response are given again after this time
+    requeue_after: float = 10.0
+
+
+class FakeContainer:
+    def __init__(self, container_id: str, path_out: Path, scenario: Scenario):
+        """A container that writes the scenario's outputs when it exits."""
+        self.id = container_id
+        self.status = "running"
+        self._path_out = path_out
+        self._scenario = scenario
+
+    def finish(self) -> None:
+        self._path_out.mkdir(parents=True, exist_ok=True)
+        chunk = bytes(range(256)) * 4096
+        for i in range(self._scenario.n_files_out):
+            with (self._path_out / f"{i}.bin").open("wb") as f:
+                for start in range(0, self._scenario.size_out, len(chunk)):
+                    f.write(chunk[: self._scenario.size_out - start])
+        self.status = "exited"
+
+    def kill(self) -> None:
+        self.status = "exited"
+
+    def logs(self) -> bytes:
+        return b""
+
+
+class FakeDocker:
+    def __init__(self, scenario: Scenario):
+        """Stands in for `docker.DockerClient` (`containers.run`, `images.pull`)."""
+        self.containers = self
+        self.images = self
+        self._scenario = scenario
+        self._n = 0
+
+    def run(self, image: str, mounts: list[Any], **kwargs: Any) -> FakeContainer:
+        self._n += 1
+        path_out = Path(mounts[0]["Source"]) / "output"
+        return FakeContainer(f"container_{self._n}", path_out, self._scenario)
+
+    def pull(self, image: str) -> None:
+        pass
+
+
+class FakeWatcher:
+    def __init__(self, run_seconds: float):
+        """Stands in for `events.ContainerWatcher`."""
+        self._run_seconds = run_seconds
+
+    async def wait_async(self, container: FakeContainer) -> events.ContainerExit:
+        await asyncio.sleep(self._run_seconds)
+        await asyncio.to_thread(container.finish)
+        return events.ContainerExit(exit_code=0)
+
+
+def _job(job_id: str, scenario: Scenario) -> dict[str, Any]:
+    return {
+        "app": {"cmd": ["benchmark"], "env": {}},
+        "handler": {
+            "image_url": "benchmark:latest",
+            "files_down": {
+                f"input/{i}.bin": f"synthetic_{scenario.size_in}_{job_id}_{i}"
+                for i in range(scenario.n_files_in)
+            },
+            "files_up": {"output": "output"},
+        },
+        "meta": {"job_id": 0, "date_created": "2024-01-01T00:00:00"},
+        "hardware": {},
+    }
+
+
+def _quantiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        "p50": statistics.median(values),
+        "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+        "max": values[-1],
+    }
+
+
+def _summarize_trace(path: Path) -> dict[str, Any]:
+    """Time to running of each job, and duration of each phase, from the trace."""
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    starts: dict[tuple[str, str], float] = {}
+    durations: dict[str, list[float]] = {}
+    for span in spans:
+        starts[span["trace_id"], span["name"]] = span["start"]
+        if span["parent_id"] is not None or span["name"] == "fetch":
+            durations.setdefault(span["name"], []).append(span["duration"])
+    to_running = [
+        starts[trace_id, "run"] - start
+        for (trace_id, name), start in starts.items()
+        if name == "job" and (trace_id, "run") in starts
+    ]
+    phases = ("fetch", "download", "pull", "slot", "run", "upload")
+    return {
+        "time_to_running_seconds": _quantiles(to_running),
+        "phase_seconds": {p: _quantiles(durations.get(p, [])) for p in phases},
+    }
+
+
+async def _run_engine(engine: Engine, n_jobs: int, timeout: float) -> None:
+    def n_done() -> float:
+        return sum(metrics.jobs_total.value(status=s) for s in ("finished", "error"))
+
+    n_before = n_done()
+    task = asyncio.create_task(engine.run())
+    deadline = time.monotonic() + timeout
+    try:
+        while n_done() - n_before < n_jobs:
+            if task.done():
+                task.result()
+                raise RuntimeError("The engine stopped before the jobs were done")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Jobs not done after {timeout} seconds")
+            await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def run_once(
+    scenario: Scenario,
+    api_url: str,
+    path_tmp: Path,
+    timeout: float,
+    path_uploads: Path | None = None,
+) -> dict[str, Any]:
+    """Process the scenario's jobs once; `path_uploads` to check the uploads."""
+    # the stand-in may have jobs queued already, e.g., its demo job; requests for
+    # testing only are exempt from the injected faults
+    requests.delete(f"{api_url}/jobs").raise_for_status()
+    prefix = f"bench-{time.time_ns()}"
+    for i in range(scenario.n_jobs):
+        job_id = f"{prefix}-{i}"
+        requests.post(
+            f"{api_url}/jobs", params={"job_id": job_id}, json=_job(job_id, scenario)
+        ).raise_for_status()
+
+    path_base = path_tmp / "jobs"
+    path_trace = path_tmp / f"{prefix}.jsonl"
+    engine = Engine(
+        EngineConfig(
+            path_base=path_base,
+            path_host_base=path_base,
+            timeout_job=1,
+            timeout_job_min=0.1,
+            timeout_status=10,
+            lookahead=scenario.lookahead,
+            n_download_workers=scenario.n_download_workers,
+            n_upload_workers=scenario.n_upload_workers,
+            upload_interval=scenario.upload_interval,
+            bundle_threshold=scenario.bundle_threshold,
+        ),
+        AsyncAPI(
+            worker.API(
+                api_url,
+                multipart_threshold=scenario.multipart_threshold or None,
+                part_size=scenario.part_size,
+            )
+        ),
+        slots.SlotPool(
+            [
+                slots.Slot(index=i, cpu_cores=1, memory=1000)
+                for i in range(scenario.n_slots)
+            ]
+        ),
+        cast(events.ContainerWatcher, FakeWatcher(scenario.run_seconds)),
+        client=cast(docker.DockerClient, FakeDocker(scenario)),
+    )
+
+    directions = ("down", "up")
+    bytes_before = {d: metrics.transfer_bytes.value(direction=d) for d in directions}
+    seconds_before = {
+        d: metrics.transfer_seconds.value(direction=d) for d in directions
+    }
+    tracer = tracing.configure(path_trace)
+    start = time.perf_counter()
+    try:
+        asyncio.run(_run_engine(engine, scenario.n_jobs, timeout))
+    finally:
+        wall = time.perf_counter() - start
+        tracer.close()
+        tracing.configure(None)
+
+    result: dict[str, Any] = {
+        "wall_seconds": wall,
+        "jobs_per_hour": scenario.n_jobs / wall * 3600,
+    }
+    for d, name in zip(directions, ("in", "out")):
+        n_bytes = metrics.transfer_bytes.value(direction=d) - bytes_before[d]
+        seconds = metrics.transfer_seconds.value(direction=d) - seconds_before[d]
+        result[f"mb_{name}"] = n_bytes / 2**20
+        # over the whole run, and per transfer (while transferring)
+        result[f"mb_per_second_{name}"] = n_bytes / 2**20 / wall
+        result[f"mb_per_second_{name}_per_transfer"] = (
+            n_bytes / 2**20 / seconds if seconds else None
+        )
+    result.update(_summarize_trace(path_trace))
+    if path_uploads is not None:
+        uploaded = sum(
+            f.stat().st_size
+            for f in path_uploads.glob(f"{prefix}-*/**/*")
+            if f.is_file()
+        )
+        expected = scenario.n_jobs * scenario.n_files_out * scenario.size_out
+        result["uploads_complete"] = uploaded == expected
+    return result
+
+
+def _environment() -> dict[str, Any]:
+    commit = subprocess.run(
+        ["git", "rev-parse", "HEAD"], capture_output=True, text=True
+    ).stdout.strip()
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _median(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """The median of each number of the runs, keeping the nesting."""
+    summary: dict[str, Any] = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            summary[key] = _median([run[key] for run in runs])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            summary[key] = statistics.median(run[key] for run in runs)
+        else:
+            summary[key] = value
+    return summary
+
+
+def _serve_mock_api(port: int, path_uploads: Path, scenario: Scenario) -> None:
+    os.environ["MOCK_UPLOAD_DIR"] = str(path_uploads)
+    os.environ["MOCK_LATENCY"] = str(scenario.latency)
+    os.environ["MOCK_ERROR_RATE"] = str(scenario.error_rate)
+    os.environ["MOCK_DROP_RATE"] = str(scenario.drop_rate)
+    os.environ["MOCK_SEED"] = str(scenario.seed)
+    os.environ["MOCK_REQUEUE_AFTER"] = str(scenario.requeue_after)
+    uvicorn.run("mock_api.app.app:app", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            requests.get(url, timeout=1).raise_for_status()
+            return
+        except requests.RequestException:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the job fetcher against mock_api."
+    )
+    for name, field in Scenario.model_fields.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(field.default),
+            default=field.default,
+        )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument(
+        "--api-url", help="Use this stand-in API instead of starting mock_api."
+    )
+    parser.add_argument(
+        "--port", type=int, default=0, help="Port of mock_api (default: any free)."
+    )
+    parser.add_argument("--output", type=Path, help="Report file (default: stdout).")
+    args = parser.parse_args()
+    scenario = Scenario(**{k: getattr(args, k) for k in Scenario.model_fields})
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as tmp:
+        path_tmp = Path(tmp)
+        path_uploads = None
+        server = None
+        api_url = args.api_url
+        if api_url is None:
+            path_uploads = path_tmp / "uploads"
+            port = args.port or _free_port()
+            api_url = f"http://127.0.0.1:{port}"
+            server = multiprocessing.Process(
+                target=_serve_mock_api,
+                args=(port, path_uploads, scenario),
+                daemon=True,
+            )
+            server.start()
+        try:
+            _wait_for(f"{api_url}/")
+            runs = [
+                run_once(scenario, api_url, path_tmp, args.timeout, path_uploads)
+                for _ in range(args.repeat)
+            ]
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    report = {
+        "scenario": scenario.model_dump(),
+        "environment": _environment(),
+        "repeat": args.repeat,
+        "median": _median(runs),
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
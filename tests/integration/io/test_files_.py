@@ -14,7 +14,7 @@ def test_api_uploader(api_url: str, tmp_path: Path, filename: str) -> None:
     p = tmp_path / "test.txt"
     p.write_text("test")
 
-    with mock.patch("fetcher.io.files.session.post") as mock_post:
+    with mock.patch("fetcher.io.files.transport.api.post") as mock_post:
         up.put(p, filename)
 
     mock_post.assert_called_once()
@@ -25,7 +25,7 @@ def test_api_downloader(api_url: str, tmp_path: Path) -> None:
     down = files.APIDownloader(None)
 
     p = tmp_path / "test.txt"
-    with mock.patch("fetcher.io.files.session.get") as mock_get:
+    with mock.patch("fetcher.io.files.transport.storage.get") as mock_get:
         m_return = mock.MagicMock(content=b"test")
         mock_get.return_value = m_return
 
@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from scripts import benchmark
+
+
+def test_benchmark(api_url: str, tmp_path: Path) -> None:
+    scenario = benchmark.Scenario(
+        n_jobs=3, size_in=1000, size_out=3000, run_seconds=0, n_slots=1
+    )
+
+    result = benchmark.run_once(scenario, api_url, tmp_path, timeout=60)
+
+    assert result["mb_in"] == 3 * 4 * 1000 / 2**20
+    assert result["mb_out"] == 3 * 4 * 3000 / 2**20
+    assert result["time_to_running_seconds"]["max"] > 0
+    assert set(result["phase_seconds"]["upload"]) == {"p50", "p95", "max"}
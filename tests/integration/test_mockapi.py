@@ -1,5 +1,70 @@
+from pathlib import Path
+
 import requests
 
+from fetcher.api import worker
+
 
 def test_api_works(api_url: str) -> None:
     assert requests.get(f"{api_url}/").json() == {"message": "Hello World"}
+
+
+def test_jobs_long_poll(api_url: str) -> None:
+    params = {"cpu_cores": 1, "memory": 1}
+    # empty the queue
+    requests.get(f"{api_url}/jobs", params={**params, "limit": 100})
+
+    response = requests.get(f"{api_url}/jobs", params={**params, "wait": 0.1})
+    assert response.json() == {}
+    assert response.headers["Retry-After"]
+
+    requests.post(f"{api_url}/jobs", params={"job_id": "a"}, json={"app": {}})
+    response = requests.get(f"{api_url}/jobs", params={**params, "wait": 1})
+    assert response.json() == {"a": {"app": {}}}
+
+
+def test_multipart_upload(api_url: str, tmp_path: Path) -> None:
+    path = tmp_path / "model.pt"
+    path.write_bytes(bytes(range(256)) * 100)
+    api = worker.API(api_url, multipart_threshold=1, part_size=4096)
+
+    response = worker.JobAPI("a", api).put_file(
+        path, Path("model/model.pt"), "artifact"
+    )
+
+    assert response.json() == {"path": "a/artifact/model/model.pt"}
+
+
+def test_synthetic_file(api_url: str, tmp_path: Path) -> None:
+    api = worker.API(api_url)
+    path = tmp_path / "input.bin"
+
+    api.get_file("synthetic_3000000_a", path)
+
+    content = path.read_bytes()
+    assert len(content) == 3000000
+    response = requests.get(
+        f"{api_url}/storage/synthetic_3000000_a", headers={"Range": "bytes=1000-"}
+    )
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 1000-2999999/3000000"
+    assert response.content == content[1000:]
+
+
+def test_upload(api_url: str, tmp_path: Path) -> None:
+    path = tmp_path / "result.txt"
+    path.write_text("result")
+    api = worker.API(api_url)
+
+    response = worker.JobAPI("a", api).put_file(path, Path("out/result.txt"), "output")
+
+    assert response.json() == {"path": "a/output/out/result.txt"}
+
+
+def test_delete_all_jobs(api_url: str) -> None:
+    params = {"cpu_cores": 1, "memory": 1}
+    requests.post(f"{api_url}/jobs", params={"job_id": "b"}, json={"app": {}})
+
+    response = requests.delete(f"{api_url}/jobs")
+    assert "b" in response.json()["job_ids"]
+    assert requests.get(f"{api_url}/jobs", params=params).json() == {}
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from fetcher.aio import transfer
+from fetcher.io import files
+from fetcher.io.transfer import TransferError, is_transient
+
+
+def test_get_all_concurrent(tmp_path: Path) -> None:
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def get_file(file_id: str, path: Path) -> str:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.1)
+        with lock:
+            in_flight -= 1
+        return file_id
+
+    mock_api = mock.MagicMock()
+    mock_api.get_file.side_effect = get_file
+    files_down = [
+        files.PathAPIDown(tmp_path / f"{i}.txt", f"id_{i}", mock_api) for i in range(6)
+    ]
+
+    out = asyncio.run(transfer.get_all(files_down, max_workers=3))
+
+    assert out == [f"id_{i}" for i in range(6)]  # type: ignore[comparison-overlap]
+    assert max_in_flight == 3
+
+
+def test_get_all_errors(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch("asyncio.sleep", new=mock.AsyncMock())
+    attempts: dict[str, int] = {}
+
+    def get_file(file_id: str, path: Path) -> str:
+        attempts[file_id] = attempts.get(file_id, 0) + 1
+        if file_id == "flaky" and attempts[file_id] == 1:
+            raise requests.exceptions.ChunkedEncodingError("drop")
+        if file_id == "bad":
+            raise ValueError(file_id)
+        return file_id
+
+    mock_api = mock.MagicMock()
+    mock_api.get_file.side_effect = get_file
+    files_down = [
+        files.PathAPIDown(tmp_path / name, name, mock_api)
+        for name in ["ok", "flaky", "bad"]
+    ]
+
+    with pytest.raises(TransferError) as e:
+        asyncio.run(transfer.get_all(files_down, retries=2))
+
+    # other errors than transient ones are not retried
+    assert attempts == {"ok": 1, "flaky": 2, "bad": 1}
+    assert list(e.value.errors) == [str(tmp_path / "bad")]
+
+
+def test_get_all_empty() -> None:
+    assert asyncio.run(transfer.get_all([])) == []
+
+
+def test_push_all_retries(tmp_path: Path, mocker: MockerFixture) -> None:
+    sleep = mocker.patch("asyncio.sleep", new=mock.AsyncMock())
+    mock_api = mock.MagicMock()
+    mock_api.put_file_native.side_effect = [requests.ConnectionError("drop"), "ok"]
+    (tmp_path / "out.txt").touch()
+    files_up = [files.PathAPIUp(tmp_path / "out.txt", "output", tmp_path, mock_api)]
+
+    out = asyncio.run(transfer.push_all(files_up, retries=2))
+
+    assert out == ["ok"]  # type: ignore[comparison-overlap]
+    sleep.assert_awaited_once_with(2)
+
+
+def test_push_all_errors(tmp_path: Path) -> None:
+    mock_api = mock.MagicMock()
+    mock_api.put_file_native.side_effect = ValueError("bad")
+    files_up = [
+        files.PathAPIUp(tmp_path / name, "output", tmp_path, mock_api)
+        for name in ["a", "b"]
+    ]
+
+    with pytest.raises(TransferError) as e:
+        asyncio.run(transfer.push_all(files_up, retries=2))
+
+    assert set(e.value.errors) == {str(tmp_path / "a"), str(tmp_path / "b")}
+    assert mock_api.put_file_native.call_count == 2  # not retried
+
+
+def test_is_transient() -> None:
+    assert is_transient(requests.ConnectionError())
+    assert is_transient(requests.HTTPError(response=mock.MagicMock(status_code=503)))
+    assert not is_transient(
+        requests.HTTPError(response=mock.MagicMock(status_code=403))
+    )
+    assert not is_transient(ValueError())
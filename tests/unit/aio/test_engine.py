@@ -0,0 +1,547 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import docker.errors
+import pytest
+import requests
+
+from fetcher import metrics
+from fetcher.aio import api, engine
+from fetcher.api import model
+from fetcher.info import sys
+from fetcher.io import manifest
+from fetcher.io.transfer import TransferError
+from fetcher.scheduling import gpus, journal, slots
+from fetcher.status import events
+
+
+class FakeContainer:
+    def __init__(self, container_id: str) -> None:
+        self.id = container_id
+        self.status = "running"
+        self.attrs: dict[str, Any] = {
+            "HostConfig": {"CpusetCpus": "", "DeviceRequests": None}
+        }
+
+    def kill(self) -> None:
+        self.status = "exited"
+
+    def wait(self, timeout: float | None = None) -> dict[str, Any]:
+        assert self.status == "exited"
+        return {"StatusCode": 137}
+
+    def logs(self) -> bytes:
+        return b"log"
+
+
+def _job(files_down: dict[str, str] | None = None) -> model.JobSpecs:
+    return model.JobSpecs(
+        app=model.AppSpecs(cmd=["run"]),
+        handler=model.HandlerSpecs(
+            image_url="image:latest",
+            files_down=files_down,
+            files_up={"output": "output"},
+        ),
+        meta=model.MetaSpecs(job_id=1, date_created="2024-01-01T00:00:00"),
+        hardware=model.HardwareSpecs(),
+    )
+
+
+class Fixture:
+    def __init__(
+        self,
+        tmp_path: Path,
+        n_slots: int = 1,
+        slot_list: list[slots.Slot] | None = None,
+        gpu_list: list[sys.GPUInfo] | None = None,
+        use_journal: bool = True,
+        **config: Any,
+    ) -> None:
+        self.path_base = tmp_path / "jobs"
+        self.pings: list[tuple[str, str, int | None]] = []
+        # statuses that fail to be reported
+        self.failing_pings: set[str] = set()
+        self.job_apis: dict[str, mock.MagicMock] = {}
+        self.containers: list[FakeContainer] = []
+        self.n_running = 0
+        self.max_running = 0
+
+        self.api = mock.MagicMock()
+        self.api.job.side_effect = self._job_api
+        self.api.put_statuses = mock.AsyncMock(return_value={})
+        self.client = mock.MagicMock()
+        self.client.containers.run.side_effect = self._run
+        self.watcher = mock.MagicMock()
+        self.watcher.wait_async.side_effect = self._wait
+        self.slot_pool = slots.SlotPool(
+            slot_list
+            or [slots.Slot(index=i, cpu_cores=1, memory=1000) for i in range(n_slots)]
+        )
+        self.journal = journal.JobJournal(tmp_path / "journal.sqlite")
+        self.gpu_allocator = gpus.GPUAllocator(gpu_list or [])
+        self.engine = engine.Engine(
+            engine.EngineConfig(
+                path_base=self.path_base,
+                path_host_base=tmp_path / "host",
+                timeout_status=0.01,
+                **config,
+            ),
+            self.api,
+            self.slot_pool,
+            self.watcher,
+            client=self.client,
+            job_journal=self.journal if use_journal else None,
+            gpu_allocator=self.gpu_allocator,
+        )
+
+    def _job_api(self, job_id: str) -> api.AsyncJobAPI:
+        def ping(status: str, exit_code: int | None, body: str | None) -> None:
+            self.pings.append((job_id, status, exit_code))
+            if status in self.failing_pings:
+                raise requests.ConnectionError(status)
+
+        def get_file(file_id: str, path: Path) -> None:
+            if file_id == "missing":
+                raise ValueError(file_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(file_id)
+
+        job_api = mock.MagicMock()
+        job_api.job_id = job_id
+        job_api.ping.side_effect = ping
+        job_api.get_file.side_effect = get_file
+        self.job_apis[job_id] = job_api
+        return api.AsyncJobAPI(job_api)
+
+    def _run(
+        self, image: str, mounts: list[dict[str, Any]], **kwargs: Any
+    ) -> FakeContainer:
+        job_id = Path(mounts[0]["Source"]).name
+        (self.path_base / job_id / "output" / "result.txt").write_text("result")
+        container = FakeContainer(f"container_{len(self.containers)}")
+        self.containers.append(container)
+        return container
+
+    async def _wait(self, container: FakeContainer) -> events.ContainerExit:
+        self.n_running += 1
+        self.max_running = max(self.max_running, self.n_running)
+        while container.status == "running":
+            await asyncio.sleep(0.01)
+        self.n_running -= 1
+        return events.ContainerExit(exit_code=0)
+
+
+def test_run_job(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.watcher.wait_async = mock.AsyncMock(
+        return_value=events.ContainerExit(exit_code=0)
+    )
+    phases = ["download", "pull", "slot", "run", "upload"]
+    counts = [metrics.phase_seconds.count(phase=p) for p in phases]
+    n_finished = metrics.jobs_total.value(status="finished")
+
+    asyncio.run(fixture.engine.run_job("0", _job({"data/in.txt": "id_in"})))
+
+    job_api = fixture.job_apis["0"]
+    job_api.get_file.assert_called_once_with(
+        "id_in", fixture.path_base / "0/data/in.txt"
+    )
+    job_api.put_file_native.assert_called_once_with(
+        fixture.path_base / "0/output/result.txt", "output", Path("output/result.txt")
+    )
+    statuses = [status for _, status, _ in fixture.pings]
+    assert statuses[0] == "preprocessing"
+    assert statuses[-1] == "finished"
+    assert "postprocessing" in statuses
+    assert not (fixture.path_base / "0").exists()
+    assert fixture.journal.entries() == []
+    assert [metrics.phase_seconds.count(phase=p) for p in phases] == [
+        n + 1 for n in counts
+    ]
+    assert metrics.jobs_total.value(status="finished") == n_finished + 1
+    assert metrics.slots_busy.value() == 0
+
+
+def test_run_job_pinned(tmp_path: Path) -> None:
+    slot = slots.Slot(index=0, cpu_cores=4, memory=8000, cpus=[4, 5, 6, 7], mems=[1])
+    fixture = Fixture(tmp_path, slot_list=[slot])
+    fixture.watcher.wait_async = mock.AsyncMock(
+        return_value=events.ContainerExit(exit_code=0)
+    )
+    job = _job()
+    job.hardware = model.HardwareSpecs(cpu_cores=2, memory=2000)
+
+    asyncio.run(fixture.engine.run_job("0", job))
+
+    kwargs = fixture.client.containers.run.call_args.kwargs
+    assert kwargs["cpuset_cpus"] == "4-5"
+    assert kwargs["cpuset_mems"] == "1"
+    assert kwargs["mem_limit"] == kwargs["memswap_limit"] == "2000m"
+    assert "nano_cpus" not in kwargs
+
+
+def test_run_jobs_gpus(tmp_path: Path) -> None:
+    gpu_list = [
+        sys.GPUInfo(model="A100", memory=40000, uuid=f"GPU-{i}") for i in range(2)
+    ]
+    fixture = Fixture(tmp_path, n_slots=3, gpu_list=gpu_list)
+    job_gpu = _job()
+    job_gpu.hardware = model.HardwareSpecs(gpu_model="A100")
+
+    async def run() -> None:
+        tasks = [
+            asyncio.create_task(fixture.engine.run_job(str(i), job_gpu))
+            for i in range(2)
+        ]
+        # without GPU specs, but it gets a GPU too
+        tasks.append(asyncio.create_task(fixture.engine.run_job("any", _job())))
+        while fixture.n_running < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        # a slot is free, but no GPU
+        assert len(fixture.containers) == 2
+        while not all(t.done() for t in tasks):
+            for container in fixture.containers:
+                container.kill()
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    # in the order the containers were started
+    device_ids = []
+    for call in fixture.client.containers.run.call_args_list:
+        device_requests = call.kwargs.get("device_requests", [])
+        device_ids.append([uuid for r in device_requests for uuid in r["DeviceIDs"]])
+    assert sorted(device_ids[:2]) == [["GPU-0"], ["GPU-1"]]
+    assert device_ids[2] in device_ids[:2]
+    assert [s for _, s, _ in fixture.pings].count("finished") == 3
+
+
+def test_run_job_no_gpu_fits(tmp_path: Path) -> None:
+    gpu_list = [sys.GPUInfo(model="T4", memory=16000, uuid="GPU-0")]
+    fixture = Fixture(tmp_path, gpu_list=gpu_list)
+    job = _job()
+    job.hardware = model.HardwareSpecs(gpu_model="A100")
+
+    asyncio.run(fixture.engine.run_job("0", job))
+
+    fixture.client.containers.run.assert_not_called()
+    assert fixture.pings == [("0", "error", None)]
+    assert fixture.slot_pool.n_free == 1
+
+
+def test_run_job_deleted(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    response = requests.Response()
+    response.status_code = 404
+
+    def ping(status: str, exit_code: int | None, body: str | None) -> None:
+        if status == "running":
+            raise requests.HTTPError(response=response)
+
+    fixture.api.job.side_effect = None
+    job_api = mock.MagicMock()
+    job_api.ping.side_effect = ping
+    fixture.api.job.return_value = api.AsyncJobAPI(job_api)
+
+    asyncio.run(fixture.engine.run_job("0", _job()))
+
+    (container,) = fixture.containers
+    assert container.status == "exited"  # killed
+    job_api.put_file_native.assert_not_called()
+    assert fixture.slot_pool.n_free == 1
+
+
+def test_run_job_deleted_heartbeat(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run_job("0", _job()))
+        while not fixture.n_running:
+            await asyncio.sleep(0.01)
+        fixture.api.put_statuses.return_value = {"0": "not_found"}
+        await task
+
+    asyncio.run(run())
+
+    (container,) = fixture.containers
+    assert container.status == "exited"  # killed
+    fixture.job_apis["0"].put_file_native.assert_not_called()
+    assert [s for _, s, _ in fixture.pings] == ["preprocessing", "running"]
+
+
+@pytest.mark.parametrize("n_slots", [1, 2])
+def test_run_jobs_slots(tmp_path: Path, n_slots: int) -> None:
+    fixture = Fixture(tmp_path, n_slots=n_slots)
+
+    async def run() -> None:
+        tasks = [
+            asyncio.create_task(fixture.engine.run_job(str(i), _job()))
+            for i in range(3)
+        ]
+        n_exited = 0
+        while n_exited < 3:
+            await asyncio.sleep(0.01)
+            running = [c for c in fixture.containers if c.status == "running"]
+            # as many containers as slots (or jobs left) are running
+            if fixture.n_running == len(running) == min(n_slots, 3 - n_exited):
+                running[0].kill()
+                n_exited += 1
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert fixture.max_running == n_slots
+    assert [s for _, s, _ in fixture.pings].count("finished") == 3
+
+
+@pytest.mark.parametrize("job_long_poll, wait", [(0, None), (20, 20)])
+def test_run_idle(tmp_path: Path, job_long_poll: int, wait: int | None) -> None:
+    fixture = Fixture(
+        tmp_path, timeout_job_min=1, timeout_job=8, job_long_poll=job_long_poll
+    )
+    fixture.api.fetch_jobs = mock.AsyncMock(
+        side_effect=[
+            {},
+            requests.ConnectionError("down"),
+            {},
+            {"0": _job()},
+            {},
+            RuntimeError("stop"),
+        ]
+    )
+    fixture.api.retry_after = None
+    sleep = mock.AsyncMock()
+
+    with (
+        mock.patch.object(fixture.engine, "_run_or_fail") as run_or_fail,
+        mock.patch("asyncio.sleep", sleep),
+        pytest.raises(RuntimeError, match="stop"),
+    ):
+        asyncio.run(fixture.engine.run())
+
+    run_or_fail.assert_called_once_with("0", mock.ANY)
+    for call in fixture.api.fetch_jobs.call_args_list:
+        assert call.kwargs["wait"] == wait
+    # the API being down backs off like an empty queue, until a job is found
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 4
+    for delay, cap in zip(delays, [1, 2, 4, 1]):
+        assert cap / 2 <= delay <= cap
+
+
+def test_run_lookahead(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path, lookahead=1)
+    queue = [{"0": _job()}, {"1": _job({"in.txt": "file_1"})}]
+    fixture.api.fetch_jobs = mock.AsyncMock(
+        side_effect=lambda **kwargs: queue.pop(0) if queue else {}
+    )
+    fixture.api.retry_after = None
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run())
+        # the second job is staged while the first one runs
+        while not (
+            (fixture.path_base / "1" / "in.txt").exists()
+            and fixture.client.images.pull.call_count == 2
+        ):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        assert len(fixture.containers) == 1
+        # as many jobs as slots plus lookahead
+        assert fixture.api.fetch_jobs.call_count == 2
+
+        fixture.containers[0].kill()
+        while len(fixture.containers) < 2:
+            await asyncio.sleep(0.01)
+        assert fixture.client.images.pull.call_count == 2
+        fixture.containers[1].kill()
+        while ("1", "finished", 0) not in fixture.pings:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert ("0", "finished", 0) in fixture.pings
+    assert fixture.max_running == 1
+
+
+def test_run_job_upload_while_running(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.engine.config.upload_interval = 0.02
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run_job("0", _job()))
+        while not fixture.containers:
+            await asyncio.sleep(0.01)
+        while not fixture.job_apis["0"].put_file_native.called:
+            await asyncio.sleep(0.01)
+        (container,) = fixture.containers
+        container.kill()
+        await task
+
+    asyncio.run(run())
+
+    # uploaded while running only, nothing left at exit
+    fixture.job_apis["0"].put_file_native.assert_called_once()
+    assert [s for _, s, _ in fixture.pings][-1] == "finished"
+
+
+def test_run_job_failed(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.watcher.wait_async = mock.AsyncMock(
+        return_value=events.ContainerExit(exit_code=0)
+    )
+    queue = [{"0": _job({"in.txt": "missing"})}, {"1": _job()}]
+    fixture.api.fetch_jobs = mock.AsyncMock(
+        side_effect=lambda **kwargs: queue.pop(0) if queue else {}
+    )
+    fixture.api.retry_after = None
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run())
+        while ("1", "finished", 0) not in fixture.pings:
+            await asyncio.sleep(0.01)
+            assert not task.done()
+        task.cancel()
+
+    asyncio.run(run())
+
+    # reported, and the next job still ran
+    assert ("0", "error", None) in fixture.pings
+    assert not (fixture.path_base / "0").exists()
+    assert fixture.journal.entries() == []
+
+
+def test_run_job_wait_failed(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.watcher.wait_async = mock.AsyncMock(
+        side_effect=docker.errors.APIError("events")
+    )
+
+    with pytest.raises(docker.errors.APIError):
+        asyncio.run(fixture.engine.run_job("0", _job()))
+
+    assert fixture.containers[0].status == "exited"  # killed
+    # released only once the container exited
+    assert fixture.slot_pool.is_free(0)
+
+
+@pytest.mark.parametrize("use_journal", [True, False])
+def test_run_job_failed_unreported(tmp_path: Path, use_journal: bool) -> None:
+    fixture = Fixture(tmp_path, use_journal=use_journal)
+    fixture.failing_pings = {"error"}
+    fixture.watcher.wait_async = mock.AsyncMock(
+        return_value=events.ContainerExit(exit_code=0)
+    )
+    queue = [{"0": _job({"in.txt": "missing"})}, {"1": _job()}]
+    fixture.api.fetch_jobs = mock.AsyncMock(
+        side_effect=lambda **kwargs: queue.pop(0) if queue else {}
+    )
+    fixture.api.retry_after = None
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run())
+        while ("1", "finished", 0) not in fixture.pings:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+
+    assert ("0", "error", None) in fixture.pings
+    # kept to be resumed after a restart, if there is a journal
+    assert (fixture.path_base / "0").exists() == use_journal
+    assert [e.job_id for e in fixture.journal.entries()] == ["0"] * use_journal
+
+
+def test_run_job_upload_failed(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.engine.config.upload_retries = 0
+
+    def put_file_native(path: Path, f_type: str, path_api: Path) -> None:
+        if path.name == "failed.txt":
+            raise requests.ConnectionError("drop")
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run_job("0", _job()))
+        while not fixture.containers:
+            await asyncio.sleep(0.01)
+        fixture.job_apis["0"].put_file_native.side_effect = put_file_native
+        (fixture.path_base / "0" / "output" / "failed.txt").write_text("failed")
+        fixture.containers[0].kill()
+        await task
+
+    with pytest.raises(TransferError):
+        asyncio.run(run())
+
+    # what was uploaded is recorded, to be skipped when retried
+    m = manifest.UploadManifest(fixture.path_base / "0" / ".manifest.json")
+    assert len(m) == 1
+    assert m.uploaded("output/result.txt", fixture.path_base / "0/output/result.txt")
+
+
+def test_run_job_resume_running(tmp_path: Path) -> None:
+    gpu_list = [
+        sys.GPUInfo(model="A100", memory=40000, uuid=f"GPU-{i}") for i in range(2)
+    ]
+    slot_list = [
+        slots.Slot(index=i, cpu_cores=2, memory=1000, cpus=[2 * i, 2 * i + 1])
+        for i in range(2)
+    ]
+    fixture = Fixture(tmp_path, slot_list=slot_list, gpu_list=gpu_list)
+    container = FakeContainer("abc")
+    container.attrs["HostConfig"]["CpusetCpus"] = "3"
+    container.attrs["HostConfig"]["DeviceRequests"] = [{"DeviceIDs": ["GPU-1"]}]
+    fixture.containers.append(container)
+    fixture.client.containers.get.return_value = container
+    job = _job({"data/in.txt": "id_in"})
+    fixture.journal.add("0", job)
+    fixture.journal.update("0", "running", container_id="abc")
+    (fixture.path_base / "0" / "output").mkdir(parents=True)
+    (fixture.path_base / "0" / "output" / "result.txt").write_text("result")
+    (entry,) = fixture.journal.entries()
+
+    async def run() -> None:
+        task = asyncio.create_task(fixture.engine.run_job("0", job, resume=entry))
+        while not fixture.n_running:
+            await asyncio.sleep(0.01)
+        # the slot and GPU the container is pinned to are busy
+        assert not fixture.slot_pool.is_free(1)
+        assert fixture.slot_pool.is_free(0)
+        assert fixture.gpu_allocator.free() == gpu_list[:1]
+        container.kill()
+        await task
+
+    asyncio.run(run())
+
+    assert fixture.gpu_allocator.n_free == 2
+    fixture.client.containers.get.assert_called_once_with("abc")
+    fixture.client.containers.run.assert_not_called()
+    job_api = fixture.job_apis["0"]
+    job_api.get_file.assert_not_called()
+    job_api.put_file_native.assert_called_once()
+    assert [s for _, s, _ in fixture.pings][-1] == "finished"
+    assert fixture.journal.entries() == []
+
+
+def test_run_job_resume_postprocessing(tmp_path: Path) -> None:
+    fixture = Fixture(tmp_path)
+    fixture.client.containers.get.side_effect = docker.errors.NotFound("gone")
+    job = _job()
+    fixture.journal.add("0", job)
+    fixture.journal.update("0", "running", container_id="abc")
+    fixture.journal.update("0", "postprocessing", exit_code=1)
+    (fixture.path_base / "0" / "output").mkdir(parents=True)
+    (fixture.path_base / "0" / "output" / "result.txt").write_text("result")
+    (entry,) = fixture.journal.entries()
+
+    asyncio.run(fixture.engine.run_job("0", job, resume=entry))
+
+    fixture.client.containers.run.assert_not_called()
+    fixture.watcher.wait_async.assert_not_called()
+    fixture.job_apis["0"].put_file_native.assert_called_once()
+    assert fixture.pings[-1] == ("0", "error", 1)
+    assert fixture.journal.entries() == []
@@ -0,0 +1,127 @@
+import asyncio
+from unittest import mock
+
+import pytest
+import requests
+
+from fetcher.aio import api, reporter
+
+
+def _http_error(status_code: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.HTTPError(response=response)
+
+
+def _job_api(job_id: str) -> tuple[api.AsyncJobAPI, mock.MagicMock]:
+    job_api = mock.MagicMock()
+    job_api.job_id = job_id
+    return api.AsyncJobAPI(job_api), job_api
+
+
+def test_report_transition() -> None:
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(mock.MagicMock()))
+    job_api, sync_job_api = _job_api("0")
+
+    asyncio.run(status_reporter.report(job_api, "error", exit_code=1, body="logs"))
+
+    sync_job_api.ping.assert_called_once_with("error", 1, "logs")
+
+
+def test_report_not_found() -> None:
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(mock.MagicMock()))
+    job_api, sync_job_api = _job_api("0")
+    sync_job_api.ping.side_effect = _http_error(404)
+
+    with pytest.raises(requests.HTTPError):
+        asyncio.run(status_reporter.report(job_api, "running"))
+
+
+def test_report_failed() -> None:
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(mock.MagicMock()))
+    job_api, sync_job_api = _job_api("0")
+    sync_job_api.ping.side_effect = _http_error(503)
+
+    # sent again with the next heartbeat
+    asyncio.run(status_reporter.report(job_api, "running"))
+
+
+def test_heartbeat_batched() -> None:
+    sync_api = mock.MagicMock()
+    sync_api.put_statuses.return_value = {"0": "ok", "1": "not_found"}
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(sync_api))
+    (job_api_0, sync_0), (job_api_1, sync_1) = _job_api("0"), _job_api("1")
+    on_error = mock.AsyncMock()
+
+    async def run() -> None:
+        await status_reporter.report(job_api_0, "running", on_error=on_error)
+        await status_reporter.report(job_api_1, "running", on_error=on_error)
+        await status_reporter.heartbeat()
+
+    asyncio.run(run())
+
+    sync_api.put_statuses.assert_called_once_with({"0": "running", "1": "running"})
+    # no additional request per job
+    sync_0.ping.assert_called_once()
+    sync_1.ping.assert_called_once()
+    assert status_reporter.exception("0") is None
+    exception = status_reporter.exception("1")
+    assert isinstance(exception, reporter.JobNotFoundError)
+    on_error.assert_awaited_once_with(exception)
+
+
+@pytest.mark.parametrize("status_code", [404, 405, 422])
+def test_heartbeat_fallback(status_code: int) -> None:
+    sync_api = mock.MagicMock()
+    sync_api.put_statuses.side_effect = _http_error(status_code)
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(sync_api))
+    job_api, sync_job_api = _job_api("0")
+
+    async def run() -> None:
+        await status_reporter.report(job_api, "postprocessing")
+        await status_reporter.heartbeat()
+        await status_reporter.heartbeat()
+
+    asyncio.run(run())
+
+    sync_api.put_statuses.assert_called_once()
+    assert (
+        sync_job_api.ping.call_args_list
+        == [mock.call("postprocessing", None, None)] * 3
+    )
+
+
+def test_heartbeat_batched_failed() -> None:
+    sync_api = mock.MagicMock()
+    sync_api.put_statuses.side_effect = _http_error(503)
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(sync_api))
+    job_api, sync_job_api = _job_api("0")
+
+    async def run() -> None:
+        await status_reporter.report(job_api, "running")
+        with pytest.raises(requests.HTTPError):
+            await status_reporter.heartbeat()
+        # still batched
+        with pytest.raises(requests.HTTPError):
+            await status_reporter.heartbeat()
+
+    asyncio.run(run())
+
+    assert sync_api.put_statuses.call_count == 2
+    sync_job_api.ping.assert_called_once()
+
+
+def test_heartbeat_removed() -> None:
+    sync_api = mock.MagicMock()
+    status_reporter = reporter.StatusReporter(api.AsyncAPI(sync_api), interval=0.01)
+
+    async def run() -> None:
+        status_reporter.start()
+        await status_reporter.report(_job_api("0")[0], "running")
+        status_reporter.remove("0")
+        await asyncio.sleep(0.05)
+        await status_reporter.stop()
+
+    asyncio.run(run())
+
+    sync_api.put_statuses.assert_not_called()
@@ -0,0 +1,138 @@
+import datetime
+import json
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+from unittest import mock
+
+import botocore.exceptions
+import pytest
+
+from fetcher.api import token
+
+
+class FakeCognito:
+    def __init__(self, expires_in: int = 3600) -> None:
+        self.expires_in = expires_in
+        self.calls: list[str] = []
+        self.reject_refresh = False
+        self._lock = threading.Lock()
+
+    def initiate_auth(
+        self, AuthFlow: str, AuthParameters: dict[str, str], ClientId: str
+    ) -> dict[str, Any]:
+        with self._lock:
+            self.calls.append(AuthFlow)
+            n = len(self.calls)
+        time.sleep(0.01)
+        result: dict[str, Any] = {"IdToken": f"id_{n}", "ExpiresIn": self.expires_in}
+        if AuthFlow == "USER_PASSWORD_AUTH":
+            result["RefreshToken"] = f"refresh_{n}"
+        elif self.reject_refresh:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "NotAuthorizedException"}}, "InitiateAuth"
+            )
+        return {"AuthenticationResult": result}
+
+
+@pytest.fixture
+def cognito() -> Iterator[FakeCognito]:
+    fake = FakeCognito()
+    with mock.patch("boto3.client", return_value=fake):
+        yield fake
+
+
+def _token(**kwargs: Any) -> token.AccessTokenAuth:
+    return token.AccessTokenAuth("client", "region", "user", "pw", **kwargs)
+
+
+def test_refresh_token(cognito: FakeCognito) -> None:
+    cognito.expires_in = 100
+    access_token = _token(min_validity=300)
+    assert cognito.calls == ["USER_PASSWORD_AUTH"]
+
+    # always close to expiry: refreshed on each access, with the refresh token
+    assert access_token.access_token == "id_2"
+    cognito.reject_refresh = True
+    assert access_token.access_token == "id_4"
+    assert cognito.calls == [
+        "USER_PASSWORD_AUTH",
+        "REFRESH_TOKEN_AUTH",
+        "REFRESH_TOKEN_AUTH",
+        "USER_PASSWORD_AUTH",
+    ]
+
+
+def test_single_refresh(cognito: FakeCognito) -> None:
+    access_token = _token()
+    access_token._expiry = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    threads = [
+        threading.Thread(target=lambda: access_token.access_token) for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert cognito.calls == ["USER_PASSWORD_AUTH", "REFRESH_TOKEN_AUTH"]
+
+
+def test_background_refresh(cognito: FakeCognito) -> None:
+    # refreshed halfway through its lifetime
+    cognito.expires_in = 1
+    access_token = _token(min_validity=0)
+    with mock.patch.object(token, "_MIN_REFRESH_DELAY", 0.1):
+        access_token.start()
+        try:
+            for _ in range(100):
+                if len(cognito.calls) > 1:
+                    break
+                time.sleep(0.05)
+        finally:
+            access_token.stop()
+
+    assert cognito.calls[:2] == ["USER_PASSWORD_AUTH", "REFRESH_TOKEN_AUTH"]
+    n_calls = len(cognito.calls)
+    # served without waiting for Cognito
+    assert access_token.access_token == f"id_{n_calls}"
+    assert len(cognito.calls) == n_calls
+
+
+def test_background_refresh_short_lived(cognito: FakeCognito) -> None:
+    # a minute before `access_token` would refresh it is right away: halfway
+    cognito.expires_in = 361
+    access_token = _token(min_validity=300)
+    access_token.start()
+    time.sleep(0.2)
+    access_token.stop()
+
+    assert cognito.calls == ["USER_PASSWORD_AUTH"]
+
+
+def test_cache(cognito: FakeCognito, tmp_path: Path) -> None:
+    path_cache = tmp_path / "token.json"
+    _token(path_cache=path_cache)
+    assert stat.S_IMODE(path_cache.stat().st_mode) == 0o600
+
+    # restarted: no authentication
+    access_token = _token(path_cache=path_cache)
+    assert access_token.access_token == "id_1"
+    assert cognito.calls == ["USER_PASSWORD_AUTH"]
+
+    # other user: not used
+    token.AccessTokenAuth("client", "region", "other", "pw", path_cache=path_cache)
+    assert cognito.calls == ["USER_PASSWORD_AUTH"] * 2
+    assert json.loads(path_cache.read_text())["username"] == "other"
+
+
+def test_cache_expired(cognito: FakeCognito, tmp_path: Path) -> None:
+    path_cache = tmp_path / "token.json"
+    cognito.expires_in = 100
+    _token(path_cache=path_cache)
+
+    # the refresh token of the cache is used
+    _token(path_cache=path_cache)
+    assert cognito.calls == ["USER_PASSWORD_AUTH", "REFRESH_TOKEN_AUTH"]
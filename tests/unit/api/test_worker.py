@@ -1,3 +1,10 @@
+from pathlib import Path
+from typing import Any, Iterator
+from unittest import mock
+
+import pytest
+import requests
+
 from fetcher.api import worker
 
 
@@ -11,3 +18,177 @@ def test_job_api() -> None:
     assert api.job_url == "http://localhost:8000/jobs/abc"
     assert api.status_url == "http://localhost:8000/jobs/abc/status"
     assert api.file_post_url == "http://localhost:8000/jobs/abc/files/url"
+
+
+class FakeResponse:
+    def __init__(
+        self,
+        chunks: list[bytes],
+        fail: bool = False,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self._chunks = chunks
+        self._fail = fail
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        yield from self._chunks
+        if self._fail:
+            raise requests.exceptions.ChunkedEncodingError("connection dropped")
+
+    def json(self) -> dict[str, Any]:
+        return {"url": "https://bucket/file", "method": "get"}
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def mock_session() -> Iterator[mock.MagicMock]:
+    session = mock.MagicMock()
+    session.get.return_value = FakeResponse([])
+    with (
+        # one mock for the API and storage requests, to check their order
+        mock.patch("fetcher.api.worker.transport.api", session),
+        mock.patch("fetcher.api.worker.transport.storage", session),
+        mock.patch("fetcher.api.worker.time.sleep"),
+    ):
+        yield session
+
+
+def test_get_file_streams(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    mock_session.request.return_value = FakeResponse([b"ab", b"cd"])
+    path = tmp_path / "file"
+
+    worker.API("http://localhost:8000").get_file("abc", path)
+
+    assert path.read_bytes() == b"abcd"
+    assert not (tmp_path / "file.part").exists()
+    mock_session.request.assert_called_once_with(
+        url="https://bucket/file", method="get", headers={}, stream=True
+    )
+
+
+def test_get_file_resumes(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    mock_session.request.side_effect = [
+        FakeResponse([b"ab", b"cd"], fail=True),
+        FakeResponse(
+            [b"ef"], status_code=206, headers={"Content-Range": "bytes 4-5/6"}
+        ),
+    ]
+    path = tmp_path / "file"
+
+    worker.API("http://localhost:8000").get_file("abc", path)
+
+    assert path.read_bytes() == b"abcdef"
+    assert mock_session.request.call_args.kwargs["headers"] == {"Range": "bytes=4-"}
+
+
+def test_get_file_range_ignored(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    mock_session.request.side_effect = [
+        FakeResponse([b"ab"], fail=True),
+        FakeResponse([b"abcd"], status_code=200),
+    ]
+    path = tmp_path / "file"
+
+    worker.API("http://localhost:8000").get_file("abc", path)
+
+    assert path.read_bytes() == b"abcd"
+
+
+def test_get_file_max_resumes(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    mock_session.request.side_effect = [
+        FakeResponse([b"ab"], fail=True) for _ in range(3)
+    ]
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        worker.API("http://localhost:8000").get_file(
+            "abc", tmp_path / "file", max_resumes=2
+        )
+    assert mock_session.request.call_count == 3
+    assert not (tmp_path / "file").exists()
+
+
+def test_put_file_closes_handle(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    path = tmp_path / "out.txt"
+    path.write_text("out")
+    mock_session.post.return_value = FakeResponse([])
+
+    worker.JobAPI("abc", worker.API("http://localhost:8000")).put_file(
+        path, Path("output/out.txt"), "output"
+    )
+
+    fh = mock_session.request.call_args.kwargs["files"]["file"][1]
+    assert fh.closed
+
+
+def _multipart_upload(n_parts: int) -> mock.MagicMock:
+    response = mock.MagicMock()
+    response.json.return_value = {
+        "upload_id": "up",
+        "part_size": 4,
+        "parts": [
+            {"part_number": n, "method": "put", "url": f"https://bucket/{n}"}
+            for n in range(1, n_parts + 1)
+        ],
+    }
+    return response
+
+
+def _put_part(url: str, data: bytes, **kwargs: Any) -> mock.MagicMock:
+    response = mock.MagicMock()
+    response.headers = {"ETag": f"etag_{url[-1]}_{data.decode()}"}
+    return response
+
+
+def test_put_file_multipart(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"0123456789")
+    mock_session.post.return_value = _multipart_upload(3)
+    mock_session.request.side_effect = [requests.ConnectionError("drop")] + [
+        _put_part(url=f"https://bucket/{n}", data=d)
+        for n, d in [(1, b"0123"), (2, b"4567"), (3, b"89")]
+    ]
+    api = worker.API("http://localhost:8000", multipart_threshold=5, part_workers=1)
+
+    worker.JobAPI("abc", api).put_file(path, Path("output/out.bin"), "output")
+
+    assert [c.kwargs["data"] for c in mock_session.request.call_args_list] == [
+        b"0123",
+        b"0123",
+        b"4567",
+        b"89",
+    ]
+    complete = mock_session.post.call_args
+    assert complete.args == (
+        "http://localhost:8000/jobs/abc/files/multipart/up/complete",
+    )
+    assert complete.kwargs["json"] == {
+        "parts": [
+            {"part_number": 1, "etag": "etag_1_0123"},
+            {"part_number": 2, "etag": "etag_2_4567"},
+            {"part_number": 3, "etag": "etag_3_89"},
+        ]
+    }
+
+
+def test_put_file_multipart_abort(mock_session: mock.MagicMock, tmp_path: Path) -> None:
+    path = tmp_path / "out.bin"
+    path.write_bytes(b"0123456789")
+    mock_session.post.return_value = _multipart_upload(3)
+    mock_session.request.side_effect = requests.ConnectionError("drop")
+
+    with pytest.raises(requests.ConnectionError):
+        worker.JobAPI("abc", worker.API("http://localhost:8000")).put_file_multipart(
+            path, None, "output", max_retries=1
+        )
+
+    mock_session.delete.assert_called_once_with(
+        "http://localhost:8000/jobs/abc/files/multipart/up", headers=None
+    )
+    assert mock_session.post.call_count == 1  # not completed
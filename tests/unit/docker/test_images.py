@@ -0,0 +1,63 @@
+import time
+from unittest import mock
+
+import docker.errors
+import pytest
+
+from fetcher.docker import images
+
+
+@pytest.fixture
+def mock_client() -> mock.MagicMock:
+    client = mock.MagicMock()
+    client.images.pull.side_effect = lambda image: mock.MagicMock(id=f"sha:{image}")
+    return client
+
+
+def test_cache_skips_recent_pull(mock_client: mock.MagicMock) -> None:
+    cache = images.ImageCache(mock_client, ttl=60)
+    assert cache.age("decode:latest") is None
+    cache.pull("decode:latest")
+    cache.pull("decode:latest")
+
+    mock_client.images.pull.assert_called_once_with("decode:latest")
+    mock_client.images.get.assert_called_once_with("sha:decode:latest")
+    assert (cache.age("decode:latest") or 60) < 60
+
+
+def test_cache_expired(mock_client: mock.MagicMock) -> None:
+    cache = images.ImageCache(mock_client, ttl=0)
+    cache.pull("decode:latest")
+    cache.pull("decode:latest")
+    assert mock_client.images.pull.call_count == 2
+
+
+def test_cache_image_removed(mock_client: mock.MagicMock) -> None:
+    mock_client.images.get.side_effect = docker.errors.ImageNotFound("removed")
+    cache = images.ImageCache(mock_client, ttl=60)
+    cache.pull("decode:latest")
+    cache.pull("decode:latest")
+    assert mock_client.images.pull.call_count == 2
+
+
+def test_cache_force(mock_client: mock.MagicMock) -> None:
+    cache = images.ImageCache(mock_client, ttl=60)
+    cache.pull("decode:latest")
+    cache.pull("decode:latest", force=True)
+    assert mock_client.images.pull.call_count == 2
+
+
+def test_prefetcher(mock_client: mock.MagicMock) -> None:
+    cache = images.ImageCache(mock_client, ttl=0.2)
+    prefetcher = images.Prefetcher(cache, interval=0.05, max_images=1)
+    prefetcher.start()
+    prefetcher.add("decode:old")
+    prefetcher.add("decode:latest")
+    time.sleep(0.5)
+    prefetcher.stop()
+
+    pulled = [c.args[0] for c in mock_client.images.pull.call_args_list]
+    assert pulled[:2] == ["decode:old", "decode:latest"]
+    # only the most recent image is kept up to date
+    assert pulled.count("decode:latest") > 1
+    assert pulled.count("decode:old") == 1
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from pytest_mock import MockerFixture
 
 from fetcher.info import sys
@@ -8,11 +10,13 @@ def test_collect(mocker: MockerFixture) -> None:
     mock_collect_os = mocker.spy(sys, "collect_os")
     mock_collect_sys = mocker.spy(sys, "collect_sys")
     mock_collect_gpus = mocker.spy(sys, "collect_gpus")
+    mock_collect_numa = mocker.spy(sys, "collect_numa")
     sys.collect()
     mock_collect_host.assert_called_once()
     mock_collect_os.assert_called_once()
     mock_collect_sys.assert_called_once()
     mock_collect_gpus.assert_called_once()
+    mock_collect_numa.assert_called_once()
 
 
 def test_host() -> None:
@@ -37,3 +41,29 @@ def test_sys() -> None:
 def test_gpu() -> None:
     out = sys.collect_gpus()
     assert isinstance(out, list)
+
+
+def test_numa(tmp_path: Path, mocker: MockerFixture) -> None:
+    for i, cpulist in enumerate(["0-3,8-11", "4-7,12-15", ""]):
+        path_node = tmp_path / f"node{i}"
+        path_node.mkdir()
+        (path_node / "cpulist").write_text(cpulist + "\n")
+        (path_node / "meminfo").write_text(
+            f"Node {i} MemTotal:       16777216 kB\nNode {i} MemFree: 1 kB\n"
+        )
+    (tmp_path / "online").write_text("0-2\n")
+    mocker.patch("os.sched_getaffinity", return_value=set(range(15)))
+
+    nodes = sys.collect_numa(tmp_path)
+
+    assert [n.index for n in nodes] == [0, 1]  # node 2 has no CPU
+    assert nodes[0].cpus == [0, 1, 2, 3, 8, 9, 10, 11]
+    assert nodes[1].cpus == [4, 5, 6, 7, 12, 13, 14]  # 15 not allowed
+    assert nodes[0].memory == 16384
+    assert sys.collect_numa(tmp_path / "missing") == []
+
+
+def test_cpulist() -> None:
+    assert sys.parse_cpulist("0-2,5,7-8\n") == [0, 1, 2, 5, 7, 8]
+    assert sys.format_cpulist([8, 0, 1, 2, 5, 7]) == "0-2,5,7-8"
+    assert sys.format_cpulist([]) == ""
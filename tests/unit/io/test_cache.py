@@ -0,0 +1,112 @@
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import pytest
+
+from fetcher.io import cache
+
+
+class FakeServer:
+    def __init__(self, contents: dict[str, bytes], etags: bool = False) -> None:
+        self.contents = contents
+        self.etags = etags
+        self.n_downloads = 0
+
+    def etag(self, file_id: str) -> str:
+        return f'"{hash(self.contents[file_id])}"'
+
+    def download(self, file_id: str, path: Path, headers: dict[str, str]) -> Any:
+        response = mock.MagicMock(status_code=200, headers={})
+        if self.etags:
+            response.headers["ETag"] = self.etag(file_id)
+            if headers.get("If-None-Match") == self.etag(file_id):
+                response.status_code = 304
+                return response
+        self.n_downloads += 1
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self.contents[file_id])
+        return response
+
+
+@pytest.fixture
+def file_cache(tmp_path: Path) -> cache.FileCache:
+    return cache.FileCache(tmp_path / "cache", max_bytes=10)
+
+
+def test_get_miss_then_hit(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"aaa"})
+    file_cache.get("a", tmp_path / "job_1" / "a.txt", server.download)
+    assert file_cache.get("a", tmp_path / "job_2" / "a.txt", server.download) is None
+
+    assert server.n_downloads == 1
+    assert (tmp_path / "job_1" / "a.txt").read_bytes() == b"aaa"
+    assert (tmp_path / "job_2" / "a.txt").read_bytes() == b"aaa"
+
+
+def test_get_revalidates_etag(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"aaa"}, etags=True)
+    file_cache.get("a", tmp_path / "job_1" / "a.txt", server.download)
+    file_cache.get("a", tmp_path / "job_2" / "a.txt", server.download)
+    assert server.n_downloads == 1
+
+    server.contents["a"] = b"new"
+    file_cache.get("a", tmp_path / "job_3" / "a.txt", server.download)
+    assert server.n_downloads == 2
+    assert (tmp_path / "job_3" / "a.txt").read_bytes() == b"new"
+    # the old content is removed
+    assert file_cache.size == 3
+    assert len(list((tmp_path / "cache" / "blobs").iterdir())) == 1
+
+
+def test_get_dedupes_content(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"same", "b": b"same"})
+    file_cache.get("a", tmp_path / "job" / "a.txt", server.download)
+    file_cache.get("b", tmp_path / "job" / "b.txt", server.download)
+
+    assert file_cache.size == 4
+    assert len(list((tmp_path / "cache" / "blobs").iterdir())) == 1
+
+
+def test_evicts_lru(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"aaaa", "b": b"bbbb", "c": b"cccc"})
+    file_cache.get("a", tmp_path / "job" / "a.txt", server.download)
+    file_cache.get("b", tmp_path / "job" / "b.txt", server.download)
+    file_cache.get("a", tmp_path / "job" / "a.txt", server.download)  # a is now used
+    file_cache.get("c", tmp_path / "job" / "c.txt", server.download)  # evicts b
+
+    assert file_cache.size == 8
+    assert server.n_downloads == 3
+    file_cache.get("b", tmp_path / "job" / "b.txt", server.download)
+    assert server.n_downloads == 4
+
+
+def test_index_persisted(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"aaa"})
+    file_cache.get("a", tmp_path / "job_1" / "a.txt", server.download)
+
+    file_cache_new = cache.FileCache(tmp_path / "cache", max_bytes=10)
+    file_cache_new.get("a", tmp_path / "job_2" / "a.txt", server.download)
+    assert server.n_downloads == 1
+
+
+def test_get_evicted_meanwhile(file_cache: cache.FileCache, tmp_path: Path) -> None:
+    server = FakeServer({"a": b"aaa"})
+    file_cache.get("a", tmp_path / "job_1" / "a.txt", server.download)
+    place = cache._place
+    n_calls = 0
+
+    def place_evicted(src: Path, dst: Path) -> None:
+        nonlocal n_calls
+        n_calls += 1
+        if n_calls == 1:
+            # evicted by another job after the lookup
+            raise FileNotFoundError(src)
+        place(src, dst)
+
+    with mock.patch.object(cache, "_place", side_effect=place_evicted):
+        file_cache.get("a", tmp_path / "job_2" / "a.txt", server.download)
+
+    # downloaded again
+    assert server.n_downloads == 2
+    assert (tmp_path / "job_2" / "a.txt").read_bytes() == b"aaa"
@@ -1,3 +1,4 @@
+import tarfile
 from pathlib import Path
 from unittest import mock
 
@@ -60,3 +61,52 @@ def test_path_api_down_get(tmp_path: Path) -> None:
     assert not p.is_file()  # because of mock
 
     mock_api.get_file.assert_called_once_with("abcdefg", p._path)
+
+
+def test_path_api_down_get_cache(tmp_path: Path) -> None:
+    mock_api = mock.MagicMock()
+    mock_cache = mock.MagicMock()
+    p = files.PathAPIDown(tmp_path / "test.txt", "abcdefg", mock_api, cache=mock_cache)
+    p.get()
+
+    mock_cache.get.assert_called_once_with("abcdefg", p._path, mock_api.get_file)
+    mock_api.get_file.assert_not_called()
+
+
+def test_bundle_small(tmp_path: Path) -> None:
+    mock_api = mock.MagicMock()
+    archives: dict[str, list[str]] = {}
+
+    def put_file_native(path: Path, f_type: str, path_api: Path) -> None:
+        with tarfile.open(path) as tar:
+            archives[str(path_api)] = sorted(tar.getnames())
+
+    mock_api.put_file_native.side_effect = put_file_native
+    dirs_up = [
+        files.PathAPIUp(tmp_path / "job" / d, t, tmp_path / "job", mock_api)
+        for t, d in [("log", "log"), ("artifact", "model")]
+    ]
+    for name, size in [
+        ("log/a.txt", 1),
+        ("log/sub/b.txt", 1),
+        ("log/big.txt", 100),
+        ("model/c.txt", 1),
+    ]:
+        (tmp_path / "job" / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "job" / name).write_bytes(b"x" * size)
+    files_up = [f for d in dirs_up for f in d.rglob("*") if f.is_file()]
+
+    out = files.bundle_small(files_up, dirs_up, 10, tmp_path / "tmp")
+
+    assert sorted(
+        Path(str(f)).name for f in out if not isinstance(f, files.PathAPIBundle)
+    ) == [
+        "big.txt",
+        "c.txt",  # alone in its directory
+    ]
+    (bundle,) = [f for f in out if isinstance(f, files.PathAPIBundle)]
+    bundle.push()
+    ((path_api, names),) = archives.items()
+    assert path_api.startswith("log/bundle-") and path_api.endswith(".tar")
+    assert names == ["a.txt", "sub/b.txt"]
+    assert list((tmp_path / "tmp").iterdir()) == []
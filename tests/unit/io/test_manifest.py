@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+
+from fetcher.io import manifest
+
+
+def _record(m: manifest.UploadManifest, key: str, path: Path) -> None:
+    stat = path.stat()
+    m.record({key: (path, (stat.st_size, stat.st_mtime_ns))})
+
+
+def test_uploaded(tmp_path: Path) -> None:
+    path = tmp_path / "a.txt"
+    path.write_text("abc")
+    m = manifest.UploadManifest(tmp_path / "manifest.json")
+    assert not m.uploaded("a.txt", path)
+
+    _record(m, "a.txt", path)
+    assert m.uploaded("a.txt", path)
+    assert not m.uploaded("b.txt", path)
+
+    os.utime(path, ns=(0, 0))  # touched, same content
+    assert m.uploaded("a.txt", path)
+    path.write_text("abd")
+    assert not m.uploaded("a.txt", path)
+
+
+def test_persisted(tmp_path: Path) -> None:
+    path = tmp_path / "a.txt"
+    path.write_text("abc")
+    _record(manifest.UploadManifest(tmp_path / "manifest.json"), "a.txt", path)
+
+    m = manifest.UploadManifest(tmp_path / "manifest.json")
+    assert len(m) == 1
+    assert m.uploaded("a.txt", path)
+
+
+def test_record_changed(tmp_path: Path) -> None:
+    path = tmp_path / "a.txt"
+    path.write_text("abc")
+    m = manifest.UploadManifest(tmp_path / "manifest.json")
+
+    m.record({"a.txt": (path, (3, 0))})  # modified since
+
+    assert len(m) == 0
+
+
+def test_invalid(tmp_path: Path) -> None:
+    (tmp_path / "manifest.json").write_text("{")
+    assert len(manifest.UploadManifest(tmp_path / "manifest.json")) == 0
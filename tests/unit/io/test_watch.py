@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+from unittest import mock
+
+from fetcher.io import files, manifest, watch
+
+
+def _tracker(tmp_path: Path) -> watch.UploadTracker:
+    (tmp_path / "output").mkdir()
+    dir_up = files.PathAPIUp(tmp_path / "output", "output", tmp_path, mock.MagicMock())
+    return watch.UploadTracker([dir_up])
+
+
+def _names(files_up: list[files.PathAPIUp]) -> list[str]:
+    return sorted(Path(str(f)).name for f in files_up)
+
+
+def test_stable(tmp_path: Path) -> None:
+    tracker = _tracker(tmp_path)
+    (tmp_path / "output" / "a.txt").write_text("a")
+    assert tracker.stable() == []  # first seen
+    (tmp_path / "output" / "b.txt").write_text("b")
+    assert _names(tracker.stable()) == ["a.txt"]
+
+    (tmp_path / "output" / "b.txt").write_text("bb")  # still being written
+    stable = tracker.stable()
+    assert _names(stable) == ["a.txt"]
+    tracker.mark_uploaded(stable)
+    assert _names(tracker.stable()) == ["b.txt"]
+
+
+def test_pending(tmp_path: Path) -> None:
+    tracker = _tracker(tmp_path)
+    (tmp_path / "output" / "sub").mkdir()
+    (tmp_path / "output" / "sub" / "a.txt").write_text("a")
+    (tmp_path / "output" / "b.txt").write_text("b")
+    tracker.stable()
+    stable = tracker.stable()
+    tracker.mark_uploaded(stable)
+    assert tracker.pending() == []
+
+    os.utime(tmp_path / "output" / "b.txt", ns=(0, 0))  # rewritten
+    (tmp_path / "output" / "c.txt").write_text("c")
+    assert _names(tracker.pending()) == ["b.txt", "c.txt"]
+
+
+def test_manifest(tmp_path: Path) -> None:
+    tracker = _tracker(tmp_path)
+    m = manifest.UploadManifest(tmp_path / "manifest.json")
+    tracker = watch.UploadTracker(tracker.dirs_up, m)
+    (tmp_path / "output" / "a.txt").write_text("a")
+    (tmp_path / "output" / "b.txt").write_text("b")
+    pending = tracker.pending()
+    tracker.mark_uploaded([f for f in pending if Path(str(f)).name == "a.txt"])
+
+    # e.g., postprocessing restarted
+    tracker = watch.UploadTracker(tracker.dirs_up, m)
+    assert _names(tracker.pending()) == ["b.txt"]
@@ -0,0 +1,43 @@
+import datetime
+import email.utils
+import random
+
+import pytest
+
+from fetcher.scheduling import backoff
+
+
+def test_backoff_grows_with_jitter() -> None:
+    b = backoff.Backoff(base=1, maximum=10, factor=2, rng=random.Random(0))
+    delays = [b.next() for _ in range(6)]
+    caps = [1, 2, 4, 8, 10, 10]
+    for delay, cap in zip(delays, caps):
+        assert cap / 2 <= delay <= cap
+    assert len(set(delays)) == len(delays)
+
+
+def test_backoff_reset() -> None:
+    b = backoff.Backoff(base=1, maximum=10)
+    [b.next() for _ in range(5)]
+    b.reset()
+    assert b.next() <= 1
+
+
+def test_backoff_retry_after() -> None:
+    b = backoff.Backoff(base=1, maximum=10)
+    assert b.next(retry_after=30) == 30
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"), [(None, None), ("", None), ("5", 5), ("-1", 0), ("x", None)]
+)
+def test_parse_retry_after(value: str | None, expected: float | None) -> None:
+    assert backoff.parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_date() -> None:
+    date = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
+        seconds=60
+    )
+    out = backoff.parse_retry_after(email.utils.format_datetime(date, usegmt=True))
+    assert out is not None and 58 <= out <= 60
@@ -0,0 +1,75 @@
+import random
+
+from fetcher.scheduling import breaker
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens() -> None:
+    clock = Clock()
+    b = breaker.CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        assert b.allow()
+        b.record_failure()
+    b.record_success()  # not consecutive
+    for _ in range(3):
+        assert b.allow()
+        b.record_failure()
+
+    assert b.state == "open"
+    assert not b.allow()
+    retry_after = b.retry_after
+    assert retry_after is not None and 5 <= retry_after <= 10
+
+
+def test_breaker_probe() -> None:
+    clock = Clock()
+    b = breaker.CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    b.record_failure()
+    clock.now = 10
+
+    assert b.state == "half_open"
+    assert b.allow()
+    assert not b.allow()  # a single probe at a time
+    b.record_failure()
+    assert b.state == "open"
+
+    clock.now = 20
+    assert b.allow()
+    b.record_success()
+    assert b.state == "closed"
+    assert b.retry_after is None
+
+
+def test_breaker_jitter() -> None:
+    delays = set()
+    for seed in range(5):
+        b = breaker.CircuitBreaker(
+            failure_threshold=1, clock=Clock(), rng=random.Random(seed)
+        )
+        b.record_failure()
+        delays.add(b.retry_after)
+    # workers failing at the same time probe at different times
+    assert len(delays) == 5
+
+
+def test_budget() -> None:
+    clock = Clock()
+    budget = breaker.RetryBudget(ratio=0.5, min_per_second=0.1, capacity=2, clock=clock)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    clock.now = 10
+    assert budget.withdraw()
@@ -0,0 +1,82 @@
+import pytest
+
+from fetcher.api.model import HardwareSpecs
+from fetcher.info.sys import GPUInfo
+from fetcher.scheduling import gpus
+
+A100_40 = GPUInfo(model="A100", memory=40000, uuid="GPU-0")
+A100_80 = GPUInfo(model="A100", memory=80000, uuid="GPU-1")
+T4 = GPUInfo(model="T4", memory=16000, uuid="GPU-2")
+
+
+def _allocator() -> gpus.GPUAllocator:
+    return gpus.GPUAllocator([A100_80, A100_40, T4])
+
+
+def test_no_gpu() -> None:
+    allocator = gpus.GPUAllocator([])
+    assert allocator.can_allocate(HardwareSpecs(cpu_cores=2))
+    assert allocator.allocate(HardwareSpecs(cpu_cores=2)) == []
+
+
+def test_any_gpu() -> None:
+    allocator = _allocator()
+    # the smallest, though the job does not ask for one
+    assert allocator.allocate(HardwareSpecs(cpu_cores=2)) == [T4]
+    assert allocator.allocate(HardwareSpecs()) == [A100_40]
+    assert allocator.allocate(HardwareSpecs()) == [A100_80]
+    assert allocator.satisfiable(HardwareSpecs())
+    assert not allocator.can_allocate(HardwareSpecs())
+    assert allocator.allocate(HardwareSpecs()) is None
+
+
+def test_match() -> None:
+    allocator = _allocator()
+    # the smallest that fits
+    assert allocator.allocate(HardwareSpecs(gpu_model="A100")) == [A100_40]
+    assert allocator.allocate(HardwareSpecs(gpu_mem=20000)) == [A100_80]
+    assert allocator.allocate(HardwareSpecs(gpu_mem=1000)) == [T4]
+    assert allocator.n_free == 0
+    assert allocator.allocate(HardwareSpecs(gpu_mem=1000)) is None
+
+
+def test_unsatisfiable() -> None:
+    allocator = _allocator()
+    hardware = HardwareSpecs(gpu_model="T4", gpu_mem=32000)
+    assert not allocator.satisfiable(hardware)
+    assert allocator.allocate(hardware) is None
+    assert not gpus.GPUAllocator([]).satisfiable(HardwareSpecs(gpu_model="T4"))
+    assert gpus.GPUAllocator([]).satisfiable(HardwareSpecs())
+
+
+def test_busy() -> None:
+    allocator = _allocator()
+    hardware = HardwareSpecs(gpu_model="A100", gpu_mem=60000)
+    allocated = allocator.allocate(hardware)
+    assert allocated == [A100_80]
+    assert allocator.satisfiable(hardware)
+    assert not allocator.can_allocate(hardware)
+
+    allocator.release(allocated)
+    assert allocator.can_allocate(hardware)
+    with pytest.raises(ValueError):
+        allocator.release(allocated)
+
+
+def test_fetch_kwargs() -> None:
+    allocator = _allocator()
+    assert allocator.fetch_kwargs() == {"gpu_model": "A100", "gpu_mem": 80000}
+    allocator.allocate(HardwareSpecs(gpu_mem=60000))
+    assert allocator.fetch_kwargs() == {"gpu_model": "A100", "gpu_mem": 40000}
+    allocator.allocate(HardwareSpecs(gpu_model="A100"))
+    allocator.allocate(HardwareSpecs(gpu_model="T4"))
+    # all busy: for jobs to stage ahead
+    assert allocator.fetch_kwargs() == {"gpu_model": "A100", "gpu_mem": 80000}
+    assert gpus.GPUAllocator([]).fetch_kwargs() == {"gpu_model": None, "gpu_mem": None}
+
+
+def test_claim() -> None:
+    allocator = _allocator()
+    assert allocator.claim(["GPU-2", "GPU-9"]) == [T4]
+    assert allocator.free() == [A100_80, A100_40]
+    assert allocator.allocate(HardwareSpecs(gpu_model="T4")) is None
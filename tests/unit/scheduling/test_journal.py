@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from fetcher.api import model
+from fetcher.scheduling import journal
+
+
+def _job() -> model.JobSpecs:
+    return model.JobSpecs.model_validate(
+        {
+            "app": {"cmd": ["run"]},
+            "handler": {"image_url": "image:latest"},
+            "meta": {"job_id": 1, "date_created": "2024-01-01T00:00:00"},
+            "hardware": {},
+        }
+    )
+
+
+def test_journal(tmp_path: Path) -> None:
+    job_journal = journal.JobJournal(tmp_path / "journal.sqlite")
+    job_journal.add("a", _job())
+    job_journal.add("b", _job())
+    job_journal.update("a", "running", container_id="abc")
+    job_journal.update("a", "postprocessing", exit_code=137, oom_killed=True)
+    job_journal.remove("b")
+    job_journal.close()
+
+    # e.g., after a restart
+    (entry,) = journal.JobJournal(tmp_path / "journal.sqlite").entries()
+    assert entry == journal.JournalEntry(
+        job_id="a",
+        job=_job(),
+        phase="postprocessing",
+        container_id="abc",
+        exit_code=137,
+        oom_killed=True,
+    )
+    assert entry.reached("running")
+
+
+def test_journal_order(tmp_path: Path) -> None:
+    job_journal = journal.JobJournal(tmp_path / "journal.sqlite")
+    for job_id in ["b", "a", "c"]:
+        job_journal.add(job_id, _job())
+    job_journal.update("b", "staged")
+    assert [e.job_id for e in job_journal.entries()] == ["b", "a", "c"]
+    assert [e.phase for e in job_journal.entries()] == [
+        "staged",
+        "preprocessing",
+        "preprocessing",
+    ]
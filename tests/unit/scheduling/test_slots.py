@@ -0,0 +1,160 @@
+import os
+import threading
+
+import pytest
+
+from fetcher.info import sys
+from fetcher.scheduling import slots
+
+
+@pytest.fixture(autouse=True)
+def no_affinity(monkeypatch: pytest.MonkeyPatch) -> None:
+    # all the CPUs of `_system_info`
+    monkeypatch.delattr(os, "sched_getaffinity", raising=False)
+
+
+def _system_info(cores: int, memory: int, n_gpus: int) -> sys.SystemInfo:
+    return sys.SystemInfo(
+        host=sys.HostInfo(hostname="host"),
+        os=sys.OSInfo(system="Linux", release="", version="", alias=""),
+        sys=sys.CPUInfo(architecture="x86_64", cores=cores, memory=memory),
+        gpus=[
+            sys.GPUInfo(model="A100", memory=40000, uuid=f"GPU-{i}")
+            for i in range(n_gpus)
+        ],
+    )
+
+
+def test_split_one_slot() -> None:
+    (slot,) = slots.split(_system_info(64, 256000, 4), 1)
+    assert slot.cpu_cores == 64
+    assert slot.memory == 256000
+    # GPUs are allocated per job, see `gpus`
+    assert slot.fetch_kwargs() == {"cpu_cores": 64, "memory": 256000}
+
+
+def test_split_affinity(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {5, 2, 3}, raising=False)
+    (slot,) = slots.split(_system_info(64, 256000, 0), 1)
+    # only the CPUs the worker may use
+    assert slot.cpus == [2, 3, 5]
+    assert slot.cpu_cores == 3
+
+
+def test_split_even() -> None:
+    out = slots.split(_system_info(64, 256000, 4), 4)
+    assert [s.cpu_cores for s in out] == [16] * 4
+    assert [s.memory for s in out] == [64000] * 4
+
+
+def test_split_small() -> None:
+    out = slots.split(_system_info(2, 1000, 0), 4)
+    assert [s.cpu_cores for s in out] == [1] * 4
+
+
+def _numa(n_nodes: int, n_cpus: int) -> list[sys.NUMANode]:
+    return [
+        sys.NUMANode(
+            index=i, cpus=list(range(i * n_cpus, (i + 1) * n_cpus)), memory=32000
+        )
+        for i in range(n_nodes)
+    ]
+
+
+def test_split_numa() -> None:
+    info = _system_info(8, 64000, 0)
+    info.numa = _numa(2, 4)
+
+    out = slots.split(info, 4)
+    assert [s.cpus for s in out] == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert [s.mems for s in out] == [[0], [0], [1], [1]]
+    assert [s.memory for s in out] == [16000] * 4
+
+    # more nodes per slot
+    (slot,) = slots.split(info, 1)
+    assert slot.cpus == list(range(8))
+    assert slot.mems == [0, 1]
+    assert slot.memory == 64000
+
+    # slots do not cross nodes, even if uneven
+    out = slots.split(info, 3)
+    assert [s.cpus for s in out] == [[0, 1], [2, 3], [4, 5, 6, 7]]
+    assert [s.mems for s in out] == [[0], [0], [1]]
+    assert [s.cpu_cores for s in out] == [2, 2, 4]
+
+
+def test_split_reserved() -> None:
+    info = _system_info(8, 64000, 0)
+    info.numa = _numa(2, 4)
+
+    out = slots.split(info, 2, reserved_cores=2)
+    assert [s.cpus for s in out] == [[2, 3], [4, 5, 6, 7]]
+    with pytest.raises(ValueError):
+        slots.split(info, 2, reserved_cores=8)
+
+
+def test_split_shared_cpus() -> None:
+    out = slots.split(_system_info(2, 1000, 0), 4)
+    assert [s.cpus for s in out] == [[0], [1], [0], [1]]
+    assert all(s.mems == [] for s in out)  # topology unknown
+
+
+def test_split_invalid() -> None:
+    with pytest.raises(ValueError):
+        slots.split(_system_info(2, 1000, 0), 0)
+
+
+def test_pool() -> None:
+    pool = slots.SlotPool.from_system(_system_info(4, 1000, 0), 2)
+    assert pool.n_total == 2
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not None and second is not None
+    assert pool.acquire() is None
+    assert pool.n_free == 0
+    pool.release(second)
+    assert pool.n_free == 1
+    with pytest.raises(ValueError):
+        pool.release(second)
+    pool.release(first)
+    assert pool.acquire() == first
+
+
+def test_pool_peek() -> None:
+    pool = slots.SlotPool.from_system(_system_info(4, 1000, 0), 2)
+    assert pool.peek().index == 0
+    first = pool.acquire()
+    assert pool.peek().index == 1
+    pool.acquire()
+    assert pool.peek().index == 0  # all busy: the first slot is representative
+    assert first is not None
+    pool.release(first)
+    assert pool.peek() == first
+
+
+def test_pool_acquire_blocking() -> None:
+    pool = slots.SlotPool.from_system(_system_info(4, 1000, 0), 1)
+    slot = pool.acquire()
+    assert slot is not None
+    assert pool.acquire(block=True, timeout=0.05) is None
+
+    threading.Timer(0.1, pool.release, args=(slot,)).start()
+    assert pool.acquire(block=True, timeout=1) == slot
+
+
+def test_pool_acquire_index() -> None:
+    info = _system_info(8, 64000, 0)
+    info.numa = _numa(2, 4)
+    pool = slots.SlotPool.from_system(info, 2)
+    # e.g., a container pinned to the CPUs of the second slot
+    assert pool.index_of([5, 6]) == 1
+    assert pool.index_of([3, 4]) is None
+    assert pool.index_of([]) is None
+
+    second = pool.acquire(index=1)
+    assert second is not None and second.index == 1
+    assert not pool.is_free(1)
+    assert pool.is_free()
+    assert pool.acquire(index=1) is None
+    assert pool.acquire() is not None
+    assert not pool.is_free()
@@ -0,0 +1,95 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Iterator
+from unittest import mock
+
+import pytest
+
+from fetcher.status import events
+
+
+class FakeStream:
+    def __init__(self) -> None:
+        self.queue: queue.Queue[dict[str, Any] | None] = queue.Queue()
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        while (event := self.queue.get()) is not None:
+            yield event
+
+    def close(self) -> None:
+        self.queue.put(None)
+
+
+class FakeContainer:
+    def __init__(self, container_id: str, state: dict[str, Any]) -> None:
+        self.id = container_id
+        self.attrs = {"State": state}
+        self.n_reloads = 0
+
+    def reload(self) -> None:
+        self.n_reloads += 1
+
+
+def _event(container_id: str, action: str, **attributes: str) -> dict[str, Any]:
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"ID": container_id, "Attributes": attributes},
+    }
+
+
+@pytest.fixture
+def stream() -> FakeStream:
+    return FakeStream()
+
+
+@pytest.fixture
+def watcher(stream: FakeStream) -> Iterator[events.ContainerWatcher]:
+    client = mock.MagicMock()
+    client.events.return_value = stream
+    watcher = events.ContainerWatcher(client)
+    watcher.start()
+    yield watcher
+    watcher.stop()
+
+
+def test_wait_async_already_exited(watcher: events.ContainerWatcher) -> None:
+    container = FakeContainer(
+        "abc", {"Status": "exited", "ExitCode": 1, "OOMKilled": False}
+    )
+    container_exit = asyncio.run(watcher.wait_async(container))  # type: ignore[arg-type]
+    assert container_exit == events.ContainerExit(exit_code=1)
+
+
+def test_wait_async_die_event(
+    watcher: events.ContainerWatcher, stream: FakeStream
+) -> None:
+    container = FakeContainer("abc", {"Status": "running"})
+
+    async def run() -> events.ContainerExit:
+        task = asyncio.create_task(watcher.wait_async(container))  # type: ignore[arg-type]
+        await asyncio.sleep(0.1)
+        stream.queue.put(_event("other", "die", exitCode="0"))
+        await asyncio.sleep(0.1)
+        assert not task.done()
+
+        t_start = time.monotonic()
+        stream.queue.put(_event("abc", "oom"))
+        stream.queue.put(_event("abc", "die", exitCode="137"))
+        container_exit = await asyncio.wait_for(task, timeout=1)
+        assert time.monotonic() - t_start < 0.1
+        return container_exit
+
+    assert asyncio.run(run()) == events.ContainerExit(exit_code=137, oom_killed=True)
+    assert container.n_reloads == 1
+
+
+def test_wait_async_poll_fallback(watcher: events.ContainerWatcher) -> None:
+    container = FakeContainer("abc", {"Status": "running"})
+    threading.Timer(
+        0.1, lambda: container.attrs.update(State={"Status": "exited", "ExitCode": 0})
+    ).start()
+    container_exit = asyncio.run(watcher.wait_async(container, poll_interval=0.05))  # type: ignore[arg-type]
+    assert container_exit == events.ContainerExit(exit_code=0)
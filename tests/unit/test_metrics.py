@@ -0,0 +1,71 @@
+import urllib.request
+
+import pytest
+import requests
+
+from fetcher import metrics, transport
+
+
+def test_counter() -> None:
+    counter = metrics.Counter("c_total", "A counter.", ["direction"])
+    counter.inc(2, direction="up")
+    counter.inc(direction="up")
+    counter.inc(direction='d"own')
+
+    assert counter.value(direction="up") == 3
+    assert counter.render() == (
+        "# HELP c_total A counter.\n"
+        "# TYPE c_total counter\n"
+        'c_total{direction="up"} 3\n'
+        'c_total{direction="d\\"own"} 1\n'
+    )
+    with pytest.raises(ValueError):
+        counter.inc(other="up")
+
+
+def test_histogram() -> None:
+    histogram = metrics.Histogram("h_seconds", "A histogram.", buckets=(1, 10))
+    for value in (0.5, 5, 5, 50):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        'h_seconds_bucket{le="1.0"} 1',
+        'h_seconds_bucket{le="10.0"} 3',
+        'h_seconds_bucket{le="+Inf"} 4',
+        "h_seconds_sum 60.5",
+        "h_seconds_count 4",
+    ]
+
+
+def test_histogram_time() -> None:
+    histogram = metrics.Histogram("t_seconds", "Timed.", ["phase"])
+    with pytest.raises(RuntimeError):
+        with histogram.time(phase="run"):
+            raise RuntimeError
+    assert histogram.count(phase="run") == 1
+
+
+def test_api_errors() -> None:
+    t = transport.Transport(transport.TransportConfig(name="test", retries=0))
+    before = metrics.api_errors.value(transport="test", reason="connection")
+    with pytest.raises(requests.ConnectionError):
+        t.get("http://127.0.0.1:1/")
+    after = metrics.api_errors.value(transport="test", reason="connection")
+    assert after == before + 1
+
+
+def test_serve() -> None:
+    registry = metrics.Registry()
+    gauge = metrics.Gauge("slots_busy", "Busy slots.")
+    registry.register(gauge)
+    gauge.set(2)
+
+    server = metrics.serve(0, host="127.0.0.1", registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode() == registry.render()
+    finally:
+        server.shutdown()
+    assert "slots_busy 2" in registry.render()
@@ -0,0 +1,108 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from fetcher import tracing
+
+
+def test_disabled() -> None:
+    tracer = tracing.Tracer()
+    with tracer.span("job", trace_id="1") as span:
+        assert span is None
+
+
+def test_jsonl(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+    tracer = tracing.Tracer(tracing.JsonlExporter(path))
+
+    async def job() -> None:
+        with tracer.span("job", trace_id="1", resumed=False):
+            with tracer.span("download"):
+                await asyncio.to_thread(_get, tracer)
+
+    asyncio.run(job())
+    tracer.close()
+
+    spans = {s["name"]: s for s in map(json.loads, path.read_text().splitlines())}
+    assert list(spans) == ["get", "download", "job"]  # in the order they ended
+    assert {s["trace_id"] for s in spans.values()} == {"1"}
+    assert spans["job"]["parent_id"] is None
+    assert spans["job"]["attributes"] == {"resumed": False}
+    assert spans["download"]["parent_id"] == spans["job"]["span_id"]
+    # across the thread pool
+    assert spans["get"]["parent_id"] == spans["download"]["span_id"]
+    assert spans["get"]["in_loop"] is False and spans["job"]["in_loop"] is True
+    assert spans["get"]["attributes"] == {"path": "a.txt"}
+    assert spans["job"]["duration"] >= spans["download"]["duration"] > 0
+
+
+def _get(tracer: tracing.Tracer) -> None:
+    with tracer.span("get", path="a.txt"):
+        pass
+
+
+def test_error(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+    tracer = tracing.Tracer(tracing.JsonlExporter(path))
+    with pytest.raises(ValueError):
+        with tracer.span("push"):
+            raise ValueError("broken pipe")
+    tracer.close()
+
+    (span,) = map(json.loads, path.read_text().splitlines())
+    assert span["error"] == "ValueError('broken pipe')"
+
+
+def test_new_trace(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+    tracer = tracing.Tracer(tracing.JsonlExporter(path))
+    with tracer.span("fetch", trace_id="worker"):
+        with tracer.span("job", trace_id="1"):
+            pass
+    tracer.close()
+
+    job, fetch = map(json.loads, path.read_text().splitlines())
+    assert job["trace_id"] == "1" and job["parent_id"] is None
+    assert fetch["trace_id"] == "worker"
+
+
+def test_chrome(tmp_path: Path) -> None:
+    path = tmp_path / "trace.json"
+    tracer = tracing.Tracer(tracing.ChromeExporter(path))
+
+    async def job(job_id: str) -> None:
+        with tracer.span("job", trace_id=job_id):
+            with tracer.span("run"):
+                await asyncio.sleep(0)
+
+    async def jobs() -> None:
+        await asyncio.gather(job("1"), job("2"))
+
+    asyncio.run(jobs())
+    tracer.close()
+
+    events = json.loads(path.read_text())
+    spans = [e for e in events if e["ph"] == "X"]
+    assert sorted(e["name"] for e in spans) == ["job", "job", "run", "run"]
+    # concurrent jobs in the event loop are shown in separate rows
+    rows = {e["args"]["trace_id"]: e["tid"] for e in spans}
+    assert rows["1"] != rows["2"]
+    names = {e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert names == {rows["1"]: "trace 1", rows["2"]: "trace 2"}
+    assert all(e["dur"] >= 0 and e["ts"] > 0 for e in spans)
+
+
+def test_configure(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+    tracer = tracing.configure(path)
+    try:
+        with tracing.span("job", trace_id="1") as span:
+            assert span is not None
+    finally:
+        tracer.close()
+        tracing.configure(None)
+    assert json.loads(path.read_text())["name"] == "job"
+    with tracing.span("job") as span:
+        assert span is None
@@ -0,0 +1,126 @@
+import http.server
+import threading
+import time
+from typing import Any, Iterator
+from unittest import mock
+
+import pytest
+import requests
+
+from fetcher import transport
+from fetcher.api import worker
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    n_requests = 0
+
+    def do_GET(self) -> None:
+        Handler.n_requests += 1
+        if self.path == "/slow":
+            time.sleep(0.5)
+        status = {"/missing": 404, "/unavailable": 503}.get(self.path, 200)
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_POST = do_GET
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    Handler.n_requests = 0
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _transport(**kwargs: Any) -> transport.Transport:
+    kwargs = {"retries": 0, "backoff_factor": 0, **kwargs}
+    return transport.Transport(transport.TransportConfig(**kwargs))
+
+
+def test_sessions_per_thread() -> None:
+    t = _transport()
+    sessions = [t.session]
+    thread = threading.Thread(target=lambda: sessions.append(t.session))
+    thread.start()
+    thread.join()
+
+    assert t.session is sessions[0]
+    assert sessions[0] is not sessions[1]
+    # one pool for all threads
+    assert all(s.get_adapter("https://a") is t.adapter for s in sessions)
+
+
+def test_raise_for_status(server_url: str) -> None:
+    t = _transport()
+    assert t.get(f"{server_url}/ok").json() == {}
+    with pytest.raises(requests.HTTPError):
+        t.get(f"{server_url}/missing")
+
+
+def test_read_timeout(server_url: str) -> None:
+    t = _transport(read_timeout=0.1)
+    # a timeout, reported as connection error once retries are exhausted
+    with pytest.raises((requests.Timeout, requests.ConnectionError)):
+        t.get(f"{server_url}/slow")
+    t.get(f"{server_url}/slow", timeout=t.timeout(extra_read=1))
+
+
+def test_long_poll_timeout() -> None:
+    api = mock.MagicMock()
+    api.request.return_value.json.return_value = {}
+    api.timeout = transport.api.timeout
+    with mock.patch("fetcher.api.worker.transport.api", api):
+        worker.API("http://localhost:8000").fetch_jobs(wait=600)
+
+    _, read_timeout = api.request.call_args.kwargs["timeout"]
+    assert read_timeout > 600
+
+
+def test_no_blind_post_retry(server_url: str) -> None:
+    t = _transport(retries=3)
+    with pytest.raises(requests.HTTPError):
+        t.post(f"{server_url}/unavailable")
+    assert Handler.n_requests == 1
+
+    with pytest.raises(requests.exceptions.RetryError):
+        t.get(f"{server_url}/unavailable")
+    assert Handler.n_requests == 1 + 4
+
+
+def test_retry_budget(server_url: str) -> None:
+    t = _transport(retries=3, retry_ratio=0.1)
+    assert t.budget is not None
+    t.budget.min_per_second = 0
+    t.budget.capacity = 2
+    with pytest.raises(requests.exceptions.RetryError):
+        t.get(f"{server_url}/unavailable")
+    with pytest.raises(requests.exceptions.RetryError):
+        t.get(f"{server_url}/unavailable")
+    # two retries for the first request, none left for the second one
+    assert Handler.n_requests == 3 + 1
+
+
+def test_circuit_breaker(server_url: str) -> None:
+    t = _transport(breaker_threshold=2, breaker_timeout=60)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.RetryError):
+            t.get(f"{server_url}/unavailable")
+
+    # fails fast, without a request
+    with pytest.raises(transport.CircuitOpenError):
+        t.get(f"{server_url}/ok")
+    assert Handler.n_requests == 2
+
+    assert t.circuit_breaker is not None
+    t.circuit_breaker.reset_timeout = 0
+    t.circuit_breaker.record_failure()
+    t.get(f"{server_url}/ok")  # probe
+    assert t.circuit_breaker.state == "closed"